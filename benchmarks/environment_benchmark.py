@@ -0,0 +1,275 @@
+"""
+Times each stage of an EnvironmentManager run on synthetic Outpost and Scout files: loading the files, constructing the
+units, building the spatial indexes, the range and nearest joins, each stacked analysis function on its own and the
+whole stack fused, and the output. Unit managers are shared between combinations, so there is no copy stage.
+
+Each stage records its wall and CPU time, the memory traced by tracemalloc when it started and at its peak (which
+includes numpy arrays, but not the C++ Rtree), and the process' peak resident memory after it. Records are appended as
+JSON lines to --results-path, one line per stage, each with the run's settings, machine, git commit, and the run's
+counters of spatial index candidates and distance evaluations, so that runs can be compared over time.
+
+Join sizes grow with density: at millions of points, lower --scan-range to keep the joins in memory.
+
+Usage: python benchmarks/environment_benchmark.py [--workloads uniform urban roads duplicates]
+    [--sizes 1000 10000 100000] [--num-outposts N] [--scan-range 2.0] [--results-path benchmark_results.jsonl]
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import synthetic_workloads
+from environment_management import unit_names_combinations_manager
+from environment_management.environment_manager import EnvironmentManager
+from io_handling import unit_file
+from units.outpost.outposts_query_results import OutpostsQueryResults
+
+INPUT_WRITERS = {
+    '.csv': lambda df, path: df.to_csv(path, index=False),
+    '.parquet': lambda df, path: df.to_parquet(path, index=False),
+    '.feather': lambda df, path: df.to_feather(path)
+}
+
+
+class StageTimer:
+    """
+    Records the wall time, CPU time, and memory of named stages.
+    """
+
+    def __init__(self, trace_memory: bool):
+        self.trace_memory = trace_memory
+        self.records = []
+
+    def time_stage(self, stage_name: str, func, *args, **kwargs):
+        """
+        Runs func as one stage.
+
+        :return: func's return value.
+        """
+        traced_bytes_at_start = None
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            traced_bytes_at_start = tracemalloc.get_traced_memory()[0]
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        result = func(*args, **kwargs)
+        self.records.append({
+            'stage': stage_name,
+            'wall_seconds': time.perf_counter() - wall_start,
+            'cpu_seconds': time.process_time() - cpu_start,
+            'traced_bytes_at_start': traced_bytes_at_start,
+            'peak_traced_bytes': tracemalloc.get_traced_memory()[1] if self.trace_memory else None,
+            'max_rss_bytes': _get_max_rss_bytes()
+        })
+        return result
+
+
+def _get_max_rss_bytes():
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def _get_git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def create_unit_files(workload: str, num_outposts: int, num_scouts: int, work_directory: str,
+                      input_extension: str) -> tuple[unit_file.UnitFile, unit_file.UnitFile]:
+    """
+    Writes the synthetic Outpost and Scout files of the workload.
+
+    :return: Tuple of (Outpost UnitFile, Scout UnitFile).
+    """
+    outposts_path = os.path.join(work_directory, f"outposts_{workload}_{num_outposts}{input_extension}")
+    scouts_path = os.path.join(work_directory, f"scouts_{workload}_{num_scouts}{input_extension}")
+    INPUT_WRITERS[input_extension](synthetic_workloads.create_outposts_dataframe(workload, num_outposts, seed=1),
+                                   outposts_path)
+    INPUT_WRITERS[input_extension](synthetic_workloads.create_scouts_dataframe(workload, num_scouts, seed=2),
+                                   scouts_path)
+
+    outpost_file = unit_file.UnitFile(file_alias='outposts', latitude_column_name='latitude',
+                                      longitude_column_name='longitude', extra_column_names=['GISJOIN', 'POP'],
+                                      file_path=outposts_path)
+    scout_file = unit_file.UnitFile(file_alias='scouts', latitude_column_name='latitude',
+                                    longitude_column_name='longitude', file_path=scouts_path)
+    return outpost_file, scout_file
+
+
+def stack_analysis_functions(env_manager: EnvironmentManager, scan_range: float, nearest_count: int):
+    env_manager.scout_in_range_tf(scan_range=scan_range)
+    env_manager.num_scouts_in_range(scan_range=scan_range)
+    env_manager.num_scouts_in_range(scan_range=2 * scan_range)
+    env_manager.num_scouts_in_range_by_variable(scan_range=2 * scan_range, variable='name', target_value="McDonald's")
+    env_manager.num_scouts_in_range_by_variable_values(scan_range=2 * scan_range, variable='name')
+    env_manager.average_scouts_by_variable(scan_range=2 * scan_range, variable='revenue')
+    env_manager.nearest_scout(scan_range=2 * scan_range)
+    if nearest_count:
+        env_manager.nearest_scouts(k=nearest_count, variable='name')
+
+
+def run_stages(env_manager: EnvironmentManager, timer: StageTimer, output_path: str):
+    """
+    Runs the stages of EnvironmentManager.process_analysis_functions and output_data_to_file one at a time.
+    """
+    env_manager.done_called = True
+    max_scan_range, scout_extra_column_names, max_nearest_count = env_manager._get_stack_requirements()
+    env_manager._add_scout_extra_column_names(scout_extra_column_names)
+
+    file_to_df_map = timer.time_stage('load', env_manager._load_dfs_into_map)
+
+    def construct_units(file_to_df_map):
+        env_manager.file_to_unit_managers_map = env_manager._generate_unit_managers_map(file_to_df_map)
+        env_manager.unit_names_combinations_manager = unit_names_combinations_manager.UnitNamesCombinationsManager(
+            outpost_files=env_manager.outpost_unit_files,
+            scout_files=env_manager.scout_unit_files
+        )
+        env_manager._fill_unit_names_combinations_manager(env_manager.file_to_unit_managers_map)
+    timer.time_stage('unit_construction', construct_units, file_to_df_map)
+    del file_to_df_map
+
+    def build_indexes():
+        # Indexes are named as the manager names them, i.e. one merged index if Scout indexes are merged
+        for scouts_name in env_manager._get_scouts_cache_keys():
+            env_manager._get_rtree_analyzer(name=scouts_name)
+    timer.time_stage('index_build', build_indexes)
+
+    combinations = env_manager.unit_names_combinations_manager.combinations
+    for names_combination in combinations:
+        timer.time_stage('join', env_manager._load_scouts_into_outposts_manager,
+                         scan_range=max_scan_range,
+                         outposts_query_results=names_combination.outposts_query_results,
+                         scouts_managers=names_combination.scouts_managers)
+        if max_nearest_count:
+            timer.time_stage('nearest_join', env_manager._load_nearest_scouts_into_outposts_manager,
+                             k=max_nearest_count,
+                             outposts_query_results=names_combination.outposts_query_results)
+
+    function_calls = list(env_manager.func_stack.function_call_generator())
+    for names_combination in combinations:
+        outposts_query_results = names_combination.outposts_query_results
+        for function_name, kwargs in function_calls:
+            # Each function adds its results to its own OutpostsQueryResults, so no results are overwritten
+            function_query_results = OutpostsQueryResults(outposts_query_results.outposts_manager)
+            function_query_results.set_neighbor_table(neighbor_table=outposts_query_results.neighbor_table,
+                                                      scout_columns=outposts_query_results.scout_columns)
+            function_query_results.set_nearest_table(outposts_query_results.nearest_table)
+            timer.time_stage(f"function {function_name}({json.dumps(kwargs)})",
+                             function_query_results.evaluate_function_calls, [(function_name, kwargs)])
+        timer.time_stage('functions_fused', outposts_query_results.evaluate_function_calls, function_calls)
+
+    timer.time_stage('output', env_manager.output_data_to_file, output_path=output_path)
+
+
+def run_benchmark(workload: str, num_outposts: int, num_scouts: int, args, work_directory: str) -> list[dict]:
+    """
+
+    :return: List of stage records.
+    """
+    outpost_file, scout_file = create_unit_files(workload, num_outposts, num_scouts, work_directory,
+                                                 args.input_format)
+    env_manager = EnvironmentManager(outpost_unit_files={outpost_file},
+                                     scout_unit_files={scout_file},
+                                     distance_model=args.distance_model,
+                                     spatial_index_backend=args.backend,
+                                     collect_stats=True)
+    stack_analysis_functions(env_manager, scan_range=args.scan_range, nearest_count=args.nearest_count)
+
+    timer = StageTimer(trace_memory=args.trace_memory)
+    run_stages(env_manager, timer, output_path=os.path.join(work_directory, f"results{args.output_format}"))
+
+    num_neighbors = sum(len(names_combination.outposts_query_results.neighbor_table.scout_ids)
+                        for names_combination in env_manager.unit_names_combinations_manager.combinations)
+    for record in timer.records:
+        record.update(workload=workload, num_outposts=num_outposts, num_scouts=num_scouts,
+                      num_neighbors=num_neighbors, run_counters=env_manager.stats.counters)
+    return timer.records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workloads', nargs='+', default=list(synthetic_workloads.WORKLOADS.keys()),
+                        choices=list(synthetic_workloads.WORKLOADS.keys()))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1_000, 10_000, 100_000],
+                        help="Numbers of Scouts. Up to 10,000,000 is supported, given memory.")
+    parser.add_argument('--num-outposts', type=int, default=None,
+                        help="Number of Outposts in every run. Defaults to the run's number of Scouts.")
+    parser.add_argument('--scan-range', type=float, default=2.0,
+                        help="Smallest stacked scan range in miles. Twice it is the largest.")
+    parser.add_argument('--nearest-count', type=int, default=3, help="k of the stacked nearest_scouts. 0 skips it.")
+    parser.add_argument('--backend', default='rtree')
+    parser.add_argument('--distance-model', default='geodesic')
+    parser.add_argument('--input-format', default='.csv', choices=list(INPUT_WRITERS.keys()))
+    parser.add_argument('--output-format', default='.csv')
+    parser.add_argument('--no-trace-memory', dest='trace_memory', action='store_false',
+                        help="Skip tracemalloc, which slows allocation-heavy stages.")
+    parser.add_argument('--results-path', default='benchmark_results.jsonl')
+    parser.add_argument('--work-directory', default=None,
+                        help="Directory for the generated files. Defaults to a temporary directory.")
+    args = parser.parse_args()
+
+    # Per-stage log lines would be timed along with the stages
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.trace_memory:
+        tracemalloc.start()
+
+    run_metadata = {
+        'run_started': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'git_commit': _get_git_commit(),
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'backend': args.backend,
+        'distance_model': args.distance_model,
+        'scan_range': args.scan_range,
+        'nearest_count': args.nearest_count,
+        'input_format': args.input_format,
+        'output_format': args.output_format,
+        'trace_memory': args.trace_memory
+    }
+
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        work_directory = args.work_directory or temporary_directory
+        os.makedirs(work_directory, exist_ok=True)
+        for workload in args.workloads:
+            for num_scouts in args.sizes:
+                num_outposts = args.num_outposts or num_scouts
+                records = run_benchmark(workload, num_outposts, num_scouts, args, work_directory)
+                with open(args.results_path, 'a') as results_file:
+                    for record in records:
+                        results_file.write(json.dumps({**run_metadata, **record}) + '\n')
+
+                print(f"\n{workload}: {num_outposts:,} outposts, {num_scouts:,} scouts, "
+                      f"{records[0]['num_neighbors']:,} neighbors")
+                for record in records:
+                    peak_note = ""
+                    if record['peak_traced_bytes'] is not None:
+                        peak_increase = record['peak_traced_bytes'] - record['traced_bytes_at_start']
+                        peak_note = f"{peak_increase / 2 ** 20:10.1f} MiB peak increase"
+                    print(f"  {record['stage'][:70]:<70} {record['wall_seconds']:9.3f} s wall "
+                          f"{record['cpu_seconds']:9.3f} s cpu {peak_note}")
+    print(f"\nResults appended to '{args.results_path}'.")
+
+
+if __name__ == '__main__':
+    main()
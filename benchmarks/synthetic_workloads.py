@@ -0,0 +1,139 @@
+"""
+Synthetic point datasets over the continental US, shaped like real Outpost and Scout files.
+
+Each workload draws its points with rng, and its fixed geography (city centers, roads) with layout_rng, so Outposts and
+Scouts generated with different seeds but the same layout seed share their cities and roads.
+"""
+import numpy as np
+import pandas as pd
+
+# (south, north, west, east) bounds of the generated points
+US_BOUNDS = (25.0, 49.0, -124.0, -67.0)
+
+SCOUT_NAMES = ["McDonald's", 'Taco Bell', 'Wendys', 'Subway', 'Burger King']
+
+
+def _clip_to_bounds(latitudes: np.ndarray, longitudes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    south, north, west, east = US_BOUNDS
+    return np.clip(latitudes, south, north), np.clip(longitudes, west, east)
+
+
+def uniform_points(num_points: int, rng: np.random.Generator,
+                   layout_rng: np.random.Generator = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+
+    :return: Tuple of (latitudes, longitudes) spread evenly over the continental US.
+    """
+    south, north, west, east = US_BOUNDS
+    return rng.uniform(south, north, num_points), rng.uniform(west, east, num_points)
+
+
+def urban_points(num_points: int, rng: np.random.Generator, layout_rng: np.random.Generator, num_cities: int = 100,
+                 rural_share: float = 0.2) -> tuple[np.ndarray, np.ndarray]:
+    """
+
+    :return: Tuple of (latitudes, longitudes) clustered around num_cities city centers of varying size and spread, with
+        rural_share of the points spread evenly.
+    """
+    city_latitudes, city_longitudes = uniform_points(num_cities, layout_rng)
+    # City sizes follow a heavy-tailed distribution, as real populations do
+    city_weights = layout_rng.pareto(1.2, num_cities) + 1
+    city_spreads = layout_rng.uniform(0.03, 0.3, num_cities)
+
+    num_urban = int(num_points * (1 - rural_share))
+    cities = rng.choice(num_cities, num_urban, p=city_weights / city_weights.sum())
+    urban_latitudes = city_latitudes[cities] + rng.normal(0, city_spreads[cities])
+    urban_longitudes = city_longitudes[cities] + rng.normal(0, city_spreads[cities])
+
+    rural_latitudes, rural_longitudes = uniform_points(num_points - num_urban, rng)
+    return _clip_to_bounds(np.concatenate((urban_latitudes, rural_latitudes)),
+                           np.concatenate((urban_longitudes, rural_longitudes)))
+
+
+def road_points(num_points: int, rng: np.random.Generator, layout_rng: np.random.Generator, num_roads: int = 200,
+                jitter: float = 0.002) -> tuple[np.ndarray, np.ndarray]:
+    """
+
+    :return: Tuple of (latitudes, longitudes) along num_roads straight roads between random endpoints, each point offset
+        from its road by up to about jitter degrees.
+    """
+    start_latitudes, start_longitudes = uniform_points(num_roads, layout_rng)
+    end_latitudes, end_longitudes = uniform_points(num_roads, layout_rng)
+
+    roads = rng.integers(0, num_roads, num_points)
+    fractions = rng.random(num_points)
+    latitudes = start_latitudes[roads] + fractions * (end_latitudes[roads] - start_latitudes[roads])
+    longitudes = start_longitudes[roads] + fractions * (end_longitudes[roads] - start_longitudes[roads])
+    return _clip_to_bounds(latitudes + rng.normal(0, jitter, num_points),
+                           longitudes + rng.normal(0, jitter, num_points))
+
+
+def duplicate_points(num_points: int, rng: np.random.Generator, layout_rng: np.random.Generator,
+                     unique_share: float = 0.05) -> tuple[np.ndarray, np.ndarray]:
+    """
+
+    :return: Tuple of (latitudes, longitudes) drawn from urban_points coordinates, only unique_share of them distinct,
+        like geocodes snapped to ZIP code or city centroids.
+    """
+    num_unique = max(1, int(num_points * unique_share))
+    unique_latitudes, unique_longitudes = urban_points(num_unique, rng, layout_rng)
+    sources = rng.integers(0, num_unique, num_points)
+    return unique_latitudes[sources], unique_longitudes[sources]
+
+
+WORKLOADS = {
+    'uniform': uniform_points,
+    'urban': urban_points,
+    'roads': road_points,
+    'duplicates': duplicate_points
+}
+
+
+def create_points(workload: str, num_points: int, seed: int,
+                  layout_seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+
+    :param workload: One of the keys of WORKLOADS.
+    :param seed: Seed of the points.
+    :param layout_seed: Seed of the workload's geography.
+    :return: Tuple of (latitudes, longitudes) rounded to 6 decimals, as coordinates usually are in input files.
+    """
+    if workload not in WORKLOADS:
+        raise KeyError(f"Requested invalid workload {workload}.\n"
+                       f"Valid workloads: {list(WORKLOADS.keys())}")
+    latitudes, longitudes = WORKLOADS[workload](num_points, np.random.default_rng(seed),
+                                                np.random.default_rng(layout_seed))
+    return latitudes.round(6), longitudes.round(6)
+
+
+def create_outposts_dataframe(workload: str, num_outposts: int, seed: int = 0) -> pd.DataFrame:
+    """
+
+    :return: DataFrame of Outposts with 'latitude', 'longitude', 'GISJOIN' id and 'POP' population columns.
+    """
+    latitudes, longitudes = create_points(workload, num_outposts, seed)
+    rng = np.random.default_rng([seed, 1])
+    return pd.DataFrame({
+        'latitude': latitudes,
+        'longitude': longitudes,
+        'GISJOIN': np.char.add('G', np.arange(num_outposts).astype(str)),
+        'POP': rng.integers(0, 10_000, num_outposts)
+    })
+
+
+def create_scouts_dataframe(workload: str, num_scouts: int, seed: int = 0) -> pd.DataFrame:
+    """
+
+    :return: DataFrame of Scouts with 'latitude', 'longitude', categorical 'name' and numeric 'revenue' columns. One in
+        ten revenues is missing.
+    """
+    latitudes, longitudes = create_points(workload, num_scouts, seed)
+    rng = np.random.default_rng([seed, 1])
+    revenues = rng.uniform(0.0, 1e6, num_scouts)
+    revenues[rng.random(num_scouts) < 0.1] = np.nan
+    return pd.DataFrame({
+        'latitude': latitudes,
+        'longitude': longitudes,
+        'name': rng.choice(SCOUT_NAMES, num_scouts),
+        'revenue': revenues
+    })
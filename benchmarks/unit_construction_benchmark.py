@@ -0,0 +1,104 @@
+"""
+Times building Outpost and Scout units from a DataFrame: the original row-wise construction, which read every cell with
+DataFrame.loc and created one object per row, against the columnar OutpostsManager and ScoutsManager constructors.
+
+Usage: python benchmarks/unit_construction_benchmark.py [--rows 1000000] [--legacy-rows 1000000] [--skip-legacy]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from units import OutpostsManager, ScoutsManager
+
+
+def create_dataframe(num_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+
+    :return: DataFrame of num_rows points across the continental US, with one in ten rows duplicating the coordinate of
+        another row, and an id, numeric and categorical column.
+    """
+    rng = np.random.default_rng(seed)
+    latitudes = rng.uniform(25.0, 49.0, num_rows).round(6)
+    longitudes = rng.uniform(-124.0, -67.0, num_rows).round(6)
+    duplicates = rng.random(num_rows) < 0.1
+    sources = rng.integers(0, num_rows, np.count_nonzero(duplicates))
+    latitudes[duplicates] = latitudes[sources]
+    longitudes[duplicates] = longitudes[sources]
+    return pd.DataFrame({
+        'latitude': latitudes,
+        'longitude': longitudes,
+        'id': np.arange(num_rows).astype(str),
+        'revenue': rng.uniform(0.0, 1e6, num_rows),
+        'name': rng.choice(["McDonald's", 'Taco Bell', 'Wendys', 'Subway'], num_rows)
+    })
+
+
+def legacy_create_units(dataframe: pd.DataFrame, lat_column_name: str, lon_column_name: str,
+                        extra_column_names: list) -> dict:
+    """
+    The construction used before the columnar managers: every row read through DataFrame.loc into a per-row object,
+    grouped in a dict by coordinate.
+    """
+    coordinate_to_units = {}
+    for row_index in dataframe.index:
+        latitude = dataframe.loc[row_index, lat_column_name]
+        longitude = dataframe.loc[row_index, lon_column_name]
+        coordinate = (latitude, longitude)
+
+        unit_data = {}
+        for extra_column_name in extra_column_names:
+            unit_data[extra_column_name] = dataframe.loc[row_index, extra_column_name]
+
+        coordinate_to_units.setdefault(coordinate, []).append((coordinate, unit_data))
+    return coordinate_to_units
+
+
+def time_call(func, *args, **kwargs) -> float:
+    start_time = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--legacy-rows', type=int, default=None,
+                        help="Rows timed with the legacy construction, which is then extrapolated to --rows. "
+                             "Defaults to --rows.")
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+
+    extra_column_names = ['id', 'revenue', 'name']
+    dataframe = create_dataframe(args.rows)
+    print(f"rows: {args.rows:,}")
+
+    outposts_manager = OutpostsManager(name='benchmark_outposts')
+    outposts_seconds = time_call(outposts_manager.create_outposts, dataframe, 'latitude', 'longitude',
+                                 extra_column_names)
+    print(f"OutpostsManager.create_outposts: {outposts_seconds:.3f} s "
+          f"({outposts_manager.coordinate_groups.get_num_groups():,} unique coordinates)")
+
+    scouts_manager = ScoutsManager(name='benchmark_scouts')
+    scouts_seconds = time_call(scouts_manager.create_scouts, dataframe, 'latitude', 'longitude', extra_column_names)
+    print(f"ScoutsManager.create_scouts: {scouts_seconds:.3f} s")
+
+    if args.skip_legacy:
+        return
+
+    legacy_rows = min(args.legacy_rows or args.rows, args.rows)
+    legacy_seconds = time_call(legacy_create_units, dataframe.iloc[:legacy_rows], 'latitude', 'longitude',
+                               extra_column_names)
+    legacy_seconds *= args.rows / legacy_rows
+    estimate_note = f" (extrapolated from {legacy_rows:,} rows)" if legacy_rows < args.rows else ""
+    print(f"legacy row-wise construction: {legacy_seconds:.3f} s{estimate_note}")
+    print(f"speedup: {legacy_seconds / outposts_seconds:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
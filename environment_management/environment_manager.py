@@ -1,31 +1,160 @@
+import contextlib
+import hashlib
 import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
 
 import stack
 from .map_classes import FileToUnitManagersMap, FileToRtreeAnalyzerMap, FileToDataFrameMap
-from rtree_modules import rtree_analysis
-from units import OutpostsManager, ScoutsManager
-from . import unit_names_combinations_manager
+from rtree_modules import distance_calculation, parallel_scanning, spatial_index_backends
+from units import OutpostsManager, ScoutsManager, ScoutsManagersView
+from units.column_arrays import column_from_series
+from units.outpost.neighbor_table import NeighborTable
+from units.outpost.outposts_query_results import ANALYSIS_QUERY_STRINGS, OutpostsQueryResults
+from units.outpost.streaming_aggregation import StreamingAggregator
+from units.scout.scouts_manager import SCOUT_FILE_TAG_COLUMN
+from . import result_cache, run_stats, unit_names_combinations_manager
 from io_handling import dataframe_loading as df_load, unit_file, output_handling
 
 logging.basicConfig(level=logging.INFO)
 
+# Name of the ScoutsManager and spatial index holding every Scout file when Scout indexes are merged
+MERGED_SCOUTS_NAME = 'merged_scouts'
+
+# Number of rows read from the start of each Outpost file to type the columns of streamed results
+STREAMING_TEMPLATE_SAMPLE_SIZE = 10_000
+
+# Stacked analysis functions evaluated over the nearest table instead of the range join
+NEAREST_TABLE_FUNCTIONS = ('nearest_scouts',)
+
+# Stacked range analysis functions whose results depend on distance values
+DISTANCE_VALUE_FUNCTIONS = ('nearest_scout', 'distance_weighted_average_scouts_by_variable')
+
+
+def _get_call_scan_ranges(kwargs: dict) -> list:
+    """
+
+    :return: The scan ranges an analysis function call's results depend on: its scan_range, or its ring breaks.
+    """
+    return ([kwargs['scan_range']] if 'scan_range' in kwargs else []) + list(kwargs.get('breaks', []))
+
+
+def _widen_range(scan_range):
+    return np.asarray(scan_range, dtype=np.float64) * (1 + 1e-9) + 1e-9
+
 
 class EnvironmentManager:
 
     def __init__(self,
                  outpost_unit_files: set[unit_file.UnitFile],
-                 scout_unit_files: set[unit_file.UnitFile]
+                 scout_unit_files: set[unit_file.UnitFile],
+                 distance_model: str = 'geodesic',
+                 rtree_cache_directory: str = None,
+                 spatial_index_backend: str = 'rtree',
+                 num_workers: int = 1,
+                 worker_start_method: str = None,
+                 merge_scout_indexes: bool = False,
+                 result_cache_directory: str = None,
+                 result_cache_max_bytes: int = 2 ** 30,
+                 outpost_snap_tolerance: float = None,
+                 collect_stats: bool = False,
+                 stats_sink=None,
+                 aggregate_join: bool = False
                  ):
+        """
+
+        :param outpost_unit_files: UnitFile objects for each Outpost dataset.
+        :param scout_unit_files: UnitFile objects for each Scout dataset.
+        :param distance_model: Distance model used for Outpost to Scout distances. One of 'geodesic', 'haversine',
+            'equirectangular', or 'exact'. See rtree_modules.distance_calculation for each model's error bound.
+        :param rtree_cache_directory: Optional directory in which Scout Rtrees are persisted, keyed by each Scout
+            file's contents and coordinate columns. Later runs against the same Scout file load the Rtree instead of
+            rebuilding it.
+        :param spatial_index_backend: Spatial index used to find Scouts around each Outpost. 'rtree' (default) for a
+            libspatialindex Rtree queried with lat/lon bounding boxes, or 'kdtree' for a scipy KD-tree on the unit
+            sphere queried by chord length. Only the 'rtree' backend is persisted to rtree_cache_directory.
+        :param num_workers: Number of processes Outposts are scanned with. Outposts are sharded across the processes,
+            which share the read-only spatial indexes; results are the same as with the default of 1 (serial). The
+            processes are started on the first parallel scan of each spatial index and kept until close is called.
+        :param worker_start_method: Optional multiprocessing start method of the worker processes, e.g. 'fork' or
+            'spawn'. Defaults to the platform's default.
+        :param merge_scout_indexes: If True, the Scouts of every Scout file are merged into one ScoutsManager with one
+            spatial index, so each Outpost is queried once regardless of the number of Scout files. Each Scout's file
+            alias is kept in the 'scout_file' variable, for per-file analysis functions.
+        :param result_cache_directory: Optional directory in which analysis results are cached, keyed by the Outpost and
+            Scout file contents and coordinate columns, the distance model, and each analysis function call's arguments.
+            process_analysis_functions then only computes the calls that aren't cached, from a cached join at an equal
+            or larger scan range when there is one.
+        :param result_cache_max_bytes: Size limit of the result cache. Least recently used entries are evicted first.
+        :param outpost_snap_tolerance: Optional grid spacing in degrees. Outposts are always joined and analyzed once
+            per unique coordinate; with a snap tolerance, Outposts in the same grid cell share one query at the cell's
+            grid point instead. 0.0001 degrees is about 36 feet of latitude.
+        :param collect_stats: If True, stage times, counters of spatial index candidates and distance evaluations, and
+            a histogram of neighbors per unique Outpost coordinate are collected in the EnvironmentManager's stats, a
+            run_stats.RunStats.
+        :param stats_sink: Optional callable passed the stats at the end of process_analysis_functions,
+            stream_analysis_functions, output_data_to_file and apply_scout_changes, e.g. run_stats.logging_stats_sink
+            or a run_stats.JsonLinesStatsSink. Stats are cumulative over the EnvironmentManager's runs.
+        :param aggregate_join: If True, each block of Scouts found by the range join is reduced straight into running
+            aggregates of the stacked analysis functions and dropped, so no Outpost's neighbors are held. Every stacked
+            function must be nearest_scouts or have a streaming implementation (see
+            StreamingAggregator.streaming_function_names). Range analysis functions can't be called after
+            process_analysis_functions, and apply_scout_changes and result caching are unavailable.
+        """
+        if aggregate_join and result_cache_directory:
+            raise ValueError("aggregate_join keeps no neighbor tables, so it can't be used with a result cache.")
 
         self.outpost_unit_files = outpost_unit_files
         self.scout_unit_files = scout_unit_files
+        self.distance_model = distance_model
+        self.rtree_cache_directory = rtree_cache_directory
+        self.spatial_index_backend = spatial_index_backend
+        self.outpost_scanner = parallel_scanning.ParallelOutpostScanner(num_workers=num_workers,
+                                                                        start_method=worker_start_method)
+        self.merge_scout_indexes = merge_scout_indexes
+        self.outpost_snap_tolerance = outpost_snap_tolerance
+        self.result_cache = None
+        if result_cache_directory:
+            self.result_cache = result_cache.ResultCache(cache_directory=result_cache_directory,
+                                                         max_size_bytes=result_cache_max_bytes)
+        self.stats = run_stats.RunStats() if collect_stats else None
+        self.stats_sink = stats_sink
+        self.aggregate_join = aggregate_join
 
+        self.file_to_unit_managers_map = None
         self.file_to_rtree_analyzer_map = None
         self.unit_names_combinations_manager = None
+        # OutpostsManager name: spatial index over its Outposts, used to find the Outposts around changed Scouts
+        self.outposts_index_map = {}
 
         self.func_stack = stack.FunctionStack()
         self.done_called = False
 
+    def close(self):
+        """
+        Stops the worker processes of parallel scans. The EnvironmentManager stays usable; later parallel scans start
+        new worker processes.
+        """
+        self.outpost_scanner.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _time_stage(self, stage_name: str):
+        if self.stats is None:
+            return contextlib.nullcontext()
+        return self.stats.time_stage(stage_name)
+
+    def _emit_stats(self):
+        if self.stats is not None and self.stats_sink is not None:
+            self.stats_sink(self.stats)
+
     @staticmethod
     def _combine_column_names(*args) -> list:
         """
@@ -46,77 +175,146 @@ class EnvironmentManager:
                 raise TypeError(f"Column names not expected type list or str, is {type(value)}")
         return combined_list
 
-    def _load_dfs_into_map(self) -> FileToDataFrameMap:
+    def _load_dfs_into_map(self, include_outposts: bool = True) -> FileToDataFrameMap:
         """
         Reads file information from UnitFile objects into a DataFrame, and then loads that into a
         FileToDataFrameMap class object.
 
+        :param include_outposts: Whether to load the Outpost files. Streaming runs read them chunk by chunk instead.
         :return: FileToDataFrameMap object loaded with DataFrames from Outpost and Scout UnitFile objects
         """
 
-        file_to_df_map = FileToDataFrameMap()
-        for outpost_file in self.outpost_unit_files:
-            column_names = outpost_file.get_all_column_names()
-            df = df_load.load_dataframe(file_path=outpost_file.file_path,
-                                        column_names=column_names,
-                                        sheet_name=outpost_file.sheet_name)
-            logging.info(f"DataFrame at file path '{outpost_file.file_path}' loaded.")
-            file_to_df_map.add_dataframe(name=outpost_file.file_alias,
-                                         unit_type='outpost',
-                                         dataframe=df)
-        for scout_file in self.scout_unit_files:
-            column_names = scout_file.get_all_column_names()
-            df = df_load.load_dataframe(file_path=scout_file.file_path,
-                                        column_names=column_names,
-                                        sheet_name=scout_file.sheet_name)
-            logging.info(f"DataFrame at file path '{scout_file.file_path}' loaded.")
-            file_to_df_map.add_dataframe(name=scout_file.file_alias,
-                                         unit_type='scout',
-                                         dataframe=df)
+        with self._time_stage('load'):
+            file_to_df_map = FileToDataFrameMap()
+            for outpost_file in self.outpost_unit_files if include_outposts else []:
+                column_names = outpost_file.get_all_column_names()
+                df = df_load.load_dataframe(file_path=outpost_file.file_path,
+                                            column_names=column_names,
+                                            sheet_name=outpost_file.sheet_name,
+                                            dtypes=outpost_file.get_column_dtypes(),
+                                            row_groups=outpost_file.row_groups)
+                logging.info(f"DataFrame at file path '{outpost_file.file_path}' loaded.")
+                file_to_df_map.add_dataframe(name=outpost_file.file_alias,
+                                             unit_type='outpost',
+                                             dataframe=df)
+            for scout_file in self.scout_unit_files:
+                column_names = scout_file.get_all_column_names()
+                df = df_load.load_dataframe(file_path=scout_file.file_path,
+                                            column_names=column_names,
+                                            sheet_name=scout_file.sheet_name,
+                                            dtypes=scout_file.get_column_dtypes(),
+                                            row_groups=scout_file.row_groups)
+                logging.info(f"DataFrame at file path '{scout_file.file_path}' loaded.")
+                file_to_df_map.add_dataframe(name=scout_file.file_alias,
+                                             unit_type='scout',
+                                             dataframe=df)
         return file_to_df_map
 
+    def _get_rtree_cache_basename(self, scouts_cache_key: str, scout_latitudes, scout_longitudes):
+        if not self.rtree_cache_directory or self.spatial_index_backend != 'rtree':
+            return None
+
+        # Rtree ids are positions in the scout hub coordinate arrays, so their order is part of the key
+        coordinates_hash = hashlib.sha256(scout_latitudes.tobytes() + scout_longitudes.tobytes()).hexdigest()[:16]
+        os.makedirs(self.rtree_cache_directory, exist_ok=True)
+        return os.path.join(self.rtree_cache_directory,
+                            f"scout_rtree_{scouts_cache_key}_{coordinates_hash}")
+
+    def _get_scouts_cache_keys(self) -> dict:
+        """
+
+        :return: Dict of indexed ScoutsManager name: key identifying its coordinates. The merged ScoutsManager's key
+            combines the keys of every Scout file.
+        """
+        scouts_cache_keys = {scout_file.file_alias: scout_file.get_coordinates_cache_key()
+                             for scout_file in self.scout_unit_files}
+        if not self.merge_scout_indexes:
+            return scouts_cache_keys
+
+        key_string = '|'.join(f"{name}={scouts_cache_keys[name]}" for name in sorted(scouts_cache_keys))
+        return {MERGED_SCOUTS_NAME: hashlib.sha256(key_string.encode('utf-8')).hexdigest()}
+
+    def _get_scouts_managers(self, file_to_unit_managers_map: FileToUnitManagersMap, scout_names) -> list:
+        """
+
+        :return: The ScoutsManagers analyzed for the Scout file names: the merged ScoutsManager if Scout indexes are
+            merged, otherwise one ScoutsManager per file.
+        """
+        if self.merge_scout_indexes:
+            return [file_to_unit_managers_map.get_manager(name=MERGED_SCOUTS_NAME, unit_type='scout')]
+        return [file_to_unit_managers_map.get_manager(name=scout_name, unit_type='scout')
+                for scout_name in sorted(scout_names)]
+
     def _generate_rtree_analyzer_map(self, file_to_unit_managers_map: FileToUnitManagersMap) -> FileToRtreeAnalyzerMap:
         """
-        Uses the ScoutManager's from the FileToUnitManagersMap to generate RtreeAnalyzer class objects,
-        and then load them into the FileToRtreeAnalyzerMap class object.
+        Uses the ScoutManager's from the FileToUnitManagersMap to generate SpatialIndexAnalyzer class objects of the
+        EnvironmentManager's spatial index backend, and then load them into the FileToRtreeAnalyzerMap class object.
 
         :param file_to_unit_managers_map: FileToUnitManagersMap object loaded with UnitManagers
-        :return: FileToRtreeAnalyzerMap loaded with RtreeAnalyzer class objects
+        :return: FileToRtreeAnalyzerMap loaded with SpatialIndexAnalyzer class objects
         """
         rtree_map = FileToRtreeAnalyzerMap()
-        for scout_file in self.scout_unit_files:
-            scout_manager = file_to_unit_managers_map.get_manager(name=scout_file.file_alias,
+        for scouts_name, scouts_cache_key in self._get_scouts_cache_keys().items():
+            scout_manager = file_to_unit_managers_map.get_manager(name=scouts_name,
                                                                   unit_type='scout')
-            scout_coordinates = scout_manager.get_all_scout_coordinates()
-            new_rtree_analyzer = rtree_analysis.RtreeAnalyzer()
-            new_rtree_analyzer.create_rtree(scout_coordinates=scout_coordinates)
+            scout_latitudes, scout_longitudes = scout_manager.get_scout_hub_coordinates()
+            new_rtree_analyzer = spatial_index_backends.create_spatial_index_analyzer(
+                backend=self.spatial_index_backend,
+                distance_model=self.distance_model
+            )
+
+            cache_basename = self._get_rtree_cache_basename(scouts_cache_key, scout_latitudes, scout_longitudes)
+            start_time = time.perf_counter()
+            if cache_basename and new_rtree_analyzer.load_index(scout_latitudes=scout_latitudes,
+                                                                scout_longitudes=scout_longitudes,
+                                                                cache_basename=cache_basename):
+                logging.info(f"Spatial index for '{scouts_name}' loaded from cache '{cache_basename}' in "
+                             f"{time.perf_counter() - start_time:.3f} seconds.")
+            else:
+                new_rtree_analyzer.create_index(scout_latitudes=scout_latitudes,
+                                                scout_longitudes=scout_longitudes,
+                                                cache_basename=cache_basename)
+                logging.info(f"{self.spatial_index_backend} spatial index for '{scouts_name}' built in "
+                             f"{time.perf_counter() - start_time:.3f} seconds.")
 
-            rtree_map.add_rtree_analyzer(name=scout_file.file_alias,
+            new_rtree_analyzer.stats = self.stats
+            rtree_map.add_rtree_analyzer(name=scouts_name,
                                          rtree_analyzer=new_rtree_analyzer)
         return rtree_map
 
-    def _generate_unit_managers_map(self, file_to_df_map: FileToDataFrameMap) -> FileToUnitManagersMap:
+    def _create_outposts_manager(self, outpost_file: unit_file.UnitFile, dataframe) -> OutpostsManager:
+        outpost_manager = OutpostsManager(name=outpost_file.file_alias)
+        outpost_manager.create_outposts(dataframe=dataframe,
+                                        lat_column_name=outpost_file.latitude_column_name,
+                                        lon_column_name=outpost_file.longitude_column_name,
+                                        extra_column_names=outpost_file.extra_column_names,
+                                        snap_tolerance=self.outpost_snap_tolerance)
+        if self.stats is not None:
+            self.stats.increment('outposts_created', outpost_manager.get_num_outposts())
+            self.stats.increment('outpost_hubs_created', outpost_manager.coordinate_groups.get_num_groups())
+        return outpost_manager
+
+    def _generate_unit_managers_map(self, file_to_df_map: FileToDataFrameMap,
+                                    include_outposts: bool = True) -> FileToUnitManagersMap:
         """
 
         :param file_to_df_map: FileToDataFrameMap class object loaded with DataFrames for each UnitFile
             object in the EnvironmentManager
+        :param include_outposts: Whether to create OutpostsManagers. Requires the Outpost DataFrames in file_to_df_map.
         :return: FileToUnitManagersMap class object loaded with UnitManager class objects for each Outpost and Scout
             UnitFile class object in the EnvironmentManager
         """
         file_to_unit_managers_map = FileToUnitManagersMap()
-        for outpost_file in self.outpost_unit_files:
+        for outpost_file in self.outpost_unit_files if include_outposts else []:
             dataframe = file_to_df_map.get_dataframe(name=outpost_file.file_alias,
                                                      unit_type='outpost')
 
-            outpost_manager = OutpostsManager(name=outpost_file.file_alias)
-            outpost_manager.create_outposts(dataframe=dataframe,
-                                            lat_column_name=outpost_file.latitude_column_name,
-                                            lon_column_name=outpost_file.longitude_column_name,
-                                            extra_column_names=outpost_file.extra_column_names)
+            outpost_manager = self._create_outposts_manager(outpost_file, dataframe)
             file_to_unit_managers_map.add_manager(manager=outpost_manager,
                                                   name=outpost_file.file_alias,
                                                   unit_type='outpost')
 
+        scouts_managers = []
         for scout_file in self.scout_unit_files:
             dataframe = file_to_df_map.get_dataframe(name=scout_file.file_alias,
                                                      unit_type='scout')
@@ -126,51 +324,67 @@ class EnvironmentManager:
                                         lat_column_name=scout_file.latitude_column_name,
                                         lon_column_name=scout_file.longitude_column_name,
                                         extra_column_names=scout_file.extra_column_names)
+            scouts_managers.append(scout_manager)
+
+        if self.merge_scout_indexes:
+            scouts_managers = [ScoutsManager.merge(name=MERGED_SCOUTS_NAME,
+                                                   scouts_managers=sorted(scouts_managers,
+                                                                          key=lambda manager: manager.name))]
+        for scout_manager in scouts_managers:
             file_to_unit_managers_map.add_manager(manager=scout_manager,
-                                                  name=scout_file.file_alias,
+                                                  name=scout_manager.name,
                                                   unit_type='scout')
+
+        if self.stats is not None:
+            self._count_scouts(file_to_unit_managers_map)
         return file_to_unit_managers_map
 
+    def _count_scouts(self, file_to_unit_managers_map: FileToUnitManagersMap):
+        for scouts_manager in file_to_unit_managers_map.scouts_managers_map.values():
+            self.stats.increment('scouts_created', scouts_manager.get_num_scouts())
+            self.stats.increment('scout_hubs_created', scouts_manager.coordinate_groups.get_num_groups())
+
     def _fill_unit_names_combinations_manager(self, file_to_unit_managers_map):
         """
-        Loads the UnitNamesCombinationsManager class object with the copies of its proper UnitManager objects.
+        Loads the UnitNamesCombinationsManager class object with its proper UnitManager objects. UnitManagers are
+        shared between combinations and never modified; each combination keeps its results in its own
+        OutpostsQueryResults.
 
         :param file_to_unit_managers_map: FileToUnitManagersMap object loaded with UnitManagers
         """
         file_processing_combinations = self.unit_names_combinations_manager.combinations
 
-        # Fill each NameCombinations object with its appropriate, un-queried unit managers
+        # Fill each NameCombinations object with its appropriate unit managers
         for name_combination in file_processing_combinations:
             outpost_name = name_combination.outpost_name
             outpost_manager = file_to_unit_managers_map.get_manager(name=outpost_name,
-                                                                    unit_type='outpost',
-                                                                    should_copy=True)
+                                                                    unit_type='outpost')
             name_combination.add_outpost_manager(outpost_manager)
 
-            scouts_managers = set()
-            for scout_name in name_combination.scout_names:
-                scout_manager = file_to_unit_managers_map.get_manager(name=scout_name,
-                                                                      unit_type='scout',
-                                                                      should_copy=True)
-                scouts_managers.add(scout_manager)
+            scouts_managers = self._get_scouts_managers(file_to_unit_managers_map=file_to_unit_managers_map,
+                                                        scout_names=name_combination.scout_names)
             name_combination.add_scouts_managers(scouts_managers)
 
+    def _add_scout_extra_column_names(self, scout_extra_column_names: list[str]):
+        for unit_file_obj in self.scout_unit_files:
+            if unit_file_obj.extra_column_names:
+                unit_file_obj.extra_column_names.extend(scout_extra_column_names)
+            else:
+                unit_file_obj.extra_column_names = scout_extra_column_names
+
     def _process_environment(self, scout_extra_column_names: list[str]):
         """
 
         :param scout_extra_column_names: The extra column names apart from latitude and longitude column names
         for variables analysis requested in the analysis functions.
         """
-        for unit_file_obj in self.scout_unit_files:
-            if unit_file_obj.extra_column_names:
-                unit_file_obj.extra_column_names.extend(scout_extra_column_names)
-            else:
-                unit_file_obj.extra_column_names = scout_extra_column_names
+        self._add_scout_extra_column_names(scout_extra_column_names)
 
         file_to_df_map = self._load_dfs_into_map()
 
-        # SubstringToUnitManagersMap stores only the base-loaded outposts to be copied from later.
-        file_to_unit_managers_map = self._generate_unit_managers_map(file_to_df_map)
+        # FileToUnitManagersMap stores the base-loaded units, shared by every combination.
+        with self._time_stage('unit_construction'):
+            file_to_unit_managers_map = self._generate_unit_managers_map(file_to_df_map)
 
         self.unit_names_combinations_manager = unit_names_combinations_manager.UnitNamesCombinationsManager(
             outpost_files=self.outpost_unit_files,
@@ -179,7 +393,17 @@ class EnvironmentManager:
 
         self._fill_unit_names_combinations_manager(file_to_unit_managers_map)
 
-        self.file_to_rtree_analyzer_map = self._generate_rtree_analyzer_map(file_to_unit_managers_map)
+        # Spatial indexes are built on first use, as cached joins don't need them
+        self.file_to_unit_managers_map = file_to_unit_managers_map
+        self.file_to_rtree_analyzer_map = None
+        # Worker processes hold copies of the previous spatial indexes
+        self.outpost_scanner.close()
+
+    def _get_rtree_analyzer(self, name: str):
+        if self.file_to_rtree_analyzer_map is None:
+            with self._time_stage('index_build'):
+                self.file_to_rtree_analyzer_map = self._generate_rtree_analyzer_map(self.file_to_unit_managers_map)
+        return self.file_to_rtree_analyzer_map.get_rtree_analyzer(name=name)
 
     def process_analysis_functions(self):
         """
@@ -191,46 +415,680 @@ class EnvironmentManager:
         """
         self.done_called = True
 
-        # Find the maximum scan range requested in the analysis functions, and the extra variable column
-        # names that should be read from the DataFrames
+        max_scan_range, scout_extra_column_names, max_nearest_count = self._get_stack_requirements()
+        function_calls = list(self.func_stack.function_call_generator())
+        self._check_aggregate_join(function_calls)
+        self._process_environment(scout_extra_column_names=scout_extra_column_names)
+
+        for names_combination in self.unit_names_combinations_manager.combinations:
+            if self.result_cache is None:
+                self._analyze_combination(scan_range=max_scan_range,
+                                          nearest_count=max_nearest_count,
+                                          outposts_query_results=names_combination.outposts_query_results,
+                                          scouts_managers=names_combination.scouts_managers,
+                                          function_calls=function_calls)
+            else:
+                self._process_cached_combination(names_combination=names_combination,
+                                                 scan_range=max_scan_range,
+                                                 nearest_count=max_nearest_count,
+                                                 function_calls=function_calls)
+            logging.info(f"{len(function_calls)} stacked analysis functions processed for OutpostsManager "
+                         f"{names_combination.outposts_manager.name}.")
+        self._emit_stats()
+
+    def _check_aggregate_join(self, function_calls: list):
+        if not self.aggregate_join:
+            return
+        unsupported_function_names = sorted({function_name for function_name, _ in function_calls
+                                             if not StreamingAggregator.supports_function(function_name)
+                                             and function_name not in NEAREST_TABLE_FUNCTIONS})
+        if unsupported_function_names:
+            raise ValueError(f"Stacked analysis functions {unsupported_function_names} need every Outpost's neighbors, "
+                             f"and can't be evaluated with aggregate_join.\n"
+                             f"Valid functions: {list(StreamingAggregator.streaming_function_names)} and "
+                             f"{list(NEAREST_TABLE_FUNCTIONS)}")
+
+    def _analyze_combination(self, scan_range, nearest_count, outposts_query_results, scouts_managers: list,
+                             function_calls: list):
+        """
+        Joins a combination's Outposts with its Scouts within scan_range and with their nearest Scouts, and evaluates
+        the stacked analysis function calls. With aggregate_join, the calls are aggregated during the join.
+        """
+        aggregator = None
+        if self.aggregate_join:
+            aggregator = self._aggregate_scouts_into_outposts_manager(scan_range=scan_range,
+                                                                      outposts_query_results=outposts_query_results,
+                                                                      scouts_managers=scouts_managers,
+                                                                      function_calls=function_calls)
+        else:
+            self._load_scouts_into_outposts_manager(scan_range=scan_range,
+                                                    outposts_query_results=outposts_query_results,
+                                                    scouts_managers=scouts_managers)
+        if nearest_count:
+            self._load_nearest_scouts_into_outposts_manager(k=nearest_count,
+                                                            outposts_query_results=outposts_query_results)
+        with self._time_stage('analysis_functions'):
+            if aggregator is None:
+                # The whole stack is evaluated in one fused pass over each combination's neighbors
+                outposts_query_results.evaluate_function_calls(function_calls)
+            else:
+                outposts_query_results.evaluate_aggregated_function_calls(function_calls, aggregator)
+
+    def _get_combination_cache_key(self, names_combination) -> str:
+        outpost_file = next(outpost_file for outpost_file in self.outpost_unit_files
+                            if outpost_file.file_alias == names_combination.outpost_name)
+        scout_files = [scout_file for scout_file in self.scout_unit_files
+                       if scout_file.file_alias in names_combination.scout_names]
+        combination_key = result_cache.ResultCache.create_combination_key(
+            outpost_file=outpost_file,
+            scout_files=scout_files,
+            distance_model=self.distance_model,
+            merge_scout_indexes=self.merge_scout_indexes,
+            outpost_snap_tolerance=self.outpost_snap_tolerance
+        )
+        self.result_cache.write_manifest(combination_key, [outpost_file] + scout_files)
+        return combination_key
+
+    def _process_cached_combination(self, names_combination, scan_range, nearest_count, function_calls: list):
+        """
+        Cached version of joining a combination and evaluating the stacked analysis function calls. Calls with cached
+        results are not evaluated again. Joins are loaded from the result cache when a cached table covers them, and
+        are otherwise run and cached.
+        """
+        outposts_query_results = names_combination.outposts_query_results
+        combination_key = self._get_combination_cache_key(names_combination)
+
+        neighbor_table = self.result_cache.get_neighbor_table(combination_key, scan_range)
+        if neighbor_table is None:
+            self._load_scouts_into_outposts_manager(scan_range=scan_range,
+                                                    outposts_query_results=outposts_query_results,
+                                                    scouts_managers=names_combination.scouts_managers)
+            self.result_cache.put_neighbor_table(combination_key, scan_range, outposts_query_results.neighbor_table)
+        else:
+            scout_columns = ScoutsManagersView(names_combination.scouts_managers)
+            outposts_query_results.set_neighbor_table(neighbor_table=neighbor_table,
+                                                      scout_columns=scout_columns)
+
+        if nearest_count:
+            nearest_table = self.result_cache.get_nearest_table(combination_key, nearest_count)
+            if nearest_table is None:
+                self._load_nearest_scouts_into_outposts_manager(k=nearest_count,
+                                                                outposts_query_results=outposts_query_results)
+                self.result_cache.put_nearest_table(combination_key, nearest_count,
+                                                    outposts_query_results.nearest_table)
+            else:
+                outposts_query_results.set_nearest_table(nearest_table)
+
+        function_results = [self.result_cache.get_call_results(combination_key, function_name, kwargs)
+                            for function_name, kwargs in function_calls]
+        missing_calls = [function_call for function_call, call_results in zip(function_calls, function_results)
+                         if call_results is None]
+        logging.info(f"{len(function_calls) - len(missing_calls)} of {len(function_calls)} analysis function results "
+                     f"for OutpostsManager {outposts_query_results.name} loaded from the result cache.")
+
+        with self._time_stage('analysis_functions'):
+            missing_results = iter(outposts_query_results.evaluate_function_calls(missing_calls))
+        for call_position, (function_name, kwargs) in enumerate(function_calls):
+            if function_results[call_position] is None:
+                function_results[call_position] = next(missing_results)
+                self.result_cache.put_call_results(combination_key, function_name, kwargs,
+                                                   function_results[call_position])
+        outposts_query_results.set_function_results(function_results)
+
+    def invalidate_result_cache(self, unit_file_obj: unit_file.UnitFile = None):
+        """
+        Removes cached results.
+
+        :param unit_file_obj: If provided, only the results of combinations including this UnitFile are removed.
+            Otherwise the whole result cache is cleared.
+        """
+        if self.result_cache is None:
+            raise ValueError("EnvironmentManager has no result cache. Pass result_cache_directory to use one.")
+
+        self.result_cache.invalidate(file_path=None if unit_file_obj is None else unit_file_obj.file_path)
+
+    def apply_scout_changes(self, scout_file_alias: str, inserted_scouts: pd.DataFrame = None,
+                            deleted_scouts: pd.DataFrame = None) -> dict:
+        """
+        Applies Scout inserts and deletes to an environment processed by process_analysis_functions, without reloading
+        any file. The Scouts' spatial index is updated in place, and the stacked analysis functions are evaluated again
+        only for the Outposts the changes can affect: those within the largest stacked scan range of a changed Scout,
+        and, if nearest_scouts is stacked, those whose nearest Scouts change. Results of analysis functions called after
+        process_analysis_functions are not updated. Neither the Scout file nor the result cache is changed.
+
+        :param scout_file_alias: File alias of the changed Scout file.
+        :param inserted_scouts: DataFrame of the inserted Scouts, with the Scout file's coordinate columns and any of
+            its extra columns. Extra columns left out are None for the inserted Scouts.
+        :param deleted_scouts: DataFrame of the deleted Scouts, with the Scout file's coordinate columns. Each row
+            deletes one Scout at its coordinate, which also matches any of the extra columns included.
+        :return: Dict of OutpostsManager name: number of Outposts whose results were recomputed.
+        """
+        if self.unit_names_combinations_manager is None:
+            raise ValueError("apply_scout_changes requires an environment processed by process_analysis_functions.")
+        if self.aggregate_join:
+            raise ValueError("apply_scout_changes requires the neighbor tables aggregate_join doesn't keep.")
+
+        scout_files = {scout_file.file_alias: scout_file for scout_file in self.scout_unit_files}
+        if scout_file_alias not in scout_files:
+            raise KeyError(f"Requested nonexistent Scout file alias {scout_file_alias}.\n"
+                           f"Valid Scout file aliases: {list(scout_files.keys())}")
+        scout_file = scout_files[scout_file_alias]
+
+        scouts_name = MERGED_SCOUTS_NAME if self.merge_scout_indexes else scout_file_alias
+        scouts_manager = self.file_to_unit_managers_map.get_manager(name=scouts_name,
+                                                                    unit_type='scout')
+        # The index must exist before the change, as indexes built from the changed hubs would include emptied hubs
+        rtree_analyzer = self._get_rtree_analyzer(name=scouts_name)
+
+        inserted_latitudes, inserted_longitudes, inserted_columns = self._get_scout_change_arrays(scout_file,
+                                                                                                  inserted_scouts)
+        deleted_latitudes, deleted_longitudes, deleted_columns = self._get_scout_change_arrays(scout_file,
+                                                                                               deleted_scouts)
+        deleted_scout_ids = scouts_manager.find_scout_ids(latitudes=deleted_latitudes,
+                                                          longitudes=deleted_longitudes,
+                                                          columns=deleted_columns)
+        # Read from the ScoutsManagers before apply_changes changes them
+        function_calls = list(self.func_stack.function_call_generator())
+        combination_function_calls = {
+            names_combination: names_combination.outposts_query_results.pin_function_calls(function_calls)
+            for names_combination in self.unit_names_combinations_manager.combinations
+        }
+
+        scout_id_map, filled_hub_ids, emptied_hub_ids = scouts_manager.apply_changes(
+            inserted_latitudes=inserted_latitudes,
+            inserted_longitudes=inserted_longitudes,
+            inserted_columns=inserted_columns,
+            deleted_scout_ids=deleted_scout_ids
+        )
+        hub_latitudes, hub_longitudes = scouts_manager.get_scout_hub_coordinates()
+        with self._time_stage('index_update'):
+            rtree_analyzer.update_index(scout_latitudes=hub_latitudes,
+                                        scout_longitudes=hub_longitudes,
+                                        inserted_hub_ids=filled_hub_ids,
+                                        deleted_hub_ids=emptied_hub_ids)
+
+        max_scan_range, _, max_nearest_count = self._get_stack_requirements()
+        num_changed_outposts = {}
+        for names_combination in self.unit_names_combinations_manager.combinations:
+            outposts_query_results = names_combination.outposts_query_results
+            outposts_manager = names_combination.outposts_manager
+            scout_columns = ScoutsManagersView(names_combination.scouts_managers)
+            combined_id_map = self._map_combined_scout_ids(
+                previous_scout_columns=outposts_query_results.scout_columns,
+                scout_columns=scout_columns,
+                manager_position=names_combination.scouts_managers.index(scouts_manager),
+                scout_id_map=scout_id_map
+            )
+
+            outpost_hub_ids = self._find_changed_outposts(
+                outposts_query_results=outposts_query_results,
+                changed_latitudes=np.concatenate((inserted_latitudes, deleted_latitudes)),
+                changed_longitudes=np.concatenate((inserted_longitudes, deleted_longitudes)),
+                inserted_latitudes=inserted_latitudes,
+                inserted_longitudes=inserted_longitudes,
+                scan_range=max_scan_range,
+                combined_id_map=combined_id_map,
+                nearest_count=max_nearest_count
+            )
+            hub_latitudes, hub_longitudes = outposts_manager.get_outpost_hub_coordinates()
+            # Replaced neighbors must hold distances as exact as the neighbors kept
+            exact_distances = outposts_query_results.neighbor_table.bounded_range is None
+            outpost_latitudes, outpost_longitudes = hub_latitudes[outpost_hub_ids], hub_longitudes[outpost_hub_ids]
+            nearest_table = None
+            if max_nearest_count:
+                nearest_table = self._find_nearest_scouts(k=max_nearest_count,
+                                                          outpost_latitudes=outpost_latitudes,
+                                                          outpost_longitudes=outpost_longitudes,
+                                                          scout_columns=scout_columns)
+            outposts_query_results.update_outposts(outpost_hub_ids=outpost_hub_ids,
+                                                   neighbor_table=self._join_scouts(
+                                                       scan_range=max_scan_range,
+                                                       outpost_latitudes=outpost_latitudes,
+                                                       outpost_longitudes=outpost_longitudes,
+                                                       scout_columns=scout_columns,
+                                                       exact_distances=exact_distances),
+                                                   nearest_table=nearest_table,
+                                                   scout_columns=scout_columns,
+                                                   scout_id_map=combined_id_map,
+                                                   function_calls=combination_function_calls[names_combination])
+
+            num_changed_outposts[outposts_manager.name] = int(
+                outposts_manager.coordinate_groups.get_group_sizes()[outpost_hub_ids].sum()
+            )
+            logging.info(f"Scout changes to '{scout_file_alias}' recomputed "
+                         f"{num_changed_outposts[outposts_manager.name]} of {outposts_manager.get_num_outposts()} "
+                         f"Outposts, at {len(outpost_hub_ids)} unique coordinates, in OutpostsManager "
+                         f"{outposts_manager.name}.")
+        self._emit_stats()
+        return num_changed_outposts
+
+    def _get_scout_change_arrays(self, scout_file: unit_file.UnitFile, dataframe: pd.DataFrame) -> tuple:
+        """
+
+        :return: Tuple of (latitudes, longitudes, dict of column name: values) of the changed Scouts in the DataFrame.
+            Scouts without coordinates are skipped, as they are when Scout files are loaded.
+        """
+        if dataframe is None:
+            return np.empty(0), np.empty(0), {}
+
+        latitudes = dataframe[scout_file.latitude_column_name].to_numpy(dtype=np.float64)
+        longitudes = dataframe[scout_file.longitude_column_name].to_numpy(dtype=np.float64)
+        has_coordinate = ~(np.isnan(latitudes) | np.isnan(longitudes))
+        columns = {col_name: column_from_series(dataframe[col_name])[has_coordinate]
+                   for col_name in scout_file.extra_column_names or [] if col_name in dataframe.columns}
+        if self.merge_scout_indexes:
+            columns[SCOUT_FILE_TAG_COLUMN] = np.full(np.count_nonzero(has_coordinate), scout_file.file_alias,
+                                                     dtype=object)
+        return latitudes[has_coordinate], longitudes[has_coordinate], columns
+
+    @staticmethod
+    def _map_combined_scout_ids(previous_scout_columns: ScoutsManagersView, scout_columns: ScoutsManagersView,
+                                manager_position: int, scout_id_map: np.ndarray) -> np.ndarray:
+        """
+
+        :param manager_position: Position of the changed ScoutsManager in both views.
+        :param scout_id_map: New row id of every previous row id of the changed ScoutsManager, or -1 if deleted.
+        :return: New combined id of every previous combined id, or -1 if deleted.
+        """
+        previous_offsets = previous_scout_columns.id_offsets
+        manager_positions = np.repeat(np.arange(len(previous_offsets) - 1), np.diff(previous_offsets))
+        combined_id_map = (np.arange(previous_offsets[-1], dtype=np.int64) - previous_offsets[manager_positions]
+                           + scout_columns.id_offsets[manager_positions])
+
+        changed_ids = slice(previous_offsets[manager_position], previous_offsets[manager_position + 1])
+        combined_id_map[changed_ids] = np.where(scout_id_map >= 0,
+                                                scout_columns.get_combined_ids(manager_position, scout_id_map), -1)
+        return combined_id_map
+
+    def _get_outposts_index(self, outposts_manager: OutpostsManager):
+        if outposts_manager.name not in self.outposts_index_map:
+            outposts_index = spatial_index_backends.create_spatial_index_analyzer(
+                backend=self.spatial_index_backend,
+                distance_model=self.distance_model
+            )
+            outposts_index.create_index(scout_latitudes=outposts_manager.coordinate_groups.hub_latitudes,
+                                        scout_longitudes=outposts_manager.coordinate_groups.hub_longitudes)
+            self.outposts_index_map[outposts_manager.name] = outposts_index
+        return self.outposts_index_map[outposts_manager.name]
+
+    def _find_outposts_around(self, outposts_manager: OutpostsManager, latitudes, longitudes, scan_range,
+                              exact_distances: bool = True) -> tuple[np.ndarray, np.ndarray]:
+        """
+
+        :param scan_range: Range in miles. Either one range for all coordinates, or an array with one range per
+            coordinate.
+        :param exact_distances: If False, distances are only upper bounds within the widened scan_range.
+        :return: Tuple of (outpost hub ids, distances), one entry per outpost hub within scan_range of a coordinate.
+        """
+        # Distances are measured from the coordinates to the Outposts rather than the other way around. The widened
+        # range keeps rounding differences from missing Outposts at exactly scan_range.
+        _, outpost_hub_ids, distances = self._get_outposts_index(outposts_manager).scan_for_scouts_in_outposts_range(
+            outpost_latitudes=latitudes,
+            outpost_longitudes=longitudes,
+            scan_range=_widen_range(scan_range),
+            exact_distances=exact_distances
+        )
+        return outpost_hub_ids, distances
+
+    def _find_changed_outposts(self, outposts_query_results, changed_latitudes, changed_longitudes, inserted_latitudes,
+                               inserted_longitudes, scan_range, combined_id_map, nearest_count) -> np.ndarray:
+        """
+
+        :return: Sorted ids of the outpost hubs whose results a Scout change can affect.
+        """
+        outposts_manager = outposts_query_results.outposts_manager
+        changed_hub_ids = [self._find_outposts_around(outposts_manager, changed_latitudes, changed_longitudes,
+                                                      scan_range, exact_distances=False)[0]]
+
+        nearest_table = outposts_query_results.nearest_table
+        if nearest_count and nearest_table is not None:
+            # Outposts losing one of their nearest Scouts
+            is_deleted = combined_id_map[nearest_table.scout_ids] < 0
+            changed_hub_ids.append(nearest_table.get_outpost_positions()[is_deleted])
+
+            # Outposts gaining an inserted Scout at most as far as their k-th nearest Scout, or with fewer than k
+            has_k_neighbors = nearest_table.get_num_neighbors() >= nearest_count
+            kth_distances = np.full(nearest_table.get_num_outposts(), np.inf)
+            kth_distances[has_k_neighbors] = nearest_table.distances[nearest_table.offsets[1:][has_k_neighbors] - 1]
+            if len(inserted_latitudes):
+                changed_hub_ids.append(np.flatnonzero(~has_k_neighbors))
+                if has_k_neighbors.any():
+                    outpost_hub_ids, distances = self._find_outposts_around(outposts_manager, inserted_latitudes,
+                                                                            inserted_longitudes,
+                                                                            kth_distances[has_k_neighbors].max())
+                    changed_hub_ids.append(
+                        outpost_hub_ids[distances <= _widen_range(kth_distances[outpost_hub_ids])]
+                    )
+        return np.unique(np.concatenate(changed_hub_ids))
+
+    def stream_analysis_functions(self, output_path, chunk_size: int = 100_000):
+        """
+        Streaming alternative to process_analysis_functions followed by output_data_to_file, for Outpost files too large
+        to hold in memory. The Scouts and their spatial indexes are loaded once and kept resident. Each Outpost file is
+        then read chunk_size rows at a time; every chunk is joined with the Scouts, run through the stacked analysis
+        functions, and written to output_path before the next chunk is read. Peak memory depends on chunk_size and the
+        Scouts, not on the number of Outposts. Results are not kept on the EnvironmentManager.
+
+        :param output_path: Output file path. Its extension selects the format; see output_handling.RESULTS_WRITERS.
+        :param chunk_size: Number of Outpost rows read and analyzed at once.
+        """
+        max_scan_range, scout_extra_column_names, max_nearest_count = self._get_stack_requirements()
+        function_calls = list(self.func_stack.function_call_generator())
+        self._check_aggregate_join(function_calls)
+        self._add_scout_extra_column_names(scout_extra_column_names)
+
+        file_to_df_map = self._load_dfs_into_map(include_outposts=False)
+        with self._time_stage('unit_construction'):
+            file_to_unit_managers_map = self._generate_unit_managers_map(file_to_df_map, include_outposts=False)
+        self.file_to_unit_managers_map = file_to_unit_managers_map
+        self.file_to_rtree_analyzer_map = None
+        # Worker processes hold copies of the previous spatial indexes
+        self.outpost_scanner.close()
+        scouts_managers = self._get_scouts_managers(
+            file_to_unit_managers_map=file_to_unit_managers_map,
+            scout_names=[scout_file.file_alias for scout_file in self.scout_unit_files]
+        )
+
+        # Every Outpost file's columns and every results column are known before the first chunk is written
+        template = self._create_streaming_template(function_calls=function_calls,
+                                                   scout_columns=ScoutsManagersView(scouts_managers),
+                                                   sample_size=min(chunk_size, STREAMING_TEMPLATE_SAMPLE_SIZE))
+        with output_handling.create_results_writer(output_path, template=template) as writer:
+            for outpost_file in self.outpost_unit_files:
+                dataframe_chunks = df_load.load_dataframe_chunks(file_path=outpost_file.file_path,
+                                                                 column_names=outpost_file.get_all_column_names(),
+                                                                 chunk_size=chunk_size,
+                                                                 sheet_name=outpost_file.sheet_name,
+                                                                 dtypes=outpost_file.get_column_dtypes(),
+                                                                 row_groups=outpost_file.row_groups)
+                for chunk_number, dataframe in enumerate(dataframe_chunks):
+                    outposts_query_results = OutpostsQueryResults(self._create_outposts_manager(outpost_file,
+                                                                                                dataframe))
+                    self._analyze_combination(scan_range=max_scan_range,
+                                              nearest_count=max_nearest_count,
+                                              outposts_query_results=outposts_query_results,
+                                              scouts_managers=scouts_managers,
+                                              function_calls=function_calls)
+                    with self._time_stage('output'):
+                        writer.write_batch(name=outpost_file.file_alias,
+                                           df=outposts_query_results.compile_query_data_into_df())
+                    logging.info(f"Chunk {chunk_number} ({len(dataframe)} Outposts) of '{outpost_file.file_path}' "
+                                 f"processed.")
+        self._emit_stats()
+
+    def _create_streaming_template(self, function_calls: list, scout_columns: ScoutsManagersView,
+                                   sample_size: int) -> pd.DataFrame:
+        """
+
+        :param sample_size: Number of rows read from the start of each Outpost file to type its columns.
+        :return: Template of the streamed results; see output_handling.create_template. It has the coordinate and extra
+            columns of every Outpost file, typed from their first rows, and the results columns of the function calls,
+            with their ANALYSIS_RESULT_DTYPES.
+        """
+        # Evaluating the calls over no Outposts gives every results column, as the calls would name it
+        empty_table = NeighborTable.from_pairs(num_outposts=0,
+                                               outpost_positions=np.empty(0, dtype=np.int64),
+                                               scout_ids=np.empty(0, dtype=np.int64),
+                                               distances=np.empty(0, dtype=np.float64))
+        empty_results = OutpostsQueryResults(OutpostsManager(name='template'))
+        empty_results.set_neighbor_table(neighbor_table=empty_table,
+                                         scout_columns=scout_columns)
+        empty_results.set_nearest_table(empty_table)
+        results_columns = {query_string: results.take([-1], allow_fill=True)
+                           for call_results in empty_results.evaluate_function_calls(function_calls)
+                           for query_string, results in call_results.items()}
+        # Scout variable columns are untyped, so they are typed from a value of the variable
+        for function_name, kwargs in function_calls:
+            if function_name == 'nearest_scouts' and kwargs.get('variable') is not None:
+                values = scout_columns.get_column(kwargs['variable'])
+                values = values[~pd.isna(values)][:1]
+                for rank in range(kwargs['k']):
+                    query_string = ANALYSIS_QUERY_STRINGS['nearest_scouts_variable'].format(rank=rank + 1,
+                                                                                           variable=kwargs['variable'])
+                    results_columns[query_string] = pd.array(values if len(values) else [None], dtype=object)
+
+        file_templates = []
+        for outpost_file in self.outpost_unit_files:
+            dataframe_chunks = df_load.load_dataframe_chunks(file_path=outpost_file.file_path,
+                                                             column_names=outpost_file.get_all_column_names(),
+                                                             chunk_size=sample_size,
+                                                             sheet_name=outpost_file.sheet_name,
+                                                             dtypes=outpost_file.get_column_dtypes(),
+                                                             row_groups=outpost_file.row_groups)
+            sample = next(dataframe_chunks, None)
+            if sample is None:
+                continue
+            outposts_query_results = OutpostsQueryResults(OutpostsManager(name=outpost_file.file_alias))
+            outposts_query_results.outposts_manager.create_outposts(
+                dataframe=sample,
+                lat_column_name=outpost_file.latitude_column_name,
+                lon_column_name=outpost_file.longitude_column_name,
+                extra_column_names=outpost_file.extra_column_names
+            )
+            file_template = output_handling.create_template([outposts_query_results.compile_query_data_into_df()])
+            file_templates.append(pd.concat([file_template, pd.DataFrame(results_columns)], axis=1))
+        return output_handling.create_template(file_templates)
+
+    def _get_stack_requirements(self) -> tuple:
+        """
+
+        :return: Tuple of (maximum scan range requested in the stacked analysis functions, extra variable column names
+            that should be read from the Scout DataFrames, maximum number of nearest Scouts requested). Nearest Scout
+            counts are found separately from the range join, so they don't affect the maximum scan range.
+        """
         max_scan_range = 0
         scout_extra_column_names = []
+        max_nearest_count = 0
         for func, kwargs in self.func_stack.function_generator():
-            if 'scan_range' in kwargs and kwargs['scan_range'] > max_scan_range:
-                max_scan_range = kwargs['scan_range']
-            if 'variable' in kwargs and kwargs['variable'] not in scout_extra_column_names:
+            max_scan_range = max([max_scan_range] + _get_call_scan_ranges(kwargs))
+            # The merged ScoutsManager's file tag is added on merging, not read from the Scout files
+            is_file_tag = self.merge_scout_indexes and kwargs.get('variable') == SCOUT_FILE_TAG_COLUMN
+            if (kwargs.get('variable') is not None and kwargs['variable'] not in scout_extra_column_names
+                    and not is_file_tag):
                 scout_extra_column_names.append(kwargs['variable'])
+            if 'k' in kwargs and kwargs['k'] > max_nearest_count:
+                max_nearest_count = kwargs['k']
+        return max_scan_range, scout_extra_column_names, max_nearest_count
 
-        self._process_environment(scout_extra_column_names=scout_extra_column_names)
+    def _join_scouts(self, scan_range, outpost_latitudes, outpost_longitudes, scout_columns: ScoutsManagersView,
+                     exact_distances: bool = True) -> NeighborTable:
+        """
 
-        for names_combination in self.unit_names_combinations_manager.combinations:
-            outposts_manager = names_combination.outposts_manager
-            scouts_managers = names_combination.scouts_managers
+        :param exact_distances: If False, the NeighborTable only holds distance bounds within scan_range.
+        :return: NeighborTable of the scouts of every ScoutsManager in scout_columns within scan_range of each outpost.
+        """
+        rtree_analyzers = [self._get_rtree_analyzer(name=scouts_manager.name)
+                           for scouts_manager in scout_columns.scouts_managers]
+        with self._time_stage('join'):
+            pairs = []
+            for manager_position, scouts_manager in enumerate(scout_columns.scouts_managers):
+                # Bounding boxes for every outpost are computed at once, leaving only index lookups per outpost
+                outpost_positions, scout_hub_ids, distances = self.outpost_scanner.scan_for_scouts_in_outposts_range(
+                    rtree_analyzer=rtree_analyzers[manager_position],
+                    outpost_latitudes=outpost_latitudes,
+                    outpost_longitudes=outpost_longitudes,
+                    scan_range=scan_range,
+                    exact_distances=exact_distances
+                )
+                hub_sizes, scout_ids = scouts_manager.coordinate_groups.expand_groups(scout_hub_ids)
+                pairs.append((np.repeat(outpost_positions, hub_sizes),
+                              scout_columns.get_combined_ids(manager_position, scout_ids),
+                              np.repeat(distances, hub_sizes)))
+            neighbor_table = self._create_neighbor_table(len(outpost_latitudes), pairs,
+                                                         bounded_range=None if exact_distances else scan_range)
 
-            for scouts_manager in scouts_managers:
-                scouts_manager_name = scouts_manager.name
-                rtree_analyzer = self.file_to_rtree_analyzer_map.get_rtree_analyzer(name=scouts_manager_name)
-                self._load_scouts_into_outposts_manager(scan_range=max_scan_range,
-                                                        outposts_manager=outposts_manager,
-                                                        scouts_manager=scouts_manager,
-                                                        rtree_analyzer=rtree_analyzer)
+        if self.stats is not None:
+            self.stats.increment('neighbor_entries', len(neighbor_table.scout_ids))
+            self.stats.add_to_histogram('neighbors_per_outpost_hub', neighbor_table.get_num_neighbors())
+        return neighbor_table
 
-        for func, kwargs in self.func_stack.function_generator():
-            func(**kwargs)
+    def _find_nearest_scouts(self, k, outpost_latitudes, outpost_longitudes,
+                             scout_columns: ScoutsManagersView) -> NeighborTable:
+        """
+
+        :return: NeighborTable of the k nearest scouts of each outpost across every ScoutsManager in scout_columns,
+            with no range limit.
+        """
+        rtree_analyzers = [self._get_rtree_analyzer(name=scouts_manager.name)
+                           for scouts_manager in scout_columns.scouts_managers]
+        with self._time_stage('nearest_join'):
+            pairs = []
+            for manager_position, scouts_manager in enumerate(scout_columns.scouts_managers):
+                # Every indexed scout hub holds at least one scout, so the k nearest hubs hold the k nearest scouts
+                outpost_positions, scout_hub_ids, distances = rtree_analyzers[manager_position].nearest_scouts(
+                    outpost_latitudes=outpost_latitudes,
+                    outpost_longitudes=outpost_longitudes,
+                    k=k
+                )
+                hub_sizes, scout_ids = scouts_manager.coordinate_groups.expand_groups(scout_hub_ids)
+                pairs.append((np.repeat(outpost_positions, hub_sizes),
+                              scout_columns.get_combined_ids(manager_position, scout_ids),
+                              np.repeat(distances, hub_sizes)))
+            return self._create_neighbor_table(len(outpost_latitudes), pairs).first_neighbors(k)
 
     @staticmethod
-    def _load_scouts_into_outposts_manager(scan_range, outposts_manager, scouts_manager, rtree_analyzer):
-        for outpost_coordinate, outpost in outposts_manager.outpost_generator():
-            distances_to_coordinates_obj = rtree_analyzer.scan_for_scouts_in_outpost_range(
-                outpost_coordinate=outpost_coordinate,
-                scan_range=scan_range
+    def _create_neighbor_table(num_outposts: int, pairs: list, bounded_range=None) -> NeighborTable:
+        if pairs:
+            outpost_positions, scout_ids, distances = (np.concatenate(arrays) for arrays in zip(*pairs))
+        else:
+            outpost_positions, scout_ids, distances = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                                                       np.empty(0, dtype=np.float64))
+        return NeighborTable.from_pairs(num_outposts=num_outposts,
+                                        outpost_positions=outpost_positions,
+                                        scout_ids=scout_ids,
+                                        distances=distances,
+                                        bounded_range=bounded_range)
+
+    def _load_scouts_into_outposts_manager(self, scan_range, outposts_query_results, scouts_managers: list):
+        """
+        Joins the outposts of a combination's OutpostsManager with the scouts of every ScoutsManager within the scan
+        range, and loads the results into the combination's OutpostsQueryResults as one NeighborTable.
+        """
+        outposts_manager = outposts_query_results.outposts_manager
+        # Each unique Outpost coordinate is joined once, and its results are fanned out to its Outposts on output
+        outpost_latitudes, outpost_longitudes = outposts_manager.get_outpost_hub_coordinates()
+
+        scout_columns = ScoutsManagersView(scouts_managers)
+        neighbor_table = self._join_scouts(scan_range=scan_range,
+                                           outpost_latitudes=outpost_latitudes,
+                                           outpost_longitudes=outpost_longitudes,
+                                           scout_columns=scout_columns,
+                                           exact_distances=self._needs_exact_distances(scan_range))
+        num_outposts, num_outpost_hubs = outposts_manager.get_num_outposts(), outposts_manager.get_num_outpost_hubs()
+        logging.info(f"Scouts from ScoutsManagers {[manager.name for manager in scouts_managers]} joined with "
+                     f"OutpostsManager {outposts_manager.name}: {num_outposts} Outposts at {num_outpost_hubs} unique "
+                     f"coordinates, a deduplication ratio of {num_outposts / max(num_outpost_hubs, 1):.2f}.")
+        outposts_query_results.set_neighbor_table(neighbor_table=neighbor_table,
+                                                  scout_columns=scout_columns)
+
+    def _aggregate_scouts_into_outposts_manager(self, scan_range, outposts_query_results, scouts_managers: list,
+                                                function_calls: list) -> StreamingAggregator:
+        """
+        Aggregate-on-the-fly version of _load_scouts_into_outposts_manager. Outposts are joined a block at a time, and
+        each block's Scouts within the scan range are reduced into a StreamingAggregator of the function calls and
+        dropped. The combination's OutpostsQueryResults is left without a NeighborTable.
+
+        :return: StreamingAggregator holding the aggregates of every Outpost hub.
+        """
+        outposts_manager = outposts_query_results.outposts_manager
+        outpost_latitudes, outpost_longitudes = outposts_manager.get_outpost_hub_coordinates()
+        scout_columns = ScoutsManagersView(scouts_managers)
+        aggregator = StreamingAggregator(function_calls=function_calls,
+                                         num_outposts=len(outpost_latitudes),
+                                         scout_columns=scout_columns)
+        rtree_analyzers = [self._get_rtree_analyzer(name=scouts_manager.name) for scouts_manager in scouts_managers]
+        exact_distances = self._needs_exact_distances(scan_range)
+        # One scan block per worker, so that parallel scans keep every worker busy
+        block_size = rtree_analyzers[0].scan_block_size * max(1, self.outpost_scanner.num_workers)
+        with self._time_stage('join'):
+            for block_start in range(0, len(outpost_latitudes), block_size):
+                block = slice(block_start, block_start + block_size)
+                block_latitudes, block_longitudes = outpost_latitudes[block], outpost_longitudes[block]
+                for manager_position, scouts_manager in enumerate(scouts_managers):
+                    block_results = self.outpost_scanner.scan_for_scouts_in_outposts_range(
+                        rtree_analyzer=rtree_analyzers[manager_position],
+                        outpost_latitudes=block_latitudes,
+                        outpost_longitudes=block_longitudes,
+                        scan_range=scan_range,
+                        exact_distances=exact_distances
+                    )
+                    outpost_positions, scout_hub_ids, distances = block_results
+                    hub_sizes, scout_ids = scouts_manager.coordinate_groups.expand_groups(scout_hub_ids)
+                    aggregator.add_block(block_start=block_start,
+                                         num_block_outposts=len(block_latitudes),
+                                         outpost_positions=np.repeat(outpost_positions, hub_sizes),
+                                         scout_ids=scout_columns.get_combined_ids(manager_position, scout_ids),
+                                         distances=np.repeat(distances, hub_sizes))
+
+        if self.stats is not None:
+            self.stats.increment('neighbor_entries', int(aggregator.neighbor_counts.sum()))
+            self.stats.add_to_histogram('neighbors_per_outpost_hub', aggregator.neighbor_counts)
+        logging.info(f"Scouts from ScoutsManagers {[manager.name for manager in scouts_managers]} aggregated into "
+                     f"OutpostsManager {outposts_manager.name} during the join, at "
+                     f"{outposts_manager.get_num_outpost_hubs()} unique Outpost coordinates.")
+        outposts_query_results.set_neighbor_table(neighbor_table=None,
+                                                  scout_columns=scout_columns)
+        return aggregator
+
+    def _needs_exact_distances(self, max_scan_range) -> bool:
+        """
+
+        :return: Whether the range join at max_scan_range must measure every distance. Without a result cache, if every
+            stacked range analysis function is at max_scan_range and none returns distances, the join only has to
+            tell the Scouts within max_scan_range from those beyond it.
+        """
+        if self.result_cache is not None:
+            return True
+        for function_name, kwargs in self.func_stack.function_call_generator():
+            if function_name in DISTANCE_VALUE_FUNCTIONS:
+                return True
+            if any(scan_range != max_scan_range for scan_range in _get_call_scan_ranges(kwargs)):
+                return True
+        return False
+
+    def _measure_bounded_distances(self):
+        """
+        Measures every distance of the combinations' NeighborTables that only hold distance bounds, for analysis
+        functions called after process_analysis_functions at any scan range. Joins aggregated on the fly keep no
+        NeighborTables to call range analysis functions on.
+        """
+        if self.aggregate_join:
+            raise ValueError("Range analysis functions can't be called after process_analysis_functions with "
+                             "aggregate_join, as no Outpost's neighbors are kept.")
+        for names_combination in self.unit_names_combinations_manager.combinations:
+            outposts_query_results = names_combination.outposts_query_results
+            neighbor_table = outposts_query_results.neighbor_table
+            if neighbor_table is None or neighbor_table.bounded_range is None:
+                continue
+
+            outposts_manager = outposts_query_results.outposts_manager
+            outpost_latitudes, outpost_longitudes = outposts_manager.get_outpost_hub_coordinates()
+            scout_latitudes, scout_longitudes = outposts_query_results.scout_columns.get_coordinate_arrays()
+            outpost_positions = neighbor_table.get_outpost_positions()
+            distances = distance_calculation.batch_distances(outpost_latitudes[outpost_positions],
+                                                             outpost_longitudes[outpost_positions],
+                                                             scout_latitudes[neighbor_table.scout_ids],
+                                                             scout_longitudes[neighbor_table.scout_ids],
+                                                             model=self.distance_model)
+            outposts_query_results.set_neighbor_table(
+                neighbor_table=NeighborTable.from_pairs(num_outposts=neighbor_table.get_num_outposts(),
+                                                        outpost_positions=outpost_positions,
+                                                        scout_ids=neighbor_table.scout_ids,
+                                                        distances=distances),
+                scout_columns=outposts_query_results.scout_columns
             )
-            for scout_coordinate, distance in distances_to_coordinates_obj.coordinate_and_distance_generator():
-                scouts_at_coordinate = scouts_manager.get_scouts(coordinate=scout_coordinate)
-                outpost.add_scouts(scouts=scouts_at_coordinate,
-                                   distance=distance)
-        logging.info(f"Scouts from ScoutsManager {scouts_manager.name} loaded into OutpostsManager "
-                     f"{outposts_manager.name}")
+
+    def _load_nearest_scouts_into_outposts_manager(self, k, outposts_query_results):
+        """
+        Finds the k nearest scouts of each outpost across every ScoutsManager already joined into the combination's
+        OutpostsQueryResults, with no range limit, and loads them into the OutpostsQueryResults as its nearest table.
+        """
+        outpost_latitudes, outpost_longitudes = outposts_query_results.outposts_manager.get_outpost_hub_coordinates()
+        nearest_table = self._find_nearest_scouts(k=k,
+                                                  outpost_latitudes=outpost_latitudes,
+                                                  outpost_longitudes=outpost_longitudes,
+                                                  scout_columns=outposts_query_results.scout_columns)
+        outposts_query_results.set_nearest_table(nearest_table)
 
     def scout_in_range_tf(self, scan_range):
         """
@@ -238,9 +1096,10 @@ class EnvironmentManager:
         :param scan_range: Requested range from each outpost to consider Scout objects.
         """
         if self.done_called:
+            self._measure_bounded_distances()
             name_combinations = self.unit_names_combinations_manager.combinations
             for combination in name_combinations:
-                combination.outposts_manager.scout_in_range_tf(scan_range=scan_range)
+                combination.outposts_query_results.scout_in_range_tf(scan_range=scan_range)
                 logging.info(f"scout_in_range_tf processed for OutpostsManager {combination.outposts_manager.name}.")
         else:
             self.func_stack.add_to_stack(self.scout_in_range_tf,
@@ -252,9 +1111,10 @@ class EnvironmentManager:
         :param scan_range: Requested range from each outpost to consider Scout objects.
         """
         if self.done_called:
+            self._measure_bounded_distances()
             name_combinations = self.unit_names_combinations_manager.combinations
             for combination in name_combinations:
-                combination.outposts_manager.num_scouts_in_range(scan_range=scan_range)
+                combination.outposts_query_results.num_scouts_in_range(scan_range=scan_range)
                 logging.info(f"num_scouts_in_range processed for OutpostsManager {combination.outposts_manager.name}.")
         else:
             self.func_stack.add_to_stack(self.num_scouts_in_range,
@@ -270,11 +1130,12 @@ class EnvironmentManager:
         :param target_value: The target value determining whether a Scout should be considered or not.
         """
         if self.done_called:
+            self._measure_bounded_distances()
             name_combinations = self.unit_names_combinations_manager.combinations
             for combination in name_combinations:
-                combination.outposts_manager.num_scouts_in_range_by_variable(scan_range=scan_range,
-                                                                             variable=variable,
-                                                                             target_value=target_value)
+                combination.outposts_query_results.num_scouts_in_range_by_variable(scan_range=scan_range,
+                                                                                   variable=variable,
+                                                                                   target_value=target_value)
                 logging.info(f"count_scouts_by_variable processed for OutpostsManager {combination.outposts_manager.name}.")
         else:
             self.func_stack.add_to_stack(self.num_scouts_in_range_by_variable,
@@ -282,6 +1143,31 @@ class EnvironmentManager:
                                          variable=variable,
                                          target_value=target_value)
 
+    def num_scouts_in_range_by_variable_values(self, scan_range, variable, target_values: list = None):
+        """
+        For each Outpost, determines the number of Scouts within the specified scan range for every value of the
+        specified variable, in one pass. Each value gets the column num_scouts_in_range_by_variable would give it.
+
+        :param scan_range: Requested range from each outpost to consider Scout objects.
+        :param variable: The column name whose values the Scouts are counted by.
+        :param target_values: Optional list of the values to count. Defaults to every value of the variable among the
+            Scouts, sorted when the values are comparable.
+        """
+        if self.done_called:
+            self._measure_bounded_distances()
+            name_combinations = self.unit_names_combinations_manager.combinations
+            for combination in name_combinations:
+                combination.outposts_query_results.num_scouts_in_range_by_variable_values(scan_range=scan_range,
+                                                                                          variable=variable,
+                                                                                          target_values=target_values)
+                logging.info(f"num_scouts_in_range_by_variable_values processed for OutpostsManager "
+                             f"{combination.outposts_manager.name}.")
+        else:
+            self.func_stack.add_to_stack(self.num_scouts_in_range_by_variable_values,
+                                         scan_range=scan_range,
+                                         variable=variable,
+                                         target_values=target_values)
+
     def average_scouts_by_variable(self, scan_range, variable):
         """
         For each Outpost, determines the average numeric value for the specified variable for Scouts within
@@ -290,10 +1176,11 @@ class EnvironmentManager:
         :param variable: The column name determining whether a Scout should be considered or not.
         """
         if self.done_called:
+            self._measure_bounded_distances()
             name_combinations = self.unit_names_combinations_manager.combinations
             for combination in name_combinations:
-                combination.outposts_manager.average_scouts_by_variable(scan_range=scan_range,
-                                                                        variable=variable)
+                combination.outposts_query_results.average_scouts_by_variable(scan_range=scan_range,
+                                                                              variable=variable)
                 logging.info(
                     f"average_scouts_by_variable processed for OutpostsManager {combination.outposts_manager.name}.")
         else:
@@ -301,21 +1188,194 @@ class EnvironmentManager:
                                          scan_range=scan_range,
                                          variable=variable)
 
+    def sum_scouts_by_variable(self, scan_range, variable):
+        """
+        For each Outpost, determines the sum of the numeric values for the specified variable of Scouts within the
+        specified range.
+        :param scan_range: Requested range from each outpost to consider Scout objects.
+        :param variable: The column name whose numeric values are aggregated. Missing values are skipped.
+        """
+        if self.done_called:
+            self._measure_bounded_distances()
+            name_combinations = self.unit_names_combinations_manager.combinations
+            for combination in name_combinations:
+                combination.outposts_query_results.sum_scouts_by_variable(scan_range=scan_range,
+                                                                          variable=variable)
+                logging.info(
+                    f"sum_scouts_by_variable processed for OutpostsManager {combination.outposts_manager.name}.")
+        else:
+            self.func_stack.add_to_stack(self.sum_scouts_by_variable,
+                                         scan_range=scan_range,
+                                         variable=variable)
+
+    def min_scouts_by_variable(self, scan_range, variable):
+        """
+        For each Outpost, determines the minimum numeric value for the specified variable of Scouts within the
+        specified range.
+        :param scan_range: Requested range from each outpost to consider Scout objects.
+        :param variable: The column name whose numeric values are aggregated. Missing values are skipped.
+        """
+        if self.done_called:
+            self._measure_bounded_distances()
+            name_combinations = self.unit_names_combinations_manager.combinations
+            for combination in name_combinations:
+                combination.outposts_query_results.min_scouts_by_variable(scan_range=scan_range,
+                                                                          variable=variable)
+                logging.info(
+                    f"min_scouts_by_variable processed for OutpostsManager {combination.outposts_manager.name}.")
+        else:
+            self.func_stack.add_to_stack(self.min_scouts_by_variable,
+                                         scan_range=scan_range,
+                                         variable=variable)
+
+    def max_scouts_by_variable(self, scan_range, variable):
+        """
+        For each Outpost, determines the maximum numeric value for the specified variable of Scouts within the
+        specified range.
+        :param scan_range: Requested range from each outpost to consider Scout objects.
+        :param variable: The column name whose numeric values are aggregated. Missing values are skipped.
+        """
+        if self.done_called:
+            self._measure_bounded_distances()
+            name_combinations = self.unit_names_combinations_manager.combinations
+            for combination in name_combinations:
+                combination.outposts_query_results.max_scouts_by_variable(scan_range=scan_range,
+                                                                          variable=variable)
+                logging.info(
+                    f"max_scouts_by_variable processed for OutpostsManager {combination.outposts_manager.name}.")
+        else:
+            self.func_stack.add_to_stack(self.max_scouts_by_variable,
+                                         scan_range=scan_range,
+                                         variable=variable)
+
+    def median_scouts_by_variable(self, scan_range, variable):
+        """
+        For each Outpost, determines the median numeric value for the specified variable of Scouts within the
+        specified range.
+        :param scan_range: Requested range from each outpost to consider Scout objects.
+        :param variable: The column name whose numeric values are aggregated. Missing values are skipped.
+        """
+        if self.done_called:
+            self._measure_bounded_distances()
+            name_combinations = self.unit_names_combinations_manager.combinations
+            for combination in name_combinations:
+                combination.outposts_query_results.median_scouts_by_variable(scan_range=scan_range,
+                                                                             variable=variable)
+                logging.info(
+                    f"median_scouts_by_variable processed for OutpostsManager {combination.outposts_manager.name}.")
+        else:
+            self.func_stack.add_to_stack(self.median_scouts_by_variable,
+                                         scan_range=scan_range,
+                                         variable=variable)
+
+    def percentile_scouts_by_variable(self, scan_range, variable, percentile):
+        """
+        For each Outpost, determines a percentile of the numeric values for the specified variable of Scouts within
+        the specified range, interpolated linearly between the closest ranks.
+        :param scan_range: Requested range from each outpost to consider Scout objects.
+        :param variable: The column name whose numeric values are aggregated. Missing values are skipped.
+        :param percentile: Percentile between 0 and 100.
+        """
+        if self.done_called:
+            self._measure_bounded_distances()
+            name_combinations = self.unit_names_combinations_manager.combinations
+            for combination in name_combinations:
+                combination.outposts_query_results.percentile_scouts_by_variable(scan_range=scan_range,
+                                                                                 variable=variable,
+                                                                                 percentile=percentile)
+                logging.info(
+                    f"percentile_scouts_by_variable processed for OutpostsManager {combination.outposts_manager.name}.")
+        else:
+            self.func_stack.add_to_stack(self.percentile_scouts_by_variable,
+                                         scan_range=scan_range,
+                                         variable=variable,
+                                         percentile=percentile)
+
+    def distance_weighted_average_scouts_by_variable(self, scan_range, variable, power=1):
+        """
+        For each Outpost, determines the inverse distance weighted average numeric value for the specified variable
+        of Scouts within the specified range. Each Scout's value is weighted by 1 / distance ** power; Scouts at the
+        Outpost's coordinate take all the weight.
+        :param scan_range: Requested range from each outpost to consider Scout objects.
+        :param variable: The column name whose numeric values are aggregated. Missing values are skipped.
+        :param power: Power of the distance in the weights.
+        """
+        if self.done_called:
+            self._measure_bounded_distances()
+            name_combinations = self.unit_names_combinations_manager.combinations
+            for combination in name_combinations:
+                combination.outposts_query_results.distance_weighted_average_scouts_by_variable(scan_range=scan_range,
+                                                                                                variable=variable,
+                                                                                                power=power)
+                logging.info(f"distance_weighted_average_scouts_by_variable processed for OutpostsManager "
+                             f"{combination.outposts_manager.name}.")
+        else:
+            self.func_stack.add_to_stack(self.distance_weighted_average_scouts_by_variable,
+                                         scan_range=scan_range,
+                                         variable=variable,
+                                         power=power)
+
+    def num_scouts_in_rings(self, breaks: list, variable=None, aggregate='average'):
+        """
+        For each Outpost, determines the number of Scouts in each ring between consecutive break distances, from one
+        pass over the neighbors. Breaks [1, 3, 5] give the rings 0 to 1, 1 to 3, and 3 to 5 miles; each ring includes
+        its outer distance.
+        :param breaks: Increasing, positive outer distances of the rings.
+        :param variable: Optional column name whose numeric values are also aggregated per ring.
+        :param aggregate: Aggregate of the variable per ring: 'average' or 'sum'.
+        """
+        if self.done_called:
+            self._measure_bounded_distances()
+            name_combinations = self.unit_names_combinations_manager.combinations
+            for combination in name_combinations:
+                combination.outposts_query_results.num_scouts_in_rings(breaks=breaks,
+                                                                       variable=variable,
+                                                                       aggregate=aggregate)
+                logging.info(
+                    f"num_scouts_in_rings processed for OutpostsManager {combination.outposts_manager.name}.")
+        else:
+            self.func_stack.add_to_stack(self.num_scouts_in_rings,
+                                         breaks=breaks,
+                                         variable=variable,
+                                         aggregate=aggregate)
+
     def nearest_scout(self, scan_range):
         """
         For each Outpost, determines the nearest Scout within the specified range.
         :param scan_range: Requested range from each outpost to consider Scout objects.
         """
         if self.done_called:
+            self._measure_bounded_distances()
             name_combinations = self.unit_names_combinations_manager.combinations
             for combination in name_combinations:
-                combination.outposts_manager.nearest_scout(scan_range)
+                combination.outposts_query_results.nearest_scout(scan_range)
                 logging.info(
                     f"nearest_scout processed for OutpostsManager {combination.outposts_manager.name}.")
         else:
             self.func_stack.add_to_stack(self.nearest_scout,
                                          scan_range=scan_range)
 
+    def nearest_scouts(self, k=1, variable=None):
+        """
+        For each Outpost, determines the distances to its k nearest Scouts, with no range limit. Found separately from
+        the range analysis functions, so it doesn't require a large scan range. If called after
+        process_analysis_functions, k is limited to the largest k stacked before it.
+
+        :param k: Number of nearest Scouts. Results are output as one column per Scout, nearest first.
+        :param variable: Optional column name whose value is also output for each of the nearest Scouts.
+        """
+        if self.done_called:
+            name_combinations = self.unit_names_combinations_manager.combinations
+            for combination in name_combinations:
+                combination.outposts_query_results.nearest_scouts(k=k,
+                                                                  variable=variable)
+                logging.info(
+                    f"nearest_scouts processed for OutpostsManager {combination.outposts_manager.name}.")
+        else:
+            self.func_stack.add_to_stack(self.nearest_scouts,
+                                         k=k,
+                                         variable=variable)
+
     def _compile_query_data_into_dict(self) -> dict:
         """
 
@@ -324,9 +1384,9 @@ class EnvironmentManager:
         """
         dfs = {}
         for name_combination in self.unit_names_combinations_manager.combinations:
-            combination_outposts_manager = name_combination.outposts_manager
-            df = combination_outposts_manager.compile_query_data_into_df()
-            dfs[combination_outposts_manager.name] = df
+            outposts_query_results = name_combination.outposts_query_results
+            df = outposts_query_results.compile_query_data_into_df()
+            dfs[outposts_query_results.name] = df
         return dfs
 
     def output_data_to_file(self, output_path):
@@ -334,6 +1394,8 @@ class EnvironmentManager:
         Pulls the queried data results for each OutpostsUnitManager from the UnitNamesCombinationsManager, and outputs
         that data into the requested output file path.
         """
-        dfs = self._compile_query_data_into_dict()
-        output_handling.output_dfs_to_file(output_path=output_path,
-                                           dataframes=dfs)
+        with self._time_stage('output'):
+            dfs = self._compile_query_data_into_dict()
+            output_handling.output_dfs_to_file(output_path=output_path,
+                                               dataframes=dfs)
+        self._emit_stats()
@@ -1,4 +1,3 @@
-import copy
 import logging
 
 
@@ -30,14 +29,11 @@ class FileToUnitManagersMap:
 
         manager_map[name] = manager
 
-    def get_manager(self, name, unit_type, should_copy=False):
+    def get_manager(self, name, unit_type):
         manager_map = self._get_requested_unit_map(unit_type=unit_type)
 
         if name not in manager_map:
             raise KeyError(f"get_manager called for unit type {unit_type} for nonexistent substring {name} from \n"
                            f"FileSubstringToUnitManagersMap.")
 
-        if should_copy:
-            return copy.deepcopy(manager_map[name])
-        else:
-            return manager_map[name]
+        return manager_map[name]
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+
+from units.outpost.neighbor_table import NeighborTable
+
+# Part of every combination key. Bump when analysis results change, so that older cache entries are never reused.
+RESULT_CACHE_VERSION = 2
+
+
+class ResultCache:
+    """
+    On-disk cache of analysis results for Outpost/Scout combinations. Entries of one combination share its combination
+    key, built from everything its results depend on: the file contents, coordinate columns and column dtypes, and the
+    distance model.
+
+    Three kinds of entries are kept per combination: the results of each analysis function call, the NeighborTable of
+    the largest scan range joined so far (which serves every smaller range), and the nearest Scouts table of the largest
+    k found so far. The cache is bounded by size, evicting least recently used entries first. The total size is tracked
+    in memory, so the cache directory is only scanned at the first write after creation or invalidation, and when the
+    size limit is exceeded.
+    """
+
+    def __init__(self, cache_directory: str, max_size_bytes: int = 2 ** 30):
+        """
+
+        :param cache_directory: Directory the cache entries are stored in. Created if it doesn't exist.
+        :param max_size_bytes: Maximum total size of the cache entries.
+        """
+        self.cache_directory = cache_directory
+        self.max_size_bytes = max_size_bytes
+        # Total size of the entries, or None until the cache directory is scanned
+        self.total_size = None
+        os.makedirs(cache_directory, exist_ok=True)
+
+    @staticmethod
+    def _create_file_key(unit_file_obj) -> str:
+        # Column dtypes change the loaded values, e.g. float32 sums, so they are part of the key
+        column_dtypes = sorted((column_name, str(dtype))
+                               for column_name, dtype in unit_file_obj.get_column_dtypes().items())
+        return f"{unit_file_obj.get_coordinates_cache_key()}:{json.dumps(column_dtypes)}"
+
+    @staticmethod
+    def create_combination_key(outpost_file, scout_files, distance_model: str, merge_scout_indexes: bool,
+                               outpost_snap_tolerance: float = None) -> str:
+        """
+
+        :param outpost_file: UnitFile of the combination's Outposts.
+        :param scout_files: UnitFiles of the combination's Scouts.
+        :param outpost_snap_tolerance: Snap tolerance the Outposts were grouped into outpost hubs with.
+        :return: Key identifying the combination's analysis inputs.
+        """
+        key_parts = [str(RESULT_CACHE_VERSION), distance_model, str(merge_scout_indexes), repr(outpost_snap_tolerance),
+                     ResultCache._create_file_key(outpost_file)]
+        key_parts.extend(f"{scout_file.file_alias}={ResultCache._create_file_key(scout_file)}"
+                         for scout_file in sorted(scout_files, key=lambda scout_file: scout_file.file_alias))
+        return hashlib.sha256('|'.join(key_parts).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _create_call_key(function_name: str, kwargs: dict) -> str:
+        # json keeps 5, 5.0, '5', and True apart, so calls differing only in argument type get different keys
+        call_string = json.dumps([function_name, sorted(kwargs.items())], default=repr)
+        return hashlib.sha256(call_string.encode('utf-8')).hexdigest()[:32]
+
+    def _get_path(self, combination_key: str, entry_name: str) -> str:
+        return os.path.join(self.cache_directory, f"{combination_key}.{entry_name}")
+
+    def _read(self, path: str):
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as file:
+                entry = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            logging.info(f"Unreadable result cache entry '{path}'. Ignoring it.")
+            return None
+        # Reads count as uses for the least recently used eviction
+        os.utime(path)
+        return entry
+
+    def _write(self, path: str, entry):
+        # Written to a temporary file first so that an interrupted write never leaves a partial entry behind
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, 'wb') as file:
+            pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.total_size is not None:
+            replaced_size = os.path.getsize(path) if os.path.exists(path) else 0
+            self.total_size += os.path.getsize(temporary_path) - replaced_size
+        os.replace(temporary_path, path)
+        self._evict()
+
+    def write_manifest(self, combination_key: str, unit_files: list):
+        """
+        Records the file paths of a combination, so that its entries can be invalidated by file.
+        """
+        manifest = {'file_paths': sorted(os.path.abspath(file.file_path) for file in unit_files)}
+        with open(self._get_path(combination_key, 'manifest.json'), 'w') as file:
+            json.dump(manifest, file)
+
+    def get_call_results(self, combination_key: str, function_name: str, kwargs: dict):
+        """
+
+        :return: Dict of query string: results of the analysis function call, or None if not cached.
+        """
+        return self._read(self._get_path(combination_key, f"call_{self._create_call_key(function_name, kwargs)}.pkl"))
+
+    def put_call_results(self, combination_key: str, function_name: str, kwargs: dict, call_results: dict):
+        self._write(self._get_path(combination_key, f"call_{self._create_call_key(function_name, kwargs)}.pkl"),
+                    call_results)
+
+    def _get_table(self, combination_key: str, table_name: str, size_name: str, size):
+        entry = self._read(self._get_path(combination_key, f"{table_name}.pkl"))
+        if entry is None or entry[size_name] < size:
+            return None
+        return NeighborTable(offsets=entry['offsets'], scout_ids=entry['scout_ids'], distances=entry['distances'])
+
+    def _put_table(self, combination_key: str, table_name: str, size_name: str, size, table: NeighborTable):
+        # Only the table of the largest size is kept, as it serves every smaller size
+        path = self._get_path(combination_key, f"{table_name}.pkl")
+        if os.path.exists(path):
+            cached_entry = self._read(path)
+            if cached_entry is not None and cached_entry[size_name] >= size:
+                return
+        self._write(path, {size_name: size, 'offsets': table.offsets, 'scout_ids': table.scout_ids,
+                           'distances': table.distances})
+
+    def get_neighbor_table(self, combination_key: str, scan_range):
+        """
+
+        :return: The combination's NeighborTable at scan_range, from a cached table of an equal or larger range, or
+            None if there is none.
+        """
+        table = self._get_table(combination_key, 'neighbors', 'scan_range', scan_range)
+        return None if table is None else table.within_range(scan_range)
+
+    def put_neighbor_table(self, combination_key: str, scan_range, neighbor_table: NeighborTable):
+        self._put_table(combination_key, 'neighbors', 'scan_range', scan_range, neighbor_table)
+
+    def get_nearest_table(self, combination_key: str, k: int):
+        """
+
+        :return: The combination's k nearest Scouts table, from a cached table of an equal or larger k, or None.
+        """
+        table = self._get_table(combination_key, 'nearest', 'k', k)
+        return None if table is None else table.first_neighbors(k)
+
+    def put_nearest_table(self, combination_key: str, k: int, nearest_table: NeighborTable):
+        self._put_table(combination_key, 'nearest', 'k', k, nearest_table)
+
+    def _list_entries(self) -> list[os.DirEntry]:
+        return [entry for entry in os.scandir(self.cache_directory)
+                if entry.is_file() and entry.name.endswith('.pkl')]
+
+    def _evict(self):
+        if self.total_size is None:
+            self.total_size = sum(entry.stat().st_size for entry in self._list_entries())
+        if self.total_size <= self.max_size_bytes:
+            return
+
+        # Sizes are re-read from the entries, as other processes may share the cache directory
+        entry_stats = [(entry, entry.stat()) for entry in self._list_entries()]
+        total_size = sum(entry_stat.st_size for _, entry_stat in entry_stats)
+        num_evicted = 0
+        for entry, entry_stat in sorted(entry_stats, key=lambda entry_and_stat: entry_and_stat[1].st_mtime):
+            if total_size <= self.max_size_bytes:
+                break
+            total_size -= entry_stat.st_size
+            os.remove(entry.path)
+            num_evicted += 1
+        self.total_size = total_size
+        self._remove_orphaned_manifests()
+        logging.info(f"Evicted {num_evicted} least recently used entries from result cache '{self.cache_directory}'.")
+
+    def _remove_orphaned_manifests(self):
+        combination_keys = {entry.name.split('.')[0] for entry in self._list_entries()}
+        for entry in os.scandir(self.cache_directory):
+            if entry.name.endswith('.manifest.json') and entry.name.split('.')[0] not in combination_keys:
+                os.remove(entry.path)
+
+    def invalidate(self, file_path: str = None):
+        """
+        Removes cache entries.
+
+        :param file_path: If provided, only the entries of combinations that include this Outpost or Scout file are
+            removed. Otherwise every entry is removed.
+        """
+        combination_keys = None
+        if file_path is not None:
+            combination_keys = set()
+            for entry in os.scandir(self.cache_directory):
+                if not entry.name.endswith('.manifest.json'):
+                    continue
+                with open(entry.path) as file:
+                    if os.path.abspath(file_path) in json.load(file)['file_paths']:
+                        combination_keys.add(entry.name.split('.')[0])
+
+        num_removed = 0
+        for entry in os.scandir(self.cache_directory):
+            if combination_keys is None or entry.name.split('.')[0] in combination_keys:
+                os.remove(entry.path)
+                num_removed += 1
+        self.total_size = None
+        logging.info(f"Removed {num_removed} files from result cache '{self.cache_directory}'.")
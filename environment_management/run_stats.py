@@ -0,0 +1,109 @@
+"""
+Instrumentation of EnvironmentManager runs: per-stage wall and CPU times, hot-path counters, and histograms, collected
+in a RunStats object. Collection is off by default; the disabled path is a single None check per stage or scan block.
+"""
+import contextlib
+import json
+import logging
+import time
+
+import numpy as np
+
+
+class RunStats:
+    """
+    Cumulative statistics of an EnvironmentManager's runs.
+
+    Stages are timed with time_stage; a stage run more than once (e.g. once per combination) accumulates its times.
+    Counters are named integers, e.g. 'index_candidates' and 'index_candidates_accepted'. Histograms count values by
+    power-of-two bucket: 0, 1, 2-3, 4-7, and so on.
+    """
+
+    def __init__(self):
+        # stage name: dict of 'wall_seconds', 'cpu_seconds', and 'runs'
+        self.stage_times = {}
+        self.counters = {}
+        # histogram name: array of counts by bucket
+        self.histograms = {}
+
+    @contextlib.contextmanager
+    def time_stage(self, stage_name: str):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            stage_time = self.stage_times.setdefault(stage_name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'runs': 0})
+            stage_time['wall_seconds'] += time.perf_counter() - wall_start
+            stage_time['cpu_seconds'] += time.process_time() - cpu_start
+            stage_time['runs'] += 1
+
+    def increment(self, counter_name: str, amount: int = 1):
+        self.counters[counter_name] = self.counters.get(counter_name, 0) + int(amount)
+
+    def merge_counters(self, counters: dict):
+        """
+
+        :param counters: Dict of counter name: amount to add, e.g. counted by a worker process.
+        """
+        for counter_name, amount in counters.items():
+            self.increment(counter_name, amount)
+
+    def add_to_histogram(self, histogram_name: str, values: np.ndarray):
+        """
+
+        :param values: Array of non-negative integers to count.
+        """
+        # frexp's exponent is 0 for 0, 1 for 1, 2 for 2-3, 3 for 4-7, ...
+        bucket_counts = np.bincount(np.frexp(np.asarray(values, dtype=np.float64))[1])
+        histogram = self.histograms.get(histogram_name, np.zeros(0, dtype=np.int64))
+        if len(histogram) < len(bucket_counts):
+            histogram = np.append(histogram, np.zeros(len(bucket_counts) - len(histogram), dtype=np.int64))
+        histogram[:len(bucket_counts)] += bucket_counts
+        self.histograms[histogram_name] = histogram
+
+    @staticmethod
+    def _get_bucket_name(bucket: int) -> str:
+        if bucket <= 1:
+            return str(bucket)
+        return f"{2 ** (bucket - 1)}-{2 ** bucket - 1}"
+
+    def to_dict(self) -> dict:
+        """
+
+        :return: JSON-serializable dict of the stage times, counters, and histograms, with histograms keyed by bucket
+            range.
+        """
+        return {
+            'stage_times': {stage_name: dict(stage_time) for stage_name, stage_time in self.stage_times.items()},
+            'counters': dict(self.counters),
+            'histograms': {histogram_name: {self._get_bucket_name(bucket): int(count)
+                                            for bucket, count in enumerate(histogram)}
+                           for histogram_name, histogram in self.histograms.items()}
+        }
+
+
+def logging_stats_sink(run_stats: RunStats):
+    """
+    Stats sink writing a summary of the stats to the log.
+    """
+    stats_dict = run_stats.to_dict()
+    stage_lines = [f"\t{stage_name}: {stage_time['wall_seconds']:.3f} s wall, {stage_time['cpu_seconds']:.3f} s cpu, "
+                   f"{stage_time['runs']} runs" for stage_name, stage_time in stats_dict['stage_times'].items()]
+    counter_lines = [f"\t{counter_name}: {value:,}" for counter_name, value in stats_dict['counters'].items()]
+    histogram_lines = [f"\t{histogram_name}: {histogram}"
+                       for histogram_name, histogram in stats_dict['histograms'].items()]
+    logging.info('\n'.join(["Run stats:"] + stage_lines + counter_lines + histogram_lines))
+
+
+class JsonLinesStatsSink:
+    """
+    Stats sink appending the stats to a file, one JSON object per line.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def __call__(self, run_stats: RunStats):
+        with open(self.file_path, 'a') as file:
+            file.write(json.dumps(run_stats.to_dict()) + '\n')
@@ -1,4 +1,5 @@
 from io_handling import unit_file
+from units.outpost.outposts_query_results import OutpostsQueryResults
 
 
 class NameCombinations:
@@ -8,9 +9,14 @@ class NameCombinations:
         self.scout_names = scout_names
         self.outposts_manager = None
         self.scouts_managers = None
+        self.outposts_query_results = None
 
     def add_outpost_manager(self, outposts_manager):
+        """
+        Adds the shared OutpostsManager, along with a fresh OutpostsQueryResults layer for this combination's results.
+        """
         self.outposts_manager = outposts_manager
+        self.outposts_query_results = OutpostsQueryResults(outposts_manager)
 
     def add_scouts_managers(self, scouts_managers):
         self.scouts_managers = scouts_managers
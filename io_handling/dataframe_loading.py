@@ -2,6 +2,13 @@ import os
 
 import pandas as pd
 
+try:
+    import pyarrow.feather as feather
+    import pyarrow.parquet as parquet
+except ImportError:
+    feather = None
+    parquet = None
+
 
 class FileSubstringMatchError(Exception):
     pass
@@ -11,33 +18,118 @@ class NoFileFoundForSubstringError(Exception):
     pass
 
 
+EXCEL_EXTENSIONS = ['.xls', '.xlsx']
+CSV_EXTENSIONS = ['.csv']
+PARQUET_EXTENSIONS = ['.parquet', '.pq']
+FEATHER_EXTENSIONS = ['.feather', '.arrow', '.ipc']
+VALID_EXTENSIONS = CSV_EXTENSIONS + EXCEL_EXTENSIONS + PARQUET_EXTENSIONS + FEATHER_EXTENSIONS
+
+
 def _get_file_extension(file_path):
     file_name = os.path.basename(file_path)
     base_name, extension = os.path.splitext(file_name)
-    return extension
+    return extension.lower()
+
+
+def _check_extension(file_path, file_extension):
+    if file_extension not in VALID_EXTENSIONS:
+        raise Exception(f"File path {file_path} does not have one of valid extensions {', '.join(VALID_EXTENSIONS)}")
+    if file_extension in PARQUET_EXTENSIONS + FEATHER_EXTENSIONS and parquet is None:
+        raise ImportError(f"Reading '{file_extension}' files requires pyarrow, which is not installed.")
+
+
+def _check_column_names(column_names: list, file_column_names):
+    if not set(column_names).issubset(set(file_column_names)):
+        raise ValueError(f"Column names not in the dataframe.\n\tRequested column names: {column_names}"
+                         f"\n\tDataFrame column names: {file_column_names}")
+
+
+def _read_csv_column_names(file_path) -> list:
+    return list(pd.read_csv(file_path, nrows=0).columns)
+
+
+def _apply_dtypes(df: pd.DataFrame, dtypes: dict) -> pd.DataFrame:
+    """
+    Casts the columns of DataFrames read from typed formats (Parquet, Feather) to the requested dtypes.
+    """
+    if not dtypes:
+        return df
+    return df.astype({column: dtype for column, dtype in dtypes.items() if column in df.columns})
 
 
-def load_dataframe(file_path: str, column_names: list, sheet_name=None) -> pd.DataFrame:
+def load_dataframe(file_path: str, column_names: list, sheet_name=None, dtypes: dict = None,
+                   row_groups: list[int] = None) -> pd.DataFrame:
     """
-    Base dataframe extraction function for processing Outposts.
-    :param file_path: Internal file path for input. To be read into a Dataframe.
+    Base dataframe extraction function for processing Outposts. Only the requested columns are parsed.
+    :param file_path: Internal file path for input. To be read into a Dataframe. One of the VALID_EXTENSIONS file types;
+        Parquet and Feather/Arrow files require pyarrow.
     :param column_names: Specifies the column names to be included in the resulting DataFrame.
-    :param sheet_name: Excel-specific parameter denoting the sheet name in the input Excel file.
+    :param sheet_name: Excel-specific parameter denoting the sheet name in the input Excel file. Defaults to the first
+        sheet.
+    :param dtypes: Optional dict of column name: dtype, e.g. 'float32' coordinates or 'category' strings. Columns not
+        included keep their inferred (CSV, Excel) or stored (Parquet, Feather) type.
+    :param row_groups: Parquet-specific parameter selecting the row groups to read. Defaults to every row group.
     :return: DataFrame from provided file path, filtered to the specified column names.
     """
     file_extension = _get_file_extension(file_path)
-    if file_extension in ['.xls', '.xlsx']:
-        if sheet_name:
-            return pd.read_excel(file_path, sheet_name=sheet_name)
+    _check_extension(file_path, file_extension)
+
+    if file_extension in EXCEL_EXTENSIONS:
+        header = pd.read_excel(file_path, sheet_name=sheet_name or 0, nrows=0)
+        _check_column_names(column_names, header.columns)
+        df = pd.read_excel(file_path, sheet_name=sheet_name or 0, usecols=column_names, dtype=dtypes)
+    elif file_extension in CSV_EXTENSIONS:
+        _check_column_names(column_names, _read_csv_column_names(file_path))
+        df = pd.read_csv(file_path, usecols=column_names, dtype=dtypes)
+    elif file_extension in PARQUET_EXTENSIONS:
+        parquet_file = parquet.ParquetFile(file_path)
+        _check_column_names(column_names, parquet_file.schema_arrow.names)
+        if row_groups is None:
+            table = parquet_file.read(columns=column_names)
         else:
-            df = pd.read_excel(file_path)
-    elif file_extension in ['.csv']:
-        df = pd.read_csv(file_path)
+            table = parquet_file.read_row_groups(row_groups, columns=column_names)
+        df = _apply_dtypes(table.to_pandas(), dtypes)
     else:
-        raise Exception(f"File path {file_path} does not have one of valid extensions .csv, .xls, or .xlsx")
-    if not set(column_names).issubset(set(df.columns)):
-        raise ValueError(f"Column names not in the dataframe.\n\tRequested column names: {column_names}"
-                         f"\n\tDataFrame column names: {df.columns}")
+        table = feather.read_table(file_path, memory_map=True)
+        _check_column_names(column_names, table.column_names)
+        df = _apply_dtypes(table.select(column_names).to_pandas(), dtypes)
 
     return df[column_names]
 
+
+def load_dataframe_chunks(file_path: str, column_names: list, chunk_size: int, sheet_name=None, dtypes: dict = None,
+                          row_groups: list[int] = None):
+    """
+    Chunked version of load_dataframe, for files too large to hold in memory at once.
+    :param file_path: Internal file path for input.
+    :param column_names: Specifies the column names to be included in each chunk.
+    :param chunk_size: Number of rows in each chunk. The last chunk may be smaller.
+    :param sheet_name: Excel-specific parameter denoting the sheet name in the input Excel file.
+    :param dtypes: Optional dict of column name: dtype. See load_dataframe.
+    :param row_groups: Parquet-specific parameter selecting the row groups to read.
+    :return: Generator of DataFrames, in file order, filtered to the specified column names.
+    """
+    file_extension = _get_file_extension(file_path)
+    _check_extension(file_path, file_extension)
+
+    if file_extension in CSV_EXTENSIONS:
+        _check_column_names(column_names, _read_csv_column_names(file_path))
+        for chunk in pd.read_csv(file_path, usecols=column_names, dtype=dtypes, chunksize=chunk_size):
+            yield chunk[column_names]
+    elif file_extension in PARQUET_EXTENSIONS:
+        parquet_file = parquet.ParquetFile(file_path)
+        _check_column_names(column_names, parquet_file.schema_arrow.names)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=row_groups, columns=column_names):
+            yield _apply_dtypes(batch.to_pandas(), dtypes)[column_names]
+    elif file_extension in FEATHER_EXTENSIONS:
+        # The memory-mapped table is only materialized one slice at a time
+        table = feather.read_table(file_path, memory_map=True)
+        _check_column_names(column_names, table.column_names)
+        table = table.select(column_names)
+        for chunk_start in range(0, table.num_rows, chunk_size):
+            yield _apply_dtypes(table.slice(chunk_start, chunk_size).to_pandas(), dtypes)[column_names]
+    else:
+        # Excel files can't be read in pieces, so they are loaded whole and sliced
+        df = load_dataframe(file_path=file_path, column_names=column_names, sheet_name=sheet_name, dtypes=dtypes)
+        for chunk_start in range(0, len(df), chunk_size):
+            yield df.iloc[chunk_start:chunk_start + chunk_size]
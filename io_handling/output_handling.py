@@ -2,22 +2,264 @@ import logging
 import os
 import pandas as pd
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as parquet
+except ImportError:
+    pa = None
+    parquet = None
 
-def output_dfs_to_file(output_path, dataframes: dict):
-    file_name = os.path.basename(output_path)
-    base, extension = os.path.splitext(file_name)
+# Excel sheets hold 1,048,576 rows, including the header row
+EXCEL_MAX_ROWS = 1_048_575
 
-    if extension in '.csv':
-        for name, df in dataframes.items():
-            index_col = [name for _ in range(len(df))]
-            df.insert(loc=0, column='index', value=index_col)
-        df_list = list(dataframes.values())
-        df_concatted = pd.concat(df_list)
-        df_concatted.to_csv(output_path, index=False)
-        logging.info("Output DataFrame to .csv file at '{output_path}'")
-    elif extension in '.xlsx':
-        with pd.ExcelWriter(output_path) as writer:
-            for name, df in dataframes.items():
+
+class ResultsWriter:
+    """
+    Base class for writers of Outpost result DataFrames. Results are written batch by batch, so a writer never holds
+    more than one batch (Excel excepted), and are closed on leaving a with block.
+
+    Single-table formats write every batch to one table, with an 'index' column holding the OutpostsManager name
+    followed by the results columns. The table's columns are the template's columns when a template is given, and
+    otherwise those of the first batch written; batches missing some of them get missing values.
+
+    Batches are written to a temporary path next to the output path, which replaces the output file only once every
+    batch was written, so a failed run never leaves a truncated results file.
+    """
+
+    def __init__(self, output_path, template: pd.DataFrame = None):
+        """
+
+        :param template: Optional DataFrame with every results column, in output order, and their dtypes, e.g. from
+            create_template.
+        """
+        self.output_path = output_path
+        output_root, output_extension = os.path.splitext(output_path)
+        self.temporary_path = f"{output_root}.partial{output_extension}"
+        self.template = template
+        self.num_rows_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            os.replace(self.temporary_path, self.output_path)
+        else:
+            self.discard()
+
+    def discard(self):
+        """
+        Removes what was written, after a failed batch.
+        """
+        if os.path.exists(self.temporary_path):
+            os.remove(self.temporary_path)
+
+    @staticmethod
+    def _with_index_column(name: str, df: pd.DataFrame) -> pd.DataFrame:
+        df = df.copy(deep=False)
+        df.insert(loc=0, column='index', value=name)
+        return df
+
+    def write_batch(self, name: str, df: pd.DataFrame):
+        raise NotImplementedError
+
+    def close(self):
+        logging.info(f"Output {self.num_rows_written} rows to file at '{self.output_path}'")
+
+
+class CsvResultsWriter(ResultsWriter):
+    """
+    Appends each batch to one .csv file.
+    """
+
+    def __init__(self, output_path, template: pd.DataFrame = None):
+        super().__init__(output_path=output_path, template=template)
+        self.column_names = None
+        if template is not None:
+            self.column_names = ['index'] + list(template.columns)
+
+    def write_batch(self, name: str, df: pd.DataFrame):
+        df = self._with_index_column(name, df)
+
+        if self.num_rows_written == 0 and self.column_names is None:
+            self.column_names = list(df.columns)
+        new_columns = [column for column in df.columns if column not in self.column_names]
+        if new_columns:
+            raise ValueError(f"Batch for '{name}' has columns {new_columns} that are not in the header already "
+                             f"written to '{self.output_path}'.")
+        df.reindex(columns=self.column_names).to_csv(self.temporary_path, index=False,
+                                                     header=self.num_rows_written == 0,
+                                                     mode='w' if self.num_rows_written == 0 else 'a')
+        self.num_rows_written += len(df)
+
+    def close(self):
+        if self.num_rows_written == 0:
+            pd.DataFrame(columns=self.column_names or ['index']).to_csv(self.temporary_path, index=False)
+        super().close()
+
+
+def _decode_dictionaries(schema):
+    """
+
+    :return: The schema with the dictionary-encoded fields replaced by fields of their value type.
+    """
+    return pa.schema([field.with_type(field.type.value_type) if pa.types.is_dictionary(field.type) else field
+                      for field in schema], metadata=schema.metadata)
+
+
+class _ArrowResultsWriter(ResultsWriter):
+    """
+    Base class for the pyarrow writers. Every batch is converted to the schema of the template, or else of the first
+    batch. Categorical columns are written as their values, as each batch has its own categories, which Arrow IPC
+    files can't replace between batches.
+    """
+
+    def __init__(self, output_path, template: pd.DataFrame = None):
+        if pa is None:
+            raise ImportError(f"Writing '{output_path}' requires pyarrow, which is not installed.")
+
+        super().__init__(output_path=output_path, template=template)
+        self.schema = None
+        self.writer = None
+
+    def _open_writer(self, schema):
+        raise NotImplementedError
+
+    def _to_table(self, name: str, df: pd.DataFrame):
+        df = self._with_index_column(name, df)
+        if self.schema is None:
+            schema_df = df if self.template is None else self._with_index_column(name, self.template)
+            self.schema = _decode_dictionaries(pa.Table.from_pandas(schema_df, preserve_index=False).schema)
+            self.writer = self._open_writer(self.schema)
+
+        new_columns = [column for column in df.columns if column not in self.schema.names]
+        if new_columns:
+            raise ValueError(f"Batch for '{name}' has columns {new_columns} that are not in the schema already "
+                             f"written to '{self.output_path}'.")
+        try:
+            return pa.Table.from_pandas(df.reindex(columns=self.schema.names), schema=self.schema,
+                                        preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as error:
+            raise ValueError(f"Batch for '{name}' does not match the column types already written to "
+                             f"'{self.output_path}'. Set the column's dtype in the UnitFile's column_dtypes.\n"
+                             f"\t{error}") from error
+
+    def write_batch(self, name: str, df: pd.DataFrame):
+        table = self._to_table(name, df)
+        self.writer.write_table(table)
+        self.num_rows_written += len(df)
+
+    def close(self):
+        if self.writer is None and self.template is not None:
+            self._to_table('', self.template.iloc[:0])
+        if self.writer is not None:
+            self.writer.close()
+        super().close()
+
+    def discard(self):
+        if self.writer is not None:
+            self.writer.close()
+        super().discard()
+
+
+class ParquetResultsWriter(_ArrowResultsWriter):
+    """
+    Writes each batch as its own row group(s) of a Parquet file.
+    """
+
+    def _open_writer(self, schema):
+        return parquet.ParquetWriter(self.temporary_path, schema)
+
+
+class ArrowResultsWriter(_ArrowResultsWriter):
+    """
+    Writes each batch as record batches of an Arrow IPC file, which is also readable as a Feather (v2) file.
+    """
+
+    def _open_writer(self, schema):
+        return pa.ipc.new_file(self.temporary_path, schema)
+
+
+class ExcelResultsWriter(ResultsWriter):
+    """
+    Writes one Excel sheet per OutpostsManager name. Excel can't be appended to, so batches are held until close;
+    only suited to small outputs, and limited to EXCEL_MAX_ROWS rows per sheet.
+    """
+
+    def __init__(self, output_path, template: pd.DataFrame = None):
+        super().__init__(output_path=output_path, template=template)
+        # name: list of batch DataFrames
+        self.sheet_batches = {}
+        self.sheet_num_rows = {}
+
+    def write_batch(self, name: str, df: pd.DataFrame):
+        num_sheet_rows = self.sheet_num_rows.get(name, 0) + len(df)
+        if num_sheet_rows > EXCEL_MAX_ROWS:
+            raise ValueError(f"Excel sheet '{name}' would have {num_sheet_rows} rows, more than the {EXCEL_MAX_ROWS} "
+                             f"an Excel sheet holds. Output to .csv, .parquet, or .arrow instead.")
+
+        self.sheet_batches.setdefault(name, []).append(df)
+        self.sheet_num_rows[name] = num_sheet_rows
+        self.num_rows_written += len(df)
+
+    def close(self):
+        with pd.ExcelWriter(self.temporary_path) as writer:
+            for name, batches in self.sheet_batches.items():
+                df = batches[0] if len(batches) == 1 else pd.concat(batches, ignore_index=True)
                 df.to_excel(writer, sheet_name=name, index=False)
                 logging.info(f"Output DataFrame to Excel sheet name '{name}'")
-        logging.info(f"Output DataFrame to .xlsx at '{output_path}'")
\ No newline at end of file
+        super().close()
+
+
+RESULTS_WRITERS = {
+    '.csv': CsvResultsWriter,
+    '.parquet': ParquetResultsWriter,
+    '.pq': ParquetResultsWriter,
+    '.arrow': ArrowResultsWriter,
+    '.feather': ArrowResultsWriter,
+    '.ipc': ArrowResultsWriter,
+    '.xlsx': ExcelResultsWriter
+}
+
+
+def create_template(dataframes: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+
+    :return: One-row DataFrame with the union of the DataFrames' columns, in order of first appearance, holding the
+        first non-missing value of each column, so that the column types of formats like Parquet can be inferred.
+        Columns have the dtypes pd.concat of the DataFrames would give them.
+    """
+    column_names = list(dict.fromkeys(column for df in dataframes for column in df.columns))
+    template_columns = {}
+    for column in column_names:
+        column_samples = [df[column].dropna().iloc[:1] for df in dataframes if column in df.columns]
+        template_columns[column] = pd.concat(column_samples, ignore_index=True).iloc[:1]
+    return pd.DataFrame(template_columns, columns=column_names)
+
+
+def create_results_writer(output_path, template: pd.DataFrame = None) -> ResultsWriter:
+    """
+
+    :param output_path: Output file path. Its extension selects the format; see RESULTS_WRITERS.
+    :param template: Optional DataFrame with every results column; see ResultsWriter.
+    :return: New ResultsWriter for the output path.
+    """
+    extension = os.path.splitext(os.path.basename(output_path))[1].lower()
+    if extension not in RESULTS_WRITERS:
+        raise KeyError(f"Requested output to invalid file extension '{extension}'.\n"
+                       f"Valid file extensions: {list(RESULTS_WRITERS.keys())}")
+    return RESULTS_WRITERS[extension](output_path, template=template)
+
+
+def output_dfs_to_file(output_path, dataframes: dict):
+    """
+
+    :param output_path: Output file path. Its extension selects the format; see RESULTS_WRITERS.
+    :param dataframes: Dict of OutpostsManager name: results DataFrame.
+    """
+    # Outpost files with different extra columns are written with the union of their columns
+    template = create_template(list(dataframes.values()))
+    with create_results_writer(output_path, template=template) as writer:
+        for name, df in dataframes.items():
+            writer.write_batch(name=name, df=df)
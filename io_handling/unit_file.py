@@ -1,3 +1,5 @@
+import hashlib
+
 
 class UnitFile:
 
@@ -7,19 +9,73 @@ class UnitFile:
                  longitude_column_name: str,
                  file_path: str,
                  extra_column_names: list[str] = None,
-                 sheet_name: str = None
+                 sheet_name: str = None,
+                 coordinate_dtype: str = 'float64',
+                 column_dtypes: dict = None,
+                 row_groups: list[int] = None
                  ):
+        """
+
+        :param file_alias: Name of the file's units in logs and output.
+        :param latitude_column_name: Name of the latitude column.
+        :param longitude_column_name: Name of the longitude column.
+        :param file_path: Path of a .csv, Excel, Parquet, or Feather/Arrow file.
+        :param extra_column_names: Columns read alongside the coordinates.
+        :param sheet_name: Excel-specific sheet name. Defaults to the first sheet.
+        :param coordinate_dtype: dtype the coordinate columns are parsed as, 'float64' or 'float32'. float32 halves the
+            loaded coordinates' memory at a precision of roughly one meter.
+        :param column_dtypes: Optional dict of extra column name: dtype, e.g. 'category' for repetitive strings.
+        :param row_groups: Parquet-specific list of row groups to read. Defaults to every row group.
+        """
         self.file_alias = file_alias
         self.latitude_column_name = latitude_column_name
         self.longitude_column_name = longitude_column_name
         self.file_path = file_path
         self.sheet_name = sheet_name
+        self.coordinate_dtype = coordinate_dtype
+        self.column_dtypes = column_dtypes
+        self.row_groups = row_groups
 
         self.extra_column_names = extra_column_names
 
+        self._content_hash = None
+
     def get_all_column_names(self):
         if self.extra_column_names:
             combined_columns = self.extra_column_names + [self.latitude_column_name, self.longitude_column_name]
         else:
             combined_columns = [self.latitude_column_name, self.longitude_column_name]
         return combined_columns
+
+    def get_column_dtypes(self) -> dict:
+        """
+
+        :return: Dict of column name: dtype for every column with an explicit dtype.
+        """
+        column_dtypes = dict(self.column_dtypes) if self.column_dtypes else {}
+        column_dtypes[self.latitude_column_name] = self.coordinate_dtype
+        column_dtypes[self.longitude_column_name] = self.coordinate_dtype
+        return column_dtypes
+
+    def get_content_hash(self) -> str:
+        """
+
+        :return: SHA-256 hex digest of the file's contents. Computed once per UnitFile object.
+        """
+        if self._content_hash is None:
+            file_hash = hashlib.sha256()
+            with open(self.file_path, 'rb') as file:
+                for block in iter(lambda: file.read(1024 * 1024), b''):
+                    file_hash.update(block)
+            self._content_hash = file_hash.hexdigest()
+        return self._content_hash
+
+    def get_coordinates_cache_key(self) -> str:
+        """
+
+        :return: Key identifying this file's coordinates, built from the file contents, sheet name, row groups, and the
+            latitude and longitude column names and dtype.
+        """
+        key_string = '|'.join([self.get_content_hash(), str(self.sheet_name), str(self.row_groups),
+                               self.latitude_column_name, self.longitude_column_name, self.coordinate_dtype])
+        return hashlib.sha256(key_string.encode('utf-8')).hexdigest()
@@ -0,0 +1,73 @@
+"""
+Closed-form, vectorized lat/lon bounding boxes around coordinates.
+
+Geodetic latitude and longitude are the spherical coordinates of the ellipsoid's surface normal. Along any path on the
+ellipsoid the normal turns by at most the path length divided by the smallest radius of curvature, a(1 - e^2) at the
+equator along the meridian. So every point within a distance d of a coordinate lies within the spherical angle
+d / (a(1 - e^2)) of it in geodetic coordinates, and the spherical boxes below, built with that angle, are conservative
+for every model in distance_calculation.
+"""
+import numpy as np
+
+from . import distance_calculation
+
+WGS84_E_SQUARED = distance_calculation.WGS84_F * (2 - distance_calculation.WGS84_F)
+MINIMUM_CURVATURE_RADIUS_MILES = (distance_calculation.WGS84_A * (1 - WGS84_E_SQUARED)
+                                  / distance_calculation.METERS_PER_MILE)
+
+
+def scan_range_to_angle(scan_range):
+    """
+
+    :param scan_range: Distance in miles, or an array of distances.
+    :return: The largest spherical angle, in radians, between the geodetic coordinates of two points that distance
+        apart.
+    """
+    return np.asarray(scan_range, dtype=np.float64) / MINIMUM_CURVATURE_RADIUS_MILES
+
+
+def create_bounding_boxes(latitudes, longitudes, scan_range) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Computes a conservative bounding box containing every point within scan_range of each coordinate. Boxes whose
+    scan range reaches a pole span all longitudes. Boxes crossing the antimeridian are split in two.
+
+    :param latitudes: Latitudes of the box centers.
+    :param longitudes: Longitudes of the box centers.
+    :param scan_range: Box radius in miles. Either one range for all boxes, or an array with one range per box.
+    :return: Tuple of (boxes, wrapped_boxes, is_wrapped). boxes and wrapped_boxes are (n, 4) arrays of
+        (left, bottom, right, top). wrapped_boxes holds the second half of split boxes, and is only meaningful where the
+        boolean array is_wrapped is True.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    angle = scan_range_to_angle(scan_range)
+    latitudes_rad = np.radians(latitudes)
+
+    bottom = np.degrees(np.maximum(latitudes_rad - angle, -np.pi / 2))
+    top = np.degrees(np.minimum(latitudes_rad + angle, np.pi / 2))
+
+    reaches_pole = (np.abs(latitudes_rad) + angle) >= np.pi / 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        longitude_ratio = np.where(reaches_pole, 1.0, np.sin(np.minimum(angle, np.pi / 2)) / np.cos(latitudes_rad))
+    half_width = np.where(reaches_pole, 180.0, np.degrees(np.arcsin(np.clip(longitude_ratio, 0.0, 1.0))))
+
+    left = np.where(reaches_pole, -180.0, longitudes - half_width)
+    right = np.where(reaches_pole, 180.0, longitudes + half_width)
+
+    wraps_west = left < -180.0
+    wraps_east = right > 180.0
+    is_wrapped = wraps_west | wraps_east
+
+    wrapped_boxes = np.column_stack((
+        np.where(wraps_west, left + 360.0, -180.0),
+        bottom,
+        np.where(wraps_west, 180.0, right - 360.0),
+        top
+    ))
+    boxes = np.column_stack((
+        np.maximum(left, -180.0),
+        bottom,
+        np.minimum(right, 180.0),
+        top
+    ))
+    return boxes, wrapped_boxes, is_wrapped
@@ -0,0 +1,187 @@
+"""
+Batch distance calculation between coordinates, in miles.
+
+All models broadcast their inputs with NumPy, so one outpost against an array of candidate scout coordinates, or two
+equal-length arrays of coordinate pairs, are both computed in a single call.
+
+Available models and their error against geopy's geodesic (Karney, WGS-84), which remains available as 'exact' for
+verification:
+
+* **geodesic** - Vectorized Vincenty inverse solution on the WGS-84 ellipsoid. Agrees with geopy to under 1 millimeter.
+  The rare nearly-antipodal pairs for which Vincenty does not converge are recomputed with geopy.
+* **haversine** - Great-circle distance on a sphere of the WGS-84 mean radius. Relative error stays under 0.6%
+  (up to roughly 0.15 miles at 25 miles).
+* **equirectangular** - Flat projection about the mean latitude of each pair. Matches haversine within 0.1% for
+  separations under 100 miles below 70 degrees latitude, so is within 0.7% of geopy there. Error grows quickly near
+  the poles and across the antimeridian.
+* **exact** - geopy's geodesic, computed one pair at a time. Slow; intended for verification.
+"""
+import numpy as np
+from geopy import distance
+
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+MEAN_EARTH_RADIUS_MILES = 6371.0088 / 1.609344
+METERS_PER_MILE = 1609.344
+
+_VINCENTY_MAX_ITERATIONS = 200
+_VINCENTY_TOLERANCE = 1e-12
+
+
+def _as_radians(*values):
+    return [np.radians(np.asarray(value, dtype=np.float64)) for value in values]
+
+
+def _vincenty_miles(lat1, lon1, lat2, lon2):
+    lat1_rad, lon1_rad, lat2_rad, lon2_rad = _as_radians(lat1, lon1, lat2, lon2)
+    lat1_rad, lon1_rad, lat2_rad, lon2_rad = np.broadcast_arrays(lat1_rad, lon1_rad, lat2_rad, lon2_rad)
+
+    lon_difference = lon2_rad - lon1_rad
+    reduced_lat1 = np.arctan((1 - WGS84_F) * np.tan(lat1_rad))
+    reduced_lat2 = np.arctan((1 - WGS84_F) * np.tan(lat2_rad))
+    sin_u1, cos_u1 = np.sin(reduced_lat1), np.cos(reduced_lat1)
+    sin_u2, cos_u2 = np.sin(reduced_lat2), np.cos(reduced_lat2)
+
+    lam = lon_difference
+    converged = np.zeros(lam.shape, dtype=bool)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(_VINCENTY_MAX_ITERATIONS):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos_sq_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos_sq_alpha == 0
+            cos_2sigma_m = np.where(cos_sq_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos_sq_alpha)
+            c = WGS84_F / 16 * cos_sq_alpha * (4 + WGS84_F * (4 - 3 * cos_sq_alpha))
+            new_lam = lon_difference + (1 - c) * WGS84_F * sin_alpha * (
+                    sigma + c * sin_sigma * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+            converged = np.abs(new_lam - lam) < _VINCENTY_TOLERANCE
+            lam = new_lam
+            if converged.all():
+                break
+
+        u_sq = cos_sq_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        a_coef = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        b_coef = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = b_coef * sin_sigma * (cos_2sigma_m + b_coef / 4 * (
+                cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+                - b_coef / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+        miles = WGS84_B * a_coef * (sigma - delta_sigma) / METERS_PER_MILE
+
+    unresolved = ~converged | ~np.isfinite(miles)
+    if unresolved.any():
+        miles = np.array(miles, dtype=np.float64)
+        miles[unresolved] = _geopy_miles(np.degrees(lat1_rad[unresolved]), np.degrees(lon1_rad[unresolved]),
+                                         np.degrees(lat2_rad[unresolved]), np.degrees(lon2_rad[unresolved]))
+    return miles
+
+
+def _haversine_miles(lat1, lon1, lat2, lon2):
+    lat1_rad, lon1_rad, lat2_rad, lon2_rad = _as_radians(lat1, lon1, lat2, lon2)
+    half_chord = (np.sin((lat2_rad - lat1_rad) / 2) ** 2
+                  + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin((lon2_rad - lon1_rad) / 2) ** 2)
+    return 2 * MEAN_EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(half_chord, 0.0, 1.0)))
+
+
+def _equirectangular_miles(lat1, lon1, lat2, lon2):
+    lat1_rad, lon1_rad, lat2_rad, lon2_rad = _as_radians(lat1, lon1, lat2, lon2)
+    x = (lon2_rad - lon1_rad) * np.cos((lat1_rad + lat2_rad) / 2)
+    y = lat2_rad - lat1_rad
+    return MEAN_EARTH_RADIUS_MILES * np.hypot(x, y)
+
+
+def _geopy_miles(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.asarray(value, dtype=np.float64)
+                                                   for value in (lat1, lon1, lat2, lon2)))
+    miles = np.empty(lat1.shape, dtype=np.float64)
+    for i in np.ndindex(lat1.shape):
+        miles[i] = distance.geodesic((lat1[i], lon1[i]), (lat2[i], lon2[i])).miles
+    return miles
+
+
+DISTANCE_MODELS = {
+    'geodesic': _vincenty_miles,
+    'haversine': _haversine_miles,
+    'equirectangular': _equirectangular_miles,
+    'exact': _geopy_miles
+}
+
+
+# Along any path on the ellipsoid both radii of curvature lie between a(1 - e^2), the meridional radius at the equator,
+# and a^2 / b, the radius at the poles
+_WGS84_MIN_CURVATURE_RADIUS_MILES = WGS84_A * (1 - WGS84_F * (2 - WGS84_F)) / METERS_PER_MILE
+_WGS84_MAX_CURVATURE_RADIUS_MILES = WGS84_A ** 2 / WGS84_B / METERS_PER_MILE
+
+# Distance model: (smallest, largest) radius r for which the model's distance between two coordinates lies between
+# r times their spherical angle in geodetic coordinates. Equirectangular distances have no such bounds.
+SPHERICAL_RADIUS_BOUNDS = {
+    'geodesic': (_WGS84_MIN_CURVATURE_RADIUS_MILES, _WGS84_MAX_CURVATURE_RADIUS_MILES),
+    'haversine': (MEAN_EARTH_RADIUS_MILES, MEAN_EARTH_RADIUS_MILES),
+    'exact': (_WGS84_MIN_CURVATURE_RADIUS_MILES, _WGS84_MAX_CURVATURE_RADIUS_MILES)
+}
+# Slack added to the bounds, covering rounding and the geodesic model's sub-millimeter error against the true geodesic
+_BOUND_RELATIVE_TOLERANCE = 1e-9
+_BOUND_ABSOLUTE_TOLERANCE_MILES = 1e-5
+
+
+def _spherical_angles(lat1, lon1, lat2, lon2):
+    lat1_rad, lon1_rad, lat2_rad, lon2_rad = _as_radians(lat1, lon1, lat2, lon2)
+    half_chord = (np.sin((lat2_rad - lat1_rad) / 2) ** 2
+                  + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin((lon2_rad - lon1_rad) / 2) ** 2)
+    return 2 * np.arcsin(np.sqrt(np.clip(half_chord, 0.0, 1.0)))
+
+
+def _get_distance_function(model: str):
+    if model not in DISTANCE_MODELS:
+        raise KeyError(f"Requested invalid distance model {model}.\n"
+                       f"Valid distance models: {list(DISTANCE_MODELS.keys())}")
+    return DISTANCE_MODELS[model]
+
+
+def batch_distances(latitudes1, longitudes1, latitudes2, longitudes2, model: str = 'geodesic') -> np.ndarray:
+    """
+    Computes the distances between arrays of coordinate pairs. Inputs are broadcast against one another.
+
+    :param latitudes1: Latitudes of the first coordinate of each pair.
+    :param longitudes1: Longitudes of the first coordinate of each pair.
+    :param latitudes2: Latitudes of the second coordinate of each pair.
+    :param longitudes2: Longitudes of the second coordinate of each pair.
+    :param model: One of the keys of DISTANCE_MODELS.
+    :return: Array of distances in miles.
+    """
+    distance_function = _get_distance_function(model)
+    return np.asarray(distance_function(latitudes1, longitudes1, latitudes2, longitudes2), dtype=np.float64)
+
+
+def distances_from_point(coordinate: tuple, latitudes, longitudes, model: str = 'geodesic') -> np.ndarray:
+    """
+
+    :param coordinate: The (latitude, longitude) to measure from, typically an outpost.
+    :param latitudes: Latitudes of the candidate coordinates.
+    :param longitudes: Longitudes of the candidate coordinates.
+    :param model: One of the keys of DISTANCE_MODELS.
+    :return: Array of distances in miles from the coordinate to each candidate coordinate.
+    """
+    return batch_distances(coordinate[0], coordinate[1], latitudes, longitudes, model=model)
+
+
+def distance_bounds(latitudes1, longitudes1, latitudes2, longitudes2,
+                    model: str = 'geodesic') -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cheap lower and upper bounds of the model's distances between arrays of coordinate pairs, from the pairs' spherical
+    angles. The bounds are within 1% of each other for the ellipsoidal models, and equal up to rounding for haversine.
+
+    :param model: One of the keys of DISTANCE_MODELS.
+    :return: Tuple of (lower bounds, upper bounds) arrays in miles, or None if the model has no spherical bounds.
+    """
+    _get_distance_function(model)
+    if model not in SPHERICAL_RADIUS_BOUNDS:
+        return None
+
+    angles = _spherical_angles(latitudes1, longitudes1, latitudes2, longitudes2)
+    min_radius, max_radius = SPHERICAL_RADIUS_BOUNDS[model]
+    return (angles * min_radius * (1 - _BOUND_RELATIVE_TOLERANCE) - _BOUND_ABSOLUTE_TOLERANCE_MILES,
+            angles * max_radius * (1 + _BOUND_RELATIVE_TOLERANCE) + _BOUND_ABSOLUTE_TOLERANCE_MILES)
@@ -0,0 +1,100 @@
+import numpy as np
+
+from . import bounding_boxes
+from .spatial_index_analyzer import SpatialIndexAnalyzer
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+
+def _to_unit_sphere(latitudes, longitudes) -> np.ndarray:
+    """
+
+    :return: (n, 3) array of 3-D points on the unit sphere, treating geodetic latitude and longitude as spherical
+        coordinates.
+    """
+    latitudes_rad = np.radians(np.asarray(latitudes, dtype=np.float64))
+    longitudes_rad = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_latitudes = np.cos(latitudes_rad)
+    return np.column_stack((cos_latitudes * np.cos(longitudes_rad),
+                            cos_latitudes * np.sin(longitudes_rad),
+                            np.sin(latitudes_rad)))
+
+
+def scan_range_to_chord(scan_range):
+    """
+
+    :param scan_range: Distance in miles, or an array of distances.
+    :return: Conservative unit-sphere chord length for the distance. See bounding_boxes for why the angle is
+        conservative.
+    """
+    angle = np.minimum(bounding_boxes.scan_range_to_angle(scan_range), np.pi)
+    return 2 * np.sin(angle / 2)
+
+
+class KDTreeAnalyzer(SpatialIndexAnalyzer):
+    """
+    scipy cKDTree over scout coordinates on the 3-D unit sphere, queried by chord length. Avoids the lat/lon box
+    distortion near the poles and the antimeridian. Requires scipy.
+    """
+
+    def __init__(self, distance_model: str = 'geodesic'):
+        super().__init__(distance_model=distance_model)
+        # Points are the indexed scout hubs, in hub id order
+        self.kdtree = None
+
+    def create_index(self, scout_latitudes: np.ndarray, scout_longitudes: np.ndarray, cache_basename: str = None):
+        """
+        Builds the KD-tree. KD-trees are fast enough to build that they are not cached, so cache_basename is ignored.
+
+        :param scout_latitudes: Array of scout hub latitudes.
+        :param scout_longitudes: Array of scout hub longitudes.
+        :param cache_basename: Unused.
+        """
+        if cKDTree is None:
+            raise ImportError("The 'kdtree' spatial index backend requires scipy.")
+
+        self._set_scout_coordinates(scout_latitudes, scout_longitudes)
+        self.kdtree = cKDTree(_to_unit_sphere(self.scout_latitudes, self.scout_longitudes))
+
+    def update_index(self, scout_latitudes: np.ndarray, scout_longitudes: np.ndarray, inserted_hub_ids: np.ndarray,
+                     deleted_hub_ids: np.ndarray):
+        """
+        cKDTrees are static, so the KD-tree is rebuilt over the indexed hubs.
+        """
+        indexed_hub_ids = self._update_indexed_hub_ids(num_scout_hubs=len(scout_latitudes),
+                                                       inserted_hub_ids=inserted_hub_ids,
+                                                       deleted_hub_ids=deleted_hub_ids)
+        self._set_scout_coordinates(scout_latitudes, scout_longitudes, indexed_hub_ids=indexed_hub_ids)
+        self.kdtree = cKDTree(_to_unit_sphere(self.scout_latitudes[self.indexed_hub_ids],
+                                              self.scout_longitudes[self.indexed_hub_ids]))
+
+    def _to_scout_hub_ids(self, kdtree_point_ids: np.ndarray) -> np.ndarray:
+        if self.indexed_hub_ids is None:
+            return kdtree_point_ids
+        return self.indexed_hub_ids[kdtree_point_ids]
+
+    @staticmethod
+    def _flatten_neighbor_lists(neighbor_lists) -> tuple[np.ndarray, np.ndarray]:
+        counts = np.fromiter((len(neighbors) for neighbors in neighbor_lists), dtype=np.int64,
+                             count=len(neighbor_lists))
+        outpost_positions = np.repeat(np.arange(len(neighbor_lists), dtype=np.int64), counts)
+        if counts.sum() == 0:
+            return outpost_positions, np.empty(0, dtype=np.int64)
+        return outpost_positions, np.concatenate(neighbor_lists).astype(np.int64)
+
+    def _query_candidates(self, outpost_latitudes, outpost_longitudes, scan_range) -> tuple[np.ndarray, np.ndarray]:
+        if len(outpost_latitudes) == 0 or self.num_indexed_scout_hubs == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        neighbor_lists = self.kdtree.query_ball_point(_to_unit_sphere(outpost_latitudes, outpost_longitudes),
+                                                      r=scan_range_to_chord(scan_range))
+        outpost_positions, kdtree_point_ids = self._flatten_neighbor_lists(neighbor_lists)
+        return outpost_positions, self._to_scout_hub_ids(kdtree_point_ids)
+
+    def _nearest_candidates(self, outpost_latitudes, outpost_longitudes, k) -> tuple[np.ndarray, np.ndarray]:
+        _, kdtree_point_ids = self.kdtree.query(_to_unit_sphere(outpost_latitudes, outpost_longitudes), k=k)
+        outpost_positions = np.repeat(np.arange(len(outpost_latitudes), dtype=np.int64), k)
+        return outpost_positions, self._to_scout_hub_ids(kdtree_point_ids.reshape(-1).astype(np.int64))
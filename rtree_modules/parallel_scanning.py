@@ -0,0 +1,159 @@
+"""
+Multi-process outpost scanning. Outposts are split into contiguous shards that worker processes scan against the same
+read-only SpatialIndexAnalyzer; shard results are merged back in shard order, so the output is identical to the serial
+SpatialIndexAnalyzer.scan_for_scouts_in_outposts_range.
+
+Each index gets one pool of workers, started on its first parallel scan and kept until the index changes or the scanner
+is closed, so repeated scans (e.g. one per block or chunk) only send the shards' outpost coordinates. Forked workers
+inherit the analyzer. Workers started otherwise (spawn or forkserver, e.g. the default on macOS and Windows) receive
+the scout coordinates and the ids of the indexed scout hubs once at start-up, and rebuild their own copy of the index.
+"""
+import multiprocessing
+
+import numpy as np
+
+from .spatial_index_analyzer import SpatialIndexAnalyzer
+
+# State of a worker process: 'analyzer', the worker's copy of the SpatialIndexAnalyzer. Workers only change their own
+# copy of the analyzer's stats.
+_worker_state = {}
+
+
+def _initialize_forked_worker(analyzer: SpatialIndexAnalyzer):
+    _worker_state.update(analyzer=analyzer)
+
+
+def _initialize_spawned_worker(analyzer_class, distance_model, scout_latitudes, scout_longitudes, indexed_hub_ids,
+                               stats_class):
+    analyzer = analyzer_class(distance_model=distance_model)
+    analyzer.create_index(scout_latitudes=scout_latitudes,
+                          scout_longitudes=scout_longitudes)
+    if indexed_hub_ids is not None:
+        # Hubs update_index removed from the parent's index keep their coordinates, and are removed here too
+        is_indexed = np.zeros(len(scout_latitudes), dtype=bool)
+        is_indexed[indexed_hub_ids] = True
+        analyzer.update_index(scout_latitudes=scout_latitudes,
+                              scout_longitudes=scout_longitudes,
+                              inserted_hub_ids=np.empty(0, dtype=np.int64),
+                              deleted_hub_ids=np.flatnonzero(~is_indexed))
+    if stats_class is not None:
+        analyzer.stats = stats_class()
+    _worker_state.update(analyzer=analyzer)
+
+
+def _scan_shard(shard: tuple) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict]:
+    """
+
+    :param shard: Tuple of (position of the shard's first outpost, outpost latitudes, outpost longitudes, scan ranges,
+        exact distances) of the shard.
+    :return: Tuple of (outpost positions, scout hub ids, distances, dict of stats counter: increment).
+    """
+    shard_start, outpost_latitudes, outpost_longitudes, scan_ranges, exact_distances = shard
+    analyzer = _worker_state['analyzer']
+    # Counters of the worker's copy of the stats are sent back as the shard's increments
+    counters_before = dict(analyzer.stats.counters) if analyzer.stats is not None else {}
+    outpost_positions, scout_hub_ids, distances = analyzer.scan_for_scouts_in_outposts_range(
+        outpost_latitudes=outpost_latitudes,
+        outpost_longitudes=outpost_longitudes,
+        scan_range=scan_ranges,
+        exact_distances=exact_distances
+    )
+    counter_increments = {}
+    if analyzer.stats is not None:
+        counter_increments = {counter_name: value - counters_before.get(counter_name, 0)
+                              for counter_name, value in analyzer.stats.counters.items()}
+    return outpost_positions + shard_start, scout_hub_ids, distances, counter_increments
+
+
+class ParallelOutpostScanner:
+    """
+    Scans outposts against SpatialIndexAnalyzers with one pool of worker processes per analyzer. Pools are kept
+    between scans; call close to stop them.
+    """
+    # Number of shards per worker. More shards than workers evens out shards of unequal scout density.
+    shards_per_worker = 4
+
+    def __init__(self, num_workers: int, start_method: str = None):
+        """
+
+        :param num_workers: Number of worker processes. 1 or less scans serially in the calling process.
+        :param start_method: Optional multiprocessing start method of the workers, e.g. 'fork', 'spawn' or
+            'forkserver'. Defaults to the platform's default, as fork is unsafe with threaded libraries on macOS.
+        """
+        self.num_workers = num_workers
+        self.start_method = start_method
+        # id of the analyzer: tuple of (analyzer, its index_version and whether it had stats when the pool started,
+        # pool)
+        self.pools = {}
+
+    def _create_shards(self, num_outposts: int, min_shard_size: int) -> list[tuple[int, int]]:
+        shard_size = max(min_shard_size, -(-num_outposts // (self.num_workers * self.shards_per_worker)))
+        return [(shard_start, min(shard_start + shard_size, num_outposts))
+                for shard_start in range(0, num_outposts, shard_size)]
+
+    def _get_pool(self, rtree_analyzer: SpatialIndexAnalyzer):
+        """
+
+        :return: Pool of workers holding a copy of the analyzer's current index. Pools of earlier versions of the index
+            are closed.
+        """
+        pool_key = (rtree_analyzer.index_version, rtree_analyzer.stats is not None)
+        if id(rtree_analyzer) in self.pools:
+            analyzer, analyzer_pool_key, pool = self.pools[id(rtree_analyzer)]
+            if analyzer is rtree_analyzer and analyzer_pool_key == pool_key:
+                return pool
+            pool.terminate()
+            del self.pools[id(rtree_analyzer)]
+
+        context = multiprocessing.get_context(self.start_method)
+        if context.get_start_method() == 'fork':
+            # Forked workers inherit the initializer's arguments, so the analyzer is not pickled
+            initializer, initargs = _initialize_forked_worker, (rtree_analyzer,)
+        else:
+            stats_class = None if rtree_analyzer.stats is None else type(rtree_analyzer.stats)
+            initializer = _initialize_spawned_worker
+            initargs = (type(rtree_analyzer), rtree_analyzer.distance_model, rtree_analyzer.scout_latitudes,
+                        rtree_analyzer.scout_longitudes, rtree_analyzer.indexed_hub_ids, stats_class)
+        pool = context.Pool(processes=self.num_workers, initializer=initializer, initargs=initargs)
+        self.pools[id(rtree_analyzer)] = (rtree_analyzer, pool_key, pool)
+        return pool
+
+    def close(self):
+        """
+        Stops every worker pool. Later parallel scans start new pools.
+        """
+        for _, _, pool in self.pools.values():
+            pool.terminate()
+            pool.join()
+        self.pools = {}
+
+    def scan_for_scouts_in_outposts_range(self, rtree_analyzer: SpatialIndexAnalyzer, outpost_latitudes,
+                                          outpost_longitudes, scan_range,
+                                          exact_distances: bool = True) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Parallel version of SpatialIndexAnalyzer.scan_for_scouts_in_outposts_range, with the same arguments and
+        results.
+        """
+        outpost_latitudes = np.asarray(outpost_latitudes, dtype=np.float64)
+        outpost_longitudes = np.asarray(outpost_longitudes, dtype=np.float64)
+        scan_ranges = np.broadcast_to(np.asarray(scan_range, dtype=np.float64), outpost_latitudes.shape)
+
+        shards = self._create_shards(num_outposts=len(outpost_latitudes),
+                                     min_shard_size=rtree_analyzer.scan_block_size)
+        if self.num_workers <= 1 or len(shards) <= 1:
+            return rtree_analyzer.scan_for_scouts_in_outposts_range(outpost_latitudes=outpost_latitudes,
+                                                                    outpost_longitudes=outpost_longitudes,
+                                                                    scan_range=scan_ranges,
+                                                                    exact_distances=exact_distances)
+
+        shard_results = self._get_pool(rtree_analyzer).map(_scan_shard, [
+            (shard_start, outpost_latitudes[shard_start:shard_stop], outpost_longitudes[shard_start:shard_stop],
+             scan_ranges[shard_start:shard_stop], exact_distances)
+            for shard_start, shard_stop in shards
+        ])
+
+        if rtree_analyzer.stats is not None:
+            for shard_result in shard_results:
+                rtree_analyzer.stats.merge_counters(shard_result[3])
+        # pool.map returns shard results in shard order, which keeps the merge deterministic
+        return tuple(np.concatenate(arrays) for arrays in list(zip(*shard_results))[:3])
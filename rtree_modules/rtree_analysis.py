@@ -1,82 +1,146 @@
-from geopy import Point, distance
-from rtree import index
-
-
-class DistancesToCoordinates:
+import logging
+import os
 
-    def __init__(self):
-        self.distances_to_coordinates = []
-        self.processed_coordinates = set()
-
-    def add_coordinate(self, coordinate, distance):
-        if coordinate not in self.processed_coordinates:
-            new_value = (coordinate, distance)
-            self.distances_to_coordinates.append(new_value)
-            self.processed_coordinates.add(coordinate)
+import numpy as np
+from rtree import index
 
-    def coordinate_and_distance_generator(self):
-        for coordinate, distance in self.distances_to_coordinates:
-            yield coordinate, distance
+from . import bounding_boxes
+from .spatial_index_analyzer import SpatialIndexAnalyzer
 
 
-class RtreeAnalyzer:
+class RtreeAnalyzer(SpatialIndexAnalyzer):
+    """
+    libspatialindex Rtree over scout (longitude, latitude) points, queried with conservative lat/lon bounding boxes.
+    """
 
-    def __init__(self):
+    def __init__(self, distance_model: str = 'geodesic'):
+        super().__init__(distance_model=distance_model)
         self.rtree = None
-
-    @staticmethod
-    def _create_bounding_box(coordinate, scan_range):
-        center_point = Point(coordinate[0], coordinate[1])
-        north_point = distance.distance(miles=scan_range).destination(center_point, 0)
-        south_point = distance.distance(miles=scan_range).destination(center_point, 180)
-        east_point = distance.distance(miles=scan_range).destination(center_point, 90)
-        west_point = distance.distance(miles=scan_range).destination(center_point, 270)
-
-        left = west_point.longitude
-        right = east_point.longitude
-        bottom = south_point.latitude
-        top = north_point.latitude
-
-        bounding_box = (left, bottom, right, top)
-        return bounding_box
-
-    @staticmethod
-    def _distance_between(coord1, coord2):
-        return distance.geodesic(coord1, coord2).miles
-
-    def _get_scout_hubs_in_bounding_box(self, outpost_coordinate, scan_range):
-        bounding_box = self._create_bounding_box(coordinate=outpost_coordinate,
-                                                 scan_range=scan_range)
-        scout_hubs_in_bbox = list(self.rtree.intersection(bounding_box, objects=True))
-        return scout_hubs_in_bbox
-
-    def _hub_within_exact_outpost_radius(self, scout_hub_coordinate, outpost_coordinate, scan_range):
-        points_distance = self._distance_between(outpost_coordinate, scout_hub_coordinate)
-        if points_distance <= scan_range:
-            return points_distance
-        else:
-            return None
-
-    def create_rtree(self, scout_coordinates: list[tuple]):
-        rtree = index.Index()
-        if not scout_coordinates:
-            print("Method create_rtrees called on an empty set of scout coordinates.")
-
-        for i, scout_coordinate_tuple in enumerate(scout_coordinates):
-            latitude, longitude = scout_coordinate_tuple[0], scout_coordinate_tuple[1]
-            rtree.insert(i, (longitude, latitude, longitude, latitude))
-        self.rtree = rtree
-
-    def scan_for_scouts_in_outpost_range(self, outpost_coordinate: tuple, scan_range: int) -> DistancesToCoordinates:
-        scout_hubs_in_bbox = self._get_scout_hubs_in_bounding_box(outpost_coordinate, scan_range)
-
-        distances_to_coordinates_obj = DistancesToCoordinates()
-        # Within the bounding box doesn't mean within the circular radius
-        for scout_hub in scout_hubs_in_bbox:
-            scout_hub_coordinate = (scout_hub.bbox[1], scout_hub.bbox[0])
-            distance_result = self._hub_within_exact_outpost_radius(scout_hub_coordinate, outpost_coordinate,
-                                                                    scan_range)
-            if distance_result:
-                distances_to_coordinates_obj.add_coordinate(coordinate=scout_hub_coordinate,
-                                                            distance=distance_result)
-        return distances_to_coordinates_obj
+        # Basename of the cached Rtree files the Rtree is read from, if any
+        self.cache_basename = None
+
+    def _intersect_boxes(self, boxes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+
+        :param boxes: (n, 4) array of (left, bottom, right, top) boxes.
+        :return: Tuple of (box positions, scout hub ids), one entry per hub found inside a box.
+        """
+        if len(boxes) == 0 or len(self.rtree) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        scout_hub_ids, counts = self.rtree.intersection_v(boxes[:, :2], boxes[:, 2:])
+        box_positions = np.repeat(np.arange(len(boxes), dtype=np.int64), counts.astype(np.int64))
+        return box_positions, scout_hub_ids
+
+    def query_bounding_boxes(self, outpost_latitudes, outpost_longitudes, scan_range) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the scout hubs within the conservative bounding box of each outpost. Performs only index lookups; no
+        distances are computed.
+
+        :param outpost_latitudes: Array of outpost latitudes.
+        :param outpost_longitudes: Array of outpost longitudes.
+        :param scan_range: Range in miles. Either one range for all outposts, or an array with one range per outpost.
+        :return: Tuple of (outpost positions, scout hub ids), one entry per candidate pair.
+        """
+        boxes, wrapped_boxes, is_wrapped = bounding_boxes.create_bounding_boxes(latitudes=outpost_latitudes,
+                                                                                longitudes=outpost_longitudes,
+                                                                                scan_range=scan_range)
+        outpost_positions, scout_hub_ids = self._intersect_boxes(boxes)
+
+        # Boxes crossing the antimeridian have their second half queried separately
+        wrapped_positions = np.flatnonzero(is_wrapped)
+        if wrapped_positions.size:
+            wrapped_box_positions, wrapped_hub_ids = self._intersect_boxes(wrapped_boxes[wrapped_positions])
+            outpost_positions = np.concatenate((outpost_positions, wrapped_positions[wrapped_box_positions]))
+            scout_hub_ids = np.concatenate((scout_hub_ids, wrapped_hub_ids))
+        return outpost_positions, scout_hub_ids
+
+    def _query_candidates(self, outpost_latitudes, outpost_longitudes, scan_range) -> tuple[np.ndarray, np.ndarray]:
+        return self.query_bounding_boxes(outpost_latitudes=outpost_latitudes,
+                                         outpost_longitudes=outpost_longitudes,
+                                         scan_range=scan_range)
+
+    def _nearest_candidates(self, outpost_latitudes, outpost_longitudes, k) -> tuple[np.ndarray, np.ndarray]:
+        points = np.column_stack((outpost_longitudes, outpost_latitudes))
+        scout_hub_ids, counts = self.rtree.nearest_v(points, points, num_results=k, strict=True)
+        outpost_positions = np.repeat(np.arange(len(points), dtype=np.int64), counts.astype(np.int64))
+        return outpost_positions, scout_hub_ids
+
+    def _rtree_stream_arrays(self) -> tuple:
+        ids = np.arange(self.get_num_scout_hubs(), dtype=np.int64)
+        points = np.column_stack((self.scout_longitudes, self.scout_latitudes))
+        return ids, points, points
+
+    def create_index(self, scout_latitudes: np.ndarray, scout_longitudes: np.ndarray, cache_basename: str = None):
+        """
+        Bulk loads the Rtree from the scout coordinates. Rtree ids are the indices of the coordinate arrays.
+
+        :param scout_latitudes: Array of scout hub latitudes.
+        :param scout_longitudes: Array of scout hub longitudes.
+        :param cache_basename: If provided, the Rtree is also written to disk as '{cache_basename}.idx' and
+            '{cache_basename}.dat' so that it can be reloaded with load_index.
+        """
+        self._set_scout_coordinates(scout_latitudes, scout_longitudes)
+        self.cache_basename = None
+        if self.get_num_scout_hubs() == 0:
+            logging.info("Method create_index called on an empty set of scout coordinates.")
+            self.rtree = index.Index()
+            return
+
+        if not cache_basename:
+            self.rtree = index.Index(self._rtree_stream_arrays())
+            return
+
+        # Write to a temporary basename first so that an interrupted build never leaves a partial cache behind
+        temporary_basename = f"{cache_basename}.tmp"
+        disk_rtree = index.Index(temporary_basename, self._rtree_stream_arrays())
+        disk_rtree.close()
+        for extension in ('.idx', '.dat'):
+            os.replace(temporary_basename + extension, cache_basename + extension)
+        self.rtree = index.Index(cache_basename)
+        self.cache_basename = cache_basename
+
+    def update_index(self, scout_latitudes: np.ndarray, scout_longitudes: np.ndarray, inserted_hub_ids: np.ndarray,
+                     deleted_hub_ids: np.ndarray):
+        """
+        Inserts and deletes Rtree entries in place. A cached Rtree is first copied into memory, so the cache files keep
+        matching the coordinates they are keyed by.
+        """
+        if self.cache_basename is not None:
+            self.rtree.close()
+            self.rtree = index.Index(self._rtree_stream_arrays()) if self.get_num_scout_hubs() else index.Index()
+            self.cache_basename = None
+
+        indexed_hub_ids = self._update_indexed_hub_ids(num_scout_hubs=len(scout_latitudes),
+                                                       inserted_hub_ids=inserted_hub_ids,
+                                                       deleted_hub_ids=deleted_hub_ids)
+        self._set_scout_coordinates(scout_latitudes, scout_longitudes, indexed_hub_ids=indexed_hub_ids)
+        for scout_hub_id in deleted_hub_ids:
+            point = (self.scout_longitudes[scout_hub_id], self.scout_latitudes[scout_hub_id])
+            self.rtree.delete(int(scout_hub_id), point + point)
+        for scout_hub_id in inserted_hub_ids:
+            point = (self.scout_longitudes[scout_hub_id], self.scout_latitudes[scout_hub_id])
+            self.rtree.insert(int(scout_hub_id), point + point)
+
+    def load_index(self, scout_latitudes: np.ndarray, scout_longitudes: np.ndarray, cache_basename: str) -> bool:
+        """
+        Loads an Rtree previously written by create_index for the same scout coordinates.
+
+        :param scout_latitudes: Array of scout hub latitudes, in the same order used to create the Rtree.
+        :param scout_longitudes: Array of scout hub longitudes, in the same order used to create the Rtree.
+        :param cache_basename: Basename of the '.idx' and '.dat' files.
+        :return: True if the cached Rtree was loaded, False if it does not exist or does not match the coordinates.
+        """
+        if not all(os.path.exists(cache_basename + extension) for extension in ('.idx', '.dat')):
+            return False
+
+        cached_rtree = index.Index(cache_basename)
+        if len(cached_rtree) != len(scout_latitudes):
+            logging.info(f"Cached Rtree at '{cache_basename}' does not match its scout coordinates. Rebuilding.")
+            cached_rtree.close()
+            return False
+
+        self._set_scout_coordinates(scout_latitudes, scout_longitudes)
+        self.rtree = cached_rtree
+        self.cache_basename = cache_basename
+        return True
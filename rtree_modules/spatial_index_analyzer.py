@@ -0,0 +1,244 @@
+import numpy as np
+
+from . import distance_calculation
+
+
+class SpatialIndexAnalyzer:
+    """
+    Base class for spatial index backends over scout coordinates. Each scout coordinate is a 'scout hub' addressed by
+    its position in the scout coordinate arrays the index was created from.
+
+    Backends implement create_index, update_index, _query_candidates, and _nearest_candidates. Candidates only need to
+    be a superset of the true answer. Candidates are first tested against cheap spherical bounds of their distances;
+    only those the bounds can't place inside or outside the range are measured before the range test.
+    """
+    # Number of outposts queried against the index at once
+    scan_block_size = 4096
+
+    def __init__(self, distance_model: str = 'geodesic'):
+        """
+
+        :param distance_model: Distance model used to measure scouts against the outpost radius. See
+            distance_calculation.DISTANCE_MODELS.
+        """
+        self.distance_model = distance_model
+
+        self.scout_latitudes = np.empty(0)
+        self.scout_longitudes = np.empty(0)
+        # Ids of the scout hubs in the index, or None while every hub is indexed. Hubs removed by update_index keep
+        # their coordinates but aren't indexed.
+        self.indexed_hub_ids = None
+        self.num_indexed_scout_hubs = 0
+        # Incremented whenever the index is created, loaded or updated, so that copies of the index can tell it changed
+        self.index_version = 0
+        # Optional RunStats the hot-path counters are added to: 'index_candidates' returned by the index,
+        # 'index_candidates_accepted' within range, 'index_candidates_ambiguous' left undecided by the distance bounds,
+        # and 'distance_evaluations'
+        self.stats = None
+
+    def _set_scout_coordinates(self, scout_latitudes, scout_longitudes, indexed_hub_ids: np.ndarray = None):
+        self.scout_latitudes = np.asarray(scout_latitudes, dtype=np.float64)
+        self.scout_longitudes = np.asarray(scout_longitudes, dtype=np.float64)
+        self.indexed_hub_ids = indexed_hub_ids
+        self.num_indexed_scout_hubs = len(self.scout_latitudes) if indexed_hub_ids is None else len(indexed_hub_ids)
+        self.index_version += 1
+
+    def _update_indexed_hub_ids(self, num_scout_hubs: int, inserted_hub_ids: np.ndarray,
+                                deleted_hub_ids: np.ndarray) -> np.ndarray:
+        """
+
+        :param num_scout_hubs: Number of scout hubs after the update, including new hubs.
+        :return: Ids of the hubs indexed after inserting and deleting the given hubs.
+        """
+        is_indexed = self.get_indexed_hub_mask(num_scout_hubs)
+        is_indexed[deleted_hub_ids] = False
+        is_indexed[inserted_hub_ids] = True
+        return np.flatnonzero(is_indexed)
+
+    def get_num_scout_hubs(self) -> int:
+        return len(self.scout_latitudes)
+
+    def get_indexed_hub_mask(self, num_scout_hubs: int = None) -> np.ndarray:
+        """
+
+        :param num_scout_hubs: Optional length of the mask, if larger than the number of scout hubs.
+        :return: Boolean array marking the scout hubs that are in the index, by hub id.
+        """
+        is_indexed = np.zeros(self.get_num_scout_hubs() if num_scout_hubs is None else num_scout_hubs, dtype=bool)
+        if self.indexed_hub_ids is None:
+            is_indexed[:self.get_num_scout_hubs()] = True
+        else:
+            is_indexed[self.indexed_hub_ids] = True
+        return is_indexed
+
+    def create_index(self, scout_latitudes: np.ndarray, scout_longitudes: np.ndarray, cache_basename: str = None):
+        """
+        Builds the index over the scout coordinates.
+
+        :param scout_latitudes: Array of scout hub latitudes.
+        :param scout_longitudes: Array of scout hub longitudes.
+        :param cache_basename: If provided and supported by the backend, the index is also written to disk so that it
+            can be reloaded with load_index.
+        """
+        raise NotImplementedError
+
+    def update_index(self, scout_latitudes: np.ndarray, scout_longitudes: np.ndarray, inserted_hub_ids: np.ndarray,
+                     deleted_hub_ids: np.ndarray):
+        """
+        Updates the index in place after scout hubs were added or emptied. Hub ids are unchanged.
+
+        :param scout_latitudes: Array of every scout hub latitude, including new hubs appended after the previous ones.
+        :param scout_longitudes: Array of every scout hub longitude.
+        :param inserted_hub_ids: Ids of the hubs to add to the index.
+        :param deleted_hub_ids: Ids of the hubs to remove from the index.
+        """
+        raise NotImplementedError
+
+    def load_index(self, scout_latitudes: np.ndarray, scout_longitudes: np.ndarray, cache_basename: str) -> bool:
+        """
+        Loads an index previously written by create_index for the same scout coordinates.
+
+        :return: True if the cached index was loaded. Backends without on-disk indexes always return False.
+        """
+        return False
+
+    def _query_candidates(self, outpost_latitudes: np.ndarray, outpost_longitudes: np.ndarray,
+                          scan_range) -> tuple[np.ndarray, np.ndarray]:
+        """
+
+        :return: Tuple of (outpost positions, scout hub ids) containing at least every scout hub within scan_range of
+            each outpost.
+        """
+        raise NotImplementedError
+
+    def _nearest_candidates(self, outpost_latitudes: np.ndarray, outpost_longitudes: np.ndarray,
+                            k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+
+        :return: Tuple of (outpost positions, scout hub ids) with k approximately-nearest scout hubs for each outpost.
+        """
+        raise NotImplementedError
+
+    def _measure(self, outpost_latitudes, outpost_longitudes, outpost_positions, scout_hub_ids) -> np.ndarray:
+        if self.stats is not None:
+            self.stats.increment('distance_evaluations', len(scout_hub_ids))
+        return distance_calculation.batch_distances(outpost_latitudes[outpost_positions],
+                                                    outpost_longitudes[outpost_positions],
+                                                    self.scout_latitudes[scout_hub_ids],
+                                                    self.scout_longitudes[scout_hub_ids],
+                                                    model=self.distance_model)
+
+    def _bound_distances(self, outpost_latitudes, outpost_longitudes, outpost_positions,
+                         scout_hub_ids) -> tuple[np.ndarray, np.ndarray, bool]:
+        """
+
+        :return: Tuple of (lower bounds, upper bounds, whether the bounds are the measured distances). Distance models
+            without spherical bounds are measured.
+        """
+        bounds = distance_calculation.distance_bounds(outpost_latitudes[outpost_positions],
+                                                      outpost_longitudes[outpost_positions],
+                                                      self.scout_latitudes[scout_hub_ids],
+                                                      self.scout_longitudes[scout_hub_ids],
+                                                      model=self.distance_model)
+        if bounds is None:
+            distances = self._measure(outpost_latitudes, outpost_longitudes, outpost_positions, scout_hub_ids)
+            return distances, distances, True
+        return bounds[0], bounds[1], False
+
+    def _filter_candidates(self, outpost_latitudes, outpost_longitudes, outpost_positions, scout_hub_ids,
+                           candidate_scan_ranges, exact_distances: bool) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Two-stage range test. The distance bounds accept the candidates certainly within range and reject those
+        certainly beyond it; only the candidates in the thin band between are measured to be decided.
+
+        :param exact_distances: Whether to also measure the accepted candidates.
+        :return: Tuple of (in range mask, distances). Distances not measured are upper bounds.
+        """
+        lower_bounds, distances, is_measured = self._bound_distances(outpost_latitudes, outpost_longitudes,
+                                                                     outpost_positions, scout_hub_ids)
+        is_inside = distances <= candidate_scan_ranges
+        if is_measured:
+            return is_inside, distances
+
+        is_ambiguous = ~is_inside & (lower_bounds <= candidate_scan_ranges)
+        measured = is_ambiguous | is_inside if exact_distances else is_ambiguous
+        distances[measured] = self._measure(outpost_latitudes, outpost_longitudes, outpost_positions[measured],
+                                            scout_hub_ids[measured])
+        if self.stats is not None:
+            self.stats.increment('index_candidates_ambiguous', np.count_nonzero(is_ambiguous))
+        return is_inside | (is_ambiguous & (distances <= candidate_scan_ranges)), distances
+
+    def scan_for_scouts_in_outposts_range(self, outpost_latitudes, outpost_longitudes, scan_range,
+                                          exact_distances: bool = True) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Finds every scout hub within scan_range of each outpost. Outposts are processed in blocks of scan_block_size,
+        each needing one batch of index lookups and one batch distance calculation.
+
+        :param outpost_latitudes: Array of outpost latitudes.
+        :param outpost_longitudes: Array of outpost longitudes.
+        :param scan_range: Range in miles. Either one range for all outposts, or an array with one range per outpost.
+        :param exact_distances: If False, only the distances needed to decide whether a scout hub is in range are
+            measured, and the others are returned as upper bounds of at most the outpost's scan range.
+        :return: Tuple of (outpost positions, scout hub ids, distances), one entry per scout hub in range.
+        """
+        outpost_latitudes = np.asarray(outpost_latitudes, dtype=np.float64)
+        outpost_longitudes = np.asarray(outpost_longitudes, dtype=np.float64)
+        scan_ranges = np.broadcast_to(np.asarray(scan_range, dtype=np.float64), outpost_latitudes.shape)
+
+        results = []
+        for block_start in range(0, len(outpost_latitudes), self.scan_block_size):
+            block = slice(block_start, block_start + self.scan_block_size)
+            block_latitudes = outpost_latitudes[block]
+            block_longitudes = outpost_longitudes[block]
+            block_scan_ranges = scan_ranges[block]
+            outpost_positions, scout_hub_ids = self._query_candidates(outpost_latitudes=block_latitudes,
+                                                                      outpost_longitudes=block_longitudes,
+                                                                      scan_range=block_scan_ranges)
+            # Candidates from the index are only a superset of the scouts within the circular radius
+            in_range, distances = self._filter_candidates(block_latitudes, block_longitudes, outpost_positions,
+                                                          scout_hub_ids, block_scan_ranges[outpost_positions],
+                                                          exact_distances)
+            if self.stats is not None:
+                self.stats.increment('index_candidates', len(scout_hub_ids))
+                self.stats.increment('index_candidates_accepted', np.count_nonzero(in_range))
+            results.append((outpost_positions[in_range] + block_start, scout_hub_ids[in_range], distances[in_range]))
+
+        if not results:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        return tuple(np.concatenate(arrays) for arrays in zip(*results))
+
+    def nearest_scouts(self, outpost_latitudes, outpost_longitudes, k: int = 1) -> tuple[np.ndarray, np.ndarray,
+                                                                                         np.ndarray]:
+        """
+        Finds the k nearest scout hubs to each outpost, with no range limit. The index's approximate nearest
+        candidates' upper distance bounds bound each outpost's k-th nearest distance, and a range scan at that bound then
+        gives the exact answer.
+
+        :param outpost_latitudes: Array of outpost latitudes.
+        :param outpost_longitudes: Array of outpost longitudes.
+        :param k: Number of nearest scout hubs to find for each outpost.
+        :return: Tuple of (outpost positions, scout hub ids, distances), sorted by outpost position and then distance.
+        """
+        outpost_latitudes = np.asarray(outpost_latitudes, dtype=np.float64)
+        outpost_longitudes = np.asarray(outpost_longitudes, dtype=np.float64)
+        k = min(k, self.num_indexed_scout_hubs)
+        if k <= 0 or len(outpost_latitudes) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        outpost_positions, scout_hub_ids = self._nearest_candidates(outpost_latitudes, outpost_longitudes, k)
+        _, candidate_upper_bounds, _ = self._bound_distances(outpost_latitudes, outpost_longitudes, outpost_positions,
+                                                             scout_hub_ids)
+        kth_distance_bounds = np.zeros(len(outpost_latitudes))
+        np.maximum.at(kth_distance_bounds, outpost_positions, candidate_upper_bounds)
+
+        outpost_positions, scout_hub_ids, distances = self.scan_for_scouts_in_outposts_range(
+            outpost_latitudes=outpost_latitudes,
+            outpost_longitudes=outpost_longitudes,
+            scan_range=kth_distance_bounds
+        )
+        order = np.lexsort((distances, outpost_positions))
+        outpost_positions, scout_hub_ids, distances = outpost_positions[order], scout_hub_ids[order], distances[order]
+
+        segment_starts = np.searchsorted(outpost_positions, outpost_positions, side='left')
+        is_within_k = (np.arange(len(outpost_positions)) - segment_starts) < k
+        return outpost_positions[is_within_k], scout_hub_ids[is_within_k], distances[is_within_k]
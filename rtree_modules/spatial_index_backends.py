@@ -0,0 +1,21 @@
+from .kdtree_analysis import KDTreeAnalyzer
+from .rtree_analysis import RtreeAnalyzer
+from .spatial_index_analyzer import SpatialIndexAnalyzer
+
+SPATIAL_INDEX_BACKENDS = {
+    'rtree': RtreeAnalyzer,
+    'kdtree': KDTreeAnalyzer
+}
+
+
+def create_spatial_index_analyzer(backend: str, distance_model: str = 'geodesic') -> SpatialIndexAnalyzer:
+    """
+
+    :param backend: One of the keys of SPATIAL_INDEX_BACKENDS.
+    :param distance_model: Distance model passed to the analyzer.
+    :return: New, empty SpatialIndexAnalyzer of the requested backend.
+    """
+    if backend not in SPATIAL_INDEX_BACKENDS:
+        raise KeyError(f"Requested invalid spatial index backend {backend}.\n"
+                       f"Valid spatial index backends: {list(SPATIAL_INDEX_BACKENDS.keys())}")
+    return SPATIAL_INDEX_BACKENDS[backend](distance_model=distance_model)
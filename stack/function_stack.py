@@ -26,3 +26,10 @@ class FunctionStack:
     def function_generator(self):
         for func, kwargs in self.func_stack:
             yield func, kwargs
+
+    def function_call_generator(self):
+        """
+        Yields each stacked call as (function name, kwargs).
+        """
+        for func, kwargs in self.func_stack:
+            yield func.__name__, kwargs
@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from environment_management.environment_manager import EnvironmentManager
+from io_handling import unit_file
+from rtree_modules.spatial_index_analyzer import SpatialIndexAnalyzer
+
+
+def _write_unit_files(directory) -> tuple[unit_file.UnitFile, set[unit_file.UnitFile]]:
+    rng = np.random.default_rng(3)
+    outpost_latitudes = rng.uniform(30.0, 30.5, 300)
+    outpost_longitudes = rng.uniform(-97.5, -97.0, 300)
+    # Duplicate coordinates share one outpost hub
+    outpost_latitudes[::10], outpost_longitudes[::10] = outpost_latitudes[0], outpost_longitudes[0]
+    pd.DataFrame({'lat': outpost_latitudes, 'lon': outpost_longitudes, 'GISJOIN': np.arange(300)}).to_csv(
+        os.path.join(directory, 'outposts.csv'), index=False)
+    outpost_file = unit_file.UnitFile(file_alias='outposts', latitude_column_name='lat', longitude_column_name='lon',
+                                      extra_column_names=['GISJOIN'], file_path=os.path.join(directory, 'outposts.csv'))
+
+    scout_files = set()
+    for file_alias in ('a', 'b'):
+        values = rng.uniform(0.0, 10.0, 400)
+        values[::7] = np.nan
+        pd.DataFrame({'latitude': rng.uniform(30.0, 30.5, 400), 'longitude': rng.uniform(-97.5, -97.0, 400),
+                      'value': values, 'name': rng.choice(['x', 'y', 'z'], 400)}).to_csv(
+            os.path.join(directory, f"scouts_{file_alias}.csv"), index=False)
+        scout_files.add(unit_file.UnitFile(file_alias=file_alias, latitude_column_name='latitude',
+                                           longitude_column_name='longitude',
+                                           file_path=os.path.join(directory, f"scouts_{file_alias}.csv")))
+    return outpost_file, scout_files
+
+
+def _process(directory, **kwargs) -> dict:
+    outpost_file, scout_files = _write_unit_files(directory)
+    env_manager = EnvironmentManager(outpost_unit_files={outpost_file}, scout_unit_files=scout_files, **kwargs)
+    env_manager.scout_in_range_tf(scan_range=1)
+    env_manager.num_scouts_in_range(scan_range=2)
+    env_manager.num_scouts_in_range_by_variable(scan_range=3, variable='name', target_value='x')
+    env_manager.average_scouts_by_variable(scan_range=3, variable='value')
+    env_manager.sum_scouts_by_variable(scan_range=2, variable='value')
+    env_manager.min_scouts_by_variable(scan_range=3, variable='value')
+    env_manager.max_scouts_by_variable(scan_range=1, variable='value')
+    env_manager.nearest_scout(scan_range=3)
+    env_manager.nearest_scouts(k=2, variable='name')
+    env_manager.process_analysis_functions()
+    return {names_combination.outposts_query_results.name:
+            names_combination.outposts_query_results.compile_query_data_into_df()
+            for names_combination in env_manager.unit_names_combinations_manager.combinations}
+
+
+@pytest.mark.parametrize('merge_scout_indexes', [False, True])
+def test_aggregate_join_matches_neighbor_table_results(tmp_path, monkeypatch, merge_scout_indexes):
+    # Small scan blocks, so that every Outpost file is aggregated over several blocks
+    monkeypatch.setattr(SpatialIndexAnalyzer, 'scan_block_size', 16)
+
+    table_results = _process(tmp_path, merge_scout_indexes=merge_scout_indexes)
+    aggregated_results = _process(tmp_path, merge_scout_indexes=merge_scout_indexes, aggregate_join=True)
+
+    assert table_results.keys() == aggregated_results.keys()
+    for name, results in table_results.items():
+        pd.testing.assert_frame_equal(aggregated_results[name], results, check_exact=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize('function_name, kwargs', [
+    ('median_scouts_by_variable', {'scan_range': 2, 'variable': 'value'}),
+    ('num_scouts_in_range_by_variable_values', {'scan_range': 2, 'variable': 'name'}),
+    ('num_scouts_in_rings', {'breaks': [1, 2]})
+])
+def test_aggregate_join_rejects_functions_without_streaming_implementation(tmp_path, function_name, kwargs):
+    outpost_file, scout_files = _write_unit_files(tmp_path)
+    env_manager = EnvironmentManager(outpost_unit_files={outpost_file}, scout_unit_files=scout_files,
+                                     aggregate_join=True)
+    env_manager.num_scouts_in_range(scan_range=2)
+    env_manager.nearest_scouts(k=1)
+    getattr(env_manager, function_name)(**kwargs)
+
+    with pytest.raises(ValueError, match=function_name):
+        env_manager.process_analysis_functions()
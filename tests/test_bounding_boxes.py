@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from rtree_modules import bounding_boxes, distance_calculation
+from rtree_modules.spatial_index_backends import SPATIAL_INDEX_BACKENDS
+
+# Outposts within a scan range of a pole, and on either side of the antimeridian
+EDGE_OUTPOSTS = [(89.99, 0.0), (89.9, 179.9), (89.5, -45.0), (-89.95, 120.0), (-89.7, -179.95),
+                 (0.0, 179.99), (0.0, -179.99), (60.0, 180.0), (-45.0, -180.0), (70.0, 179.5)]
+
+
+def _create_edge_scouts(rng) -> tuple[np.ndarray, np.ndarray]:
+    # Scouts around both poles at every longitude, and along both sides of the antimeridian
+    latitudes = np.concatenate((rng.uniform(88.0, 90.0, 3000), rng.uniform(-90.0, -88.0, 3000),
+                                rng.uniform(-50.0, 75.0, 6000)))
+    longitudes = np.concatenate((rng.uniform(-180.0, 180.0, 6000),
+                                 np.where(rng.random(6000) < 0.5, rng.uniform(177.0, 180.0, 6000),
+                                          rng.uniform(-180.0, -177.0, 6000))))
+    return latitudes, longitudes
+
+
+def _brute_force_scouts_in_range(outpost_latitude, outpost_longitude, scout_latitudes, scout_longitudes,
+                                 scan_range) -> np.ndarray:
+    distances = distance_calculation.batch_distances(np.full(len(scout_latitudes), outpost_latitude),
+                                                     np.full(len(scout_longitudes), outpost_longitude),
+                                                     scout_latitudes, scout_longitudes)
+    return np.flatnonzero(distances <= scan_range)
+
+
+@pytest.mark.parametrize('scan_range', [5.0, 30.0, 120.0])
+def test_bounding_boxes_contain_every_scout_in_range_at_poles_and_antimeridian(scan_range):
+    scout_latitudes, scout_longitudes = _create_edge_scouts(np.random.default_rng(4))
+    outpost_latitudes, outpost_longitudes = (np.array(coordinates) for coordinates in zip(*EDGE_OUTPOSTS))
+    boxes, wrapped_boxes, is_wrapped = bounding_boxes.create_bounding_boxes(outpost_latitudes, outpost_longitudes,
+                                                                           scan_range)
+
+    num_checked_scouts = 0
+    for position in range(len(EDGE_OUTPOSTS)):
+        in_range = _brute_force_scouts_in_range(outpost_latitudes[position], outpost_longitudes[position],
+                                                scout_latitudes, scout_longitudes, scan_range)
+        latitudes, longitudes = scout_latitudes[in_range], scout_longitudes[in_range]
+        in_boxes = [(box[0] <= longitudes) & (longitudes <= box[2]) & (box[1] <= latitudes) & (latitudes <= box[3])
+                    for box in (boxes[position], wrapped_boxes[position])]
+        in_any_box = in_boxes[0] | (in_boxes[1] & is_wrapped[position])
+        assert in_any_box.all(), f"Outpost {EDGE_OUTPOSTS[position]} drops scouts within {scan_range} miles."
+        num_checked_scouts += len(in_range)
+    assert num_checked_scouts > 0
+
+
+@pytest.mark.parametrize('backend', ['rtree', 'kdtree'])
+def test_scan_finds_every_scout_in_range_at_poles_and_antimeridian(backend):
+    pytest.importorskip('rtree' if backend == 'rtree' else 'scipy')
+    scout_latitudes, scout_longitudes = _create_edge_scouts(np.random.default_rng(5))
+    outpost_latitudes, outpost_longitudes = (np.array(coordinates) for coordinates in zip(*EDGE_OUTPOSTS))
+    analyzer = SPATIAL_INDEX_BACKENDS[backend]()
+    analyzer.create_index(scout_latitudes=scout_latitudes, scout_longitudes=scout_longitudes)
+
+    outpost_positions, scout_hub_ids, _ = analyzer.scan_for_scouts_in_outposts_range(
+        outpost_latitudes=outpost_latitudes,
+        outpost_longitudes=outpost_longitudes,
+        scan_range=50.0
+    )
+
+    for position in range(len(EDGE_OUTPOSTS)):
+        expected_scouts = _brute_force_scouts_in_range(outpost_latitudes[position], outpost_longitudes[position],
+                                                       scout_latitudes, scout_longitudes, 50.0)
+        np.testing.assert_array_equal(np.sort(scout_hub_ids[outpost_positions == position]), expected_scouts)
@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from environment_management.environment_manager import EnvironmentManager
+from io_handling import unit_file
+from units import ScoutsManager
+from units.outpost import outposts_analysis_functions
+
+READERS = {'.csv': pd.read_csv, '.parquet': pd.read_parquet, '.arrow': pd.read_feather}
+
+
+def _write_files(directory):
+    rng = np.random.default_rng(7)
+    # Streamed chunks of the Outposts have different categories
+    pd.DataFrame({'lat': rng.uniform(30.0, 30.2, 50), 'lon': rng.uniform(-97.2, -97.0, 50),
+                  'county': np.repeat(['Travis', 'Hays'], 25)}).to_csv(os.path.join(directory, 'outposts.csv'),
+                                                                       index=False)
+    for file_alias, names in (('a', ['x', 'y']), ('b', ['y', 'z'])):
+        pd.DataFrame({'latitude': rng.uniform(30.0, 30.2, 80), 'longitude': rng.uniform(-97.2, -97.0, 80),
+                      'name': rng.choice(names + [None], 80),
+                      'size': rng.choice([1, 2, 5], 80)}).to_csv(os.path.join(directory, f"scouts_{file_alias}.csv"),
+                                                                 index=False)
+
+
+def _create_environment(directory, categorical: bool, **kwargs) -> EnvironmentManager:
+    outpost_file = unit_file.UnitFile(file_alias='outposts', latitude_column_name='lat', longitude_column_name='lon',
+                                      extra_column_names=['county'], file_path=os.path.join(directory, 'outposts.csv'),
+                                      column_dtypes={'county': 'category'} if categorical else None)
+    scout_files = {unit_file.UnitFile(file_alias=file_alias, latitude_column_name='latitude',
+                                      longitude_column_name='longitude',
+                                      file_path=os.path.join(directory, f"scouts_{file_alias}.csv"),
+                                      column_dtypes={'name': 'category'} if categorical else None)
+                   for file_alias in ('a', 'b')}
+    env_manager = EnvironmentManager(outpost_unit_files={outpost_file}, scout_unit_files=scout_files, **kwargs)
+    env_manager.num_scouts_in_range_by_variable(scan_range=3, variable='name', target_value='y')
+    env_manager.num_scouts_in_range_by_variable_values(scan_range=3, variable='name')
+    env_manager.average_scouts_by_variable(scan_range=3, variable='size')
+    env_manager.nearest_scouts(k=2, variable='name')
+    return env_manager
+
+
+def test_category_columns_keep_codes_and_categories(tmp_path):
+    _write_files(tmp_path)
+    dataframe = pd.read_csv(os.path.join(tmp_path, 'scouts_a.csv'), dtype={'name': 'category'})
+    scouts_manager = ScoutsManager(name='a')
+    scouts_manager.create_scouts(dataframe=dataframe, lat_column_name='latitude', lon_column_name='longitude',
+                                 extra_column_names=['name'])
+    other_manager = ScoutsManager(name='b')
+    other_manager.create_scouts(dataframe=pd.read_csv(os.path.join(tmp_path, 'scouts_b.csv')),
+                                lat_column_name='latitude', lon_column_name='longitude', extra_column_names=['size'])
+
+    assert isinstance(scouts_manager.get_column('name'), pd.Categorical)
+    merged_manager = ScoutsManager.merge(name='merged', scouts_managers=[scouts_manager, other_manager])
+    merged_names = merged_manager.get_column('name')
+    assert isinstance(merged_names, pd.Categorical)
+    assert merged_names.categories.tolist() == ['x', 'y']
+    assert pd.isna(merged_names[len(dataframe):]).all()
+
+    scouts_manager.apply_changes(inserted_latitudes=np.array([30.0]), inserted_longitudes=np.array([-97.0]),
+                                 inserted_columns={'name': np.array(['w'], dtype=object)},
+                                 deleted_scout_ids=np.array([0]))
+    assert isinstance(scouts_manager.get_column('name'), pd.Categorical)
+    assert scouts_manager.get_column('name').tolist() == dataframe['name'].tolist()[1:] + ['w']
+
+
+def test_numeric_category_columns_are_averaged_from_their_categories():
+    values = pd.Categorical([5, 1, None, 5])
+    numbers = outposts_analysis_functions.numeric_values(values, outposts_analysis_functions.valid_values_mask(values),
+                                                         'average_scouts_by_variable', 'size')
+    np.testing.assert_array_equal(numbers, [5.0, 1.0, np.nan, 5.0])
+
+
+@pytest.mark.parametrize('merge_scout_indexes', [False, True])
+@pytest.mark.parametrize('extension', ['.csv', '.parquet', '.arrow'])
+def test_category_columns_give_the_results_of_object_columns(tmp_path, merge_scout_indexes, extension):
+    if extension != '.csv':
+        pytest.importorskip('pyarrow')
+    _write_files(tmp_path)
+    inserted_scouts = pd.DataFrame({'latitude': [30.1, 30.1], 'longitude': [-97.1, -97.1], 'name': ['w', 'y'],
+                                    'size': [5, 2]})
+
+    results = {}
+    for categorical in (False, True):
+        env_manager = _create_environment(tmp_path, categorical, merge_scout_indexes=merge_scout_indexes)
+        env_manager.process_analysis_functions()
+        env_manager.apply_scout_changes(scout_file_alias='a', inserted_scouts=inserted_scouts)
+        output_path = os.path.join(tmp_path, f"results_{categorical}{extension}")
+        env_manager.output_data_to_file(output_path=output_path)
+        streamed_path = os.path.join(tmp_path, f"streamed_{categorical}{extension}")
+        _create_environment(tmp_path, categorical, merge_scout_indexes=merge_scout_indexes).stream_analysis_functions(
+            output_path=streamed_path, chunk_size=20)
+        results[categorical] = [READERS[extension](path) for path in (output_path, streamed_path)]
+
+    for categorical_results, object_results in zip(results[True], results[False]):
+        assert list(categorical_results.columns) == list(object_results.columns)
+        pd.testing.assert_frame_equal(categorical_results.astype(object), object_results.astype(object))
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from geopy import distance
+
+from rtree_modules import distance_calculation
+from rtree_modules.spatial_index_backends import SPATIAL_INDEX_BACKENDS
+
+SCAN_RANGE = 10.0
+# Outposts far enough apart that no Scout is within range of two of them
+OUTPOSTS = [(0.0, 0.0), (30.0, -97.0), (-33.9, 151.2), (64.8, -147.7), (-77.8, 166.7), (51.5, 179.95)]
+BEARINGS = np.arange(0, 360, 30)
+
+
+def _create_boundary_scouts(offset_meters: float) -> tuple[np.ndarray, np.ndarray]:
+    # Scouts on geodesics from each Outpost, offset_meters from the scan range
+    points = [distance.geodesic(miles=SCAN_RANGE + offset_meters / distance_calculation.METERS_PER_MILE).destination(
+        outpost, bearing=bearing) for outpost in OUTPOSTS for bearing in BEARINGS]
+    return np.array([point.latitude for point in points]), np.array([point.longitude for point in points])
+
+
+def test_distance_bounds_contain_exact_distances():
+    rng = np.random.default_rng(6)
+    latitudes1, latitudes2 = rng.uniform(-89.0, 89.0, (2, 500))
+    longitudes1 = rng.uniform(-180.0, 180.0, 500)
+    # Separations from a few meters up to a few hundred miles
+    longitudes2 = longitudes1 + rng.choice([1e-4, 1e-2, 1.0, 5.0], 500) * rng.uniform(-1.0, 1.0, 500)
+
+    exact_distances = distance_calculation.batch_distances(latitudes1, longitudes1, latitudes2, longitudes2,
+                                                           model='exact')
+    lower_bounds, upper_bounds = distance_calculation.distance_bounds(latitudes1, longitudes1, latitudes2, longitudes2)
+    assert (lower_bounds <= exact_distances).all()
+    assert (exact_distances <= upper_bounds).all()
+
+
+@pytest.mark.parametrize('backend', ['rtree', 'kdtree'])
+@pytest.mark.parametrize('exact_distances', [False, True])
+def test_bounded_range_decides_scouts_one_meter_from_scan_range(backend, exact_distances):
+    pytest.importorskip('rtree' if backend == 'rtree' else 'scipy')
+    inside_latitudes, inside_longitudes = _create_boundary_scouts(-1.0)
+    outside_latitudes, outside_longitudes = _create_boundary_scouts(1.0)
+    scout_latitudes = np.concatenate((inside_latitudes, outside_latitudes))
+    scout_longitudes = np.concatenate((inside_longitudes, outside_longitudes))
+    outpost_latitudes, outpost_longitudes = (np.array(coordinates) for coordinates in zip(*OUTPOSTS))
+    analyzer = SPATIAL_INDEX_BACKENDS[backend]()
+    analyzer.create_index(scout_latitudes=scout_latitudes, scout_longitudes=scout_longitudes)
+
+    outpost_positions, scout_hub_ids, distances = analyzer.scan_for_scouts_in_outposts_range(
+        outpost_latitudes=outpost_latitudes,
+        outpost_longitudes=outpost_longitudes,
+        scan_range=SCAN_RANGE,
+        exact_distances=exact_distances
+    )
+
+    # Every Scout 1 m inside the scan range, by geopy's geodesic, is found, and none 1 m outside
+    expected_outpost_positions = np.repeat(np.arange(len(OUTPOSTS)), len(BEARINGS))
+    order = np.argsort(scout_hub_ids)
+    np.testing.assert_array_equal(scout_hub_ids[order], np.arange(len(inside_latitudes)))
+    np.testing.assert_array_equal(outpost_positions[order], expected_outpost_positions)
+    geopy_distances = distance_calculation.batch_distances(outpost_latitudes[expected_outpost_positions],
+                                                           outpost_longitudes[expected_outpost_positions],
+                                                           inside_latitudes, inside_longitudes, model='exact')
+    assert (geopy_distances <= SCAN_RANGE).all()
+    if exact_distances:
+        np.testing.assert_allclose(distances[order], geopy_distances, rtol=0, atol=1e-6)
+    else:
+        # Distances not measured are upper bounds of at most the scan range
+        assert (distances[order] >= geopy_distances - 1e-6).all()
+        assert (distances <= SCAN_RANGE).all()
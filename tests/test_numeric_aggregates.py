@@ -0,0 +1,53 @@
+import os
+
+import pandas as pd
+import pytest
+
+from environment_management.environment_manager import EnvironmentManager
+from io_handling import unit_file
+
+NUMERIC_AGGREGATES = [
+    ('average_scouts_by_variable', {}),
+    ('sum_scouts_by_variable', {}),
+    ('min_scouts_by_variable', {}),
+    ('max_scouts_by_variable', {}),
+    ('percentile_scouts_by_variable', {'percentile': 90}),
+    ('distance_weighted_average_scouts_by_variable', {})
+]
+
+
+def _create_environment(directory, **kwargs) -> EnvironmentManager:
+    pd.DataFrame({'lat': [30.0, 31.0], 'lon': [-97.0, -98.0]}).to_csv(os.path.join(directory, 'outposts.csv'),
+                                                                        index=False)
+    pd.DataFrame({'latitude': [30.0, 30.01, 31.0], 'longitude': [-97.0, -97.0, -98.0], 'value': [1.0, None, 2.0],
+                  'name': ['A', None, 'B']}).to_csv(os.path.join(directory, 'scouts.csv'), index=False)
+    outpost_file = unit_file.UnitFile(file_alias='outposts', latitude_column_name='lat', longitude_column_name='lon',
+                                      file_path=os.path.join(directory, 'outposts.csv'))
+    scout_file = unit_file.UnitFile(file_alias='scouts', latitude_column_name='latitude',
+                                    longitude_column_name='longitude', file_path=os.path.join(directory, 'scouts.csv'))
+    return EnvironmentManager(outpost_unit_files={outpost_file}, scout_unit_files={scout_file}, **kwargs)
+
+
+# The first four aggregates are also computed by aggregate_join
+@pytest.mark.parametrize('function_name, kwargs, aggregate_join',
+                         [(function_name, kwargs, False) for function_name, kwargs in NUMERIC_AGGREGATES]
+                         + [(function_name, kwargs, True) for function_name, kwargs in NUMERIC_AGGREGATES[:4]])
+def test_aggregates_of_non_numeric_variable_name_the_aggregate_and_variable(tmp_path, function_name, kwargs,
+                                                                             aggregate_join):
+    env_manager = _create_environment(tmp_path, aggregate_join=aggregate_join)
+    # A numeric aggregate of the same scan range is fused with the non-numeric one
+    env_manager.average_scouts_by_variable(scan_range=5, variable='value')
+    getattr(env_manager, function_name)(scan_range=5, variable='name', **kwargs)
+
+    with pytest.raises(TypeError, match=f"{function_name} requires int or float values, but variable 'name' has "
+                                        r"values \['A', 'B'\] of types \['str'\]"):
+        env_manager.process_analysis_functions()
+
+
+def test_ring_aggregates_of_non_numeric_variable_name_the_aggregate_and_variable(tmp_path):
+    env_manager = _create_environment(tmp_path)
+    env_manager.num_scouts_in_rings(breaks=[1, 5], variable='name', aggregate='sum')
+
+    with pytest.raises(TypeError, match="num_scouts_in_rings with aggregate 'sum' requires int or float values, but "
+                                        "variable 'name'"):
+        env_manager.process_analysis_functions()
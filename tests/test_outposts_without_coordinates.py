@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from environment_management.environment_manager import EnvironmentManager
+from io_handling import unit_file
+
+
+def _create_environment(directory, **kwargs) -> EnvironmentManager:
+    pd.DataFrame({'lat': [30.0, np.nan, 30.0, 31.0], 'lon': [-97.0, -97.0, -97.0, np.nan],
+                  'GISJOIN': ['G1', 'G2', 'G3', 'G4']}).to_csv(os.path.join(directory, 'outposts.csv'), index=False)
+    pd.DataFrame({'latitude': [30.0, 30.01], 'longitude': [-97.0, -97.0], 'value': [1.0, 3.0]}).to_csv(
+        os.path.join(directory, 'scouts.csv'), index=False)
+
+    outpost_file = unit_file.UnitFile(file_alias='outposts', latitude_column_name='lat', longitude_column_name='lon',
+                                      extra_column_names=['GISJOIN'], file_path=os.path.join(directory, 'outposts.csv'))
+    scout_file = unit_file.UnitFile(file_alias='scouts', latitude_column_name='latitude',
+                                    longitude_column_name='longitude', file_path=os.path.join(directory, 'scouts.csv'))
+    env_manager = EnvironmentManager(outpost_unit_files={outpost_file}, scout_unit_files={scout_file}, **kwargs)
+    env_manager.num_scouts_in_range(scan_range=5)
+    env_manager.average_scouts_by_variable(scan_range=5, variable='value')
+    env_manager.nearest_scout(scan_range=5)
+    return env_manager
+
+
+def _check_results(results: pd.DataFrame):
+    # Every Outpost row is kept, in file order; those without a coordinate have no results
+    assert results['GISJOIN'].tolist() == ['G1', 'G2', 'G3', 'G4']
+    assert results['Number of scouts within 5 miles'].tolist()[::2] == [2, 2]
+    assert results['Average \'value\' of scouts within 5 miles'].tolist()[::2] == [2.0, 2.0]
+    assert results.iloc[[1, 3]].drop(columns=['index', 'lat', 'lon', 'latitude', 'longitude', 'GISJOIN'],
+                                      errors='ignore').isna().all().all()
+
+
+@pytest.mark.parametrize('aggregate_join', [False, True])
+def test_outposts_without_coordinates_are_kept_without_results(tmp_path, aggregate_join):
+    env_manager = _create_environment(tmp_path, aggregate_join=aggregate_join)
+    output_path = os.path.join(tmp_path, 'results.csv')
+
+    env_manager.process_analysis_functions()
+    env_manager.output_data_to_file(output_path=output_path)
+
+    _check_results(pd.read_csv(output_path))
+
+
+def test_streamed_outposts_without_coordinates_are_kept_without_results(tmp_path):
+    env_manager = _create_environment(tmp_path)
+    output_path = os.path.join(tmp_path, 'results.csv')
+
+    env_manager.stream_analysis_functions(output_path=output_path, chunk_size=3)
+
+    _check_results(pd.read_csv(output_path))
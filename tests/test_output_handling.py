@@ -0,0 +1,60 @@
+import os
+
+import pandas as pd
+import pytest
+
+from environment_management.environment_manager import EnvironmentManager
+from io_handling import output_handling, unit_file
+
+
+def _create_environment(directory) -> EnvironmentManager:
+    pd.DataFrame({'lat': [30.0, 30.1], 'lon': [-97.0, -97.1], 'GISJOIN': ['G1', 'G2']}).to_csv(
+        os.path.join(directory, 'a.csv'), index=False)
+    pd.DataFrame({'lat': [31.0], 'lon': [-98.0], 'NAME': ['Town']}).to_csv(os.path.join(directory, 'b.csv'),
+                                                                            index=False)
+    pd.DataFrame({'latitude': [30.0, 31.01], 'longitude': [-97.0, -98.0]}).to_csv(
+        os.path.join(directory, 'scouts.csv'), index=False)
+
+    outpost_files = {
+        unit_file.UnitFile(file_alias='A', latitude_column_name='lat', longitude_column_name='lon',
+                           extra_column_names=['GISJOIN'], file_path=os.path.join(directory, 'a.csv')),
+        unit_file.UnitFile(file_alias='B', latitude_column_name='lat', longitude_column_name='lon',
+                           extra_column_names=['NAME'], file_path=os.path.join(directory, 'b.csv'))
+    }
+    scout_file = unit_file.UnitFile(file_alias='scouts', latitude_column_name='latitude',
+                                    longitude_column_name='longitude', file_path=os.path.join(directory, 'scouts.csv'))
+    env_manager = EnvironmentManager(outpost_unit_files=outpost_files, scout_unit_files={scout_file})
+    env_manager.num_scouts_in_range(scan_range=5)
+    env_manager.process_analysis_functions()
+    return env_manager
+
+
+@pytest.mark.parametrize('extension', ['.csv', '.parquet', '.arrow'])
+def test_outpost_files_with_different_extra_columns_are_written_with_their_union(tmp_path, extension):
+    if extension != '.csv':
+        pytest.importorskip('pyarrow')
+    env_manager = _create_environment(tmp_path)
+    output_path = os.path.join(tmp_path, f"results{extension}")
+
+    env_manager.output_data_to_file(output_path=output_path)
+
+    readers = {'.csv': pd.read_csv, '.parquet': pd.read_parquet, '.arrow': pd.read_feather}
+    results = readers[extension](output_path).set_index('index')
+    assert {'GISJOIN', 'NAME'} <= set(results.columns)
+    assert results.loc['A', 'GISJOIN'].tolist() == ['G1', 'G2']
+    assert results.loc['A', 'NAME'].isna().all()
+    assert results.loc[['B'], 'NAME'].tolist() == ['Town']
+    assert results.loc[['B'], 'Number of scouts within 5 miles'].tolist() == [1]
+
+
+def test_failed_batch_leaves_no_results_file(tmp_path):
+    output_path = os.path.join(tmp_path, 'results.csv')
+    good_df = pd.DataFrame({'latitude': [1.0]})
+    bad_df = pd.DataFrame({'latitude': [2.0], 'extra': [3.0]})
+
+    with pytest.raises(ValueError):
+        with output_handling.create_results_writer(output_path) as writer:
+            writer.write_batch(name='A', df=good_df)
+            writer.write_batch(name='B', df=bad_df)
+
+    assert os.listdir(tmp_path) == []
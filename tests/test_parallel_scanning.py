@@ -0,0 +1,98 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from rtree_modules import parallel_scanning
+from rtree_modules.spatial_index_backends import SPATIAL_INDEX_BACKENDS
+
+
+@pytest.mark.parametrize('backend', ['rtree', 'kdtree'])
+def test_spawned_worker_index_leaves_out_deleted_hubs(backend):
+    pytest.importorskip('rtree' if backend == 'rtree' else 'scipy')
+    rng = np.random.default_rng(0)
+    scout_latitudes = rng.uniform(30.0, 30.5, 200)
+    scout_longitudes = rng.uniform(-97.5, -97.0, 200)
+    outpost_latitudes = rng.uniform(30.0, 30.5, 50)
+    outpost_longitudes = rng.uniform(-97.5, -97.0, 50)
+    scan_ranges = np.full(50, 5.0)
+
+    analyzer = SPATIAL_INDEX_BACKENDS[backend]()
+    analyzer.create_index(scout_latitudes=scout_latitudes[:180], scout_longitudes=scout_longitudes[:180])
+    analyzer.update_index(scout_latitudes=scout_latitudes, scout_longitudes=scout_longitudes,
+                          inserted_hub_ids=np.arange(180, 200), deleted_hub_ids=np.arange(0, 180, 3))
+
+    parallel_scanning._initialize_spawned_worker(type(analyzer), analyzer.distance_model, analyzer.scout_latitudes,
+                                                 analyzer.scout_longitudes, analyzer.indexed_hub_ids, None)
+    try:
+        worker_results = parallel_scanning._scan_shard((0, outpost_latitudes, outpost_longitudes, scan_ranges, True))
+    finally:
+        parallel_scanning._worker_state.clear()
+
+    expected_results = analyzer.scan_for_scouts_in_outposts_range(outpost_latitudes=outpost_latitudes,
+                                                                  outpost_longitudes=outpost_longitudes,
+                                                                  scan_range=scan_ranges)
+    # Rtree candidate order depends on how the index was built, so pairs are compared in (outpost, scout hub) order
+    worker_order = np.lexsort((worker_results[1], worker_results[0]))
+    expected_order = np.lexsort((expected_results[1], expected_results[0]))
+    for worker_array, expected_array in zip(worker_results[:3], expected_results):
+        np.testing.assert_array_equal(worker_array[worker_order], expected_array[expected_order])
+
+
+def test_pool_is_kept_between_scans_until_the_index_changes():
+    pytest.importorskip('rtree')
+    rng = np.random.default_rng(0)
+    scout_latitudes = rng.uniform(30.0, 30.5, 200)
+    scout_longitudes = rng.uniform(-97.5, -97.0, 200)
+    analyzer = SPATIAL_INDEX_BACKENDS['rtree']()
+    analyzer.scan_block_size = 10
+    analyzer.create_index(scout_latitudes=scout_latitudes, scout_longitudes=scout_longitudes)
+    scanner = parallel_scanning.ParallelOutpostScanner(num_workers=2)
+    try:
+        scanner.scan_for_scouts_in_outposts_range(analyzer, scout_latitudes[:50], scout_longitudes[:50], 5.0)
+        pool = scanner.pools[id(analyzer)][2]
+        scanner.scan_for_scouts_in_outposts_range(analyzer, scout_latitudes[50:], scout_longitudes[50:], 5.0)
+        assert scanner.pools[id(analyzer)][2] is pool
+
+        analyzer.update_index(scout_latitudes=scout_latitudes, scout_longitudes=scout_longitudes,
+                              inserted_hub_ids=np.empty(0, dtype=np.int64), deleted_hub_ids=np.arange(100))
+        _, scout_hub_ids, _ = scanner.scan_for_scouts_in_outposts_range(analyzer, scout_latitudes,
+                                                                        scout_longitudes, 5.0)
+        assert scanner.pools[id(analyzer)][2] is not pool
+        assert scout_hub_ids.min() >= 100
+    finally:
+        scanner.close()
+    assert scanner.pools == {}
+
+
+@pytest.mark.parametrize('backend', ['rtree', 'kdtree'])
+@pytest.mark.parametrize('start_method', ['fork', 'spawn'])
+@pytest.mark.parametrize('exact_distances', [True, False])
+def test_parallel_scan_matches_serial_scan(backend, start_method, exact_distances):
+    pytest.importorskip('rtree' if backend == 'rtree' else 'scipy')
+    if start_method not in multiprocessing.get_all_start_methods():
+        pytest.skip(f"Start method {start_method} is not available.")
+    rng = np.random.default_rng(1)
+    scout_latitudes = rng.uniform(30.0, 32.0, 2000)
+    scout_longitudes = rng.uniform(-98.0, -96.0, 2000)
+    outpost_latitudes = rng.uniform(30.0, 32.0, 3000)
+    outpost_longitudes = rng.uniform(-98.0, -96.0, 3000)
+    scan_ranges = rng.uniform(1.0, 8.0, 3000)
+    analyzer = SPATIAL_INDEX_BACKENDS[backend]()
+    analyzer.scan_block_size = 256
+    analyzer.create_index(scout_latitudes=scout_latitudes, scout_longitudes=scout_longitudes)
+
+    scan_results = []
+    for num_workers in (1, 2):
+        scanner = parallel_scanning.ParallelOutpostScanner(num_workers=num_workers, start_method=start_method)
+        try:
+            scan_results.append(scanner.scan_for_scouts_in_outposts_range(analyzer, outpost_latitudes,
+                                                                          outpost_longitudes, scan_ranges,
+                                                                          exact_distances=exact_distances))
+        finally:
+            scanner.close()
+
+    serial_results, parallel_results = scan_results
+    assert len(serial_results[0]) > 0
+    for serial_array, parallel_array in zip(serial_results, parallel_results):
+        np.testing.assert_array_equal(parallel_array, serial_array)
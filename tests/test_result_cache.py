@@ -0,0 +1,121 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from environment_management.environment_manager import EnvironmentManager
+from environment_management.result_cache import ResultCache
+from io_handling import unit_file
+from units.outpost.outposts_query_results import OutpostsQueryResults
+
+CALL_RESULTS = {'query': pd.array([1, 2], dtype='Int64')}
+
+
+def _write_unit_files(directory, scout_values) -> tuple[unit_file.UnitFile, unit_file.UnitFile]:
+    pd.DataFrame({'lat': [30.0, 31.0], 'lon': [-97.0, -98.0]}).to_csv(os.path.join(directory, 'outposts.csv'),
+                                                                        index=False)
+    pd.DataFrame({'latitude': [30.0, 30.01, 31.0], 'longitude': [-97.0, -97.0, -98.0],
+                  'value': scout_values}).to_csv(os.path.join(directory, 'scouts.csv'), index=False)
+    outpost_file = unit_file.UnitFile(file_alias='outposts', latitude_column_name='lat', longitude_column_name='lon',
+                                      file_path=os.path.join(directory, 'outposts.csv'))
+    scout_file = unit_file.UnitFile(file_alias='scouts', latitude_column_name='latitude',
+                                    longitude_column_name='longitude', file_path=os.path.join(directory, 'scouts.csv'))
+    return outpost_file, scout_file
+
+
+def _create_key(outpost_file, scout_file) -> str:
+    return ResultCache.create_combination_key(outpost_file=outpost_file, scout_files=[scout_file],
+                                              distance_model='geodesic', merge_scout_indexes=False)
+
+
+def test_call_results_hit_only_for_the_same_combination_and_call(tmp_path):
+    outpost_file, scout_file = _write_unit_files(tmp_path, [1.0, 2.0, 3.0])
+    cache = ResultCache(cache_directory=os.path.join(tmp_path, 'cache'))
+    combination_key = _create_key(outpost_file, scout_file)
+    cache.put_call_results(combination_key, 'sum_scouts_by_variable', {'scan_range': 5, 'variable': 'value'},
+                           CALL_RESULTS)
+
+    cached_results = cache.get_call_results(combination_key, 'sum_scouts_by_variable',
+                                            {'scan_range': 5, 'variable': 'value'})
+    pd.testing.assert_extension_array_equal(cached_results['query'], CALL_RESULTS['query'])
+    assert cache.get_call_results(combination_key, 'sum_scouts_by_variable',
+                                  {'scan_range': 5.0, 'variable': 'value'}) is None
+    assert cache.get_call_results(combination_key, 'min_scouts_by_variable',
+                                  {'scan_range': 5, 'variable': 'value'}) is None
+    # Column dtypes are part of the key, as they change the loaded values
+    scout_file.column_dtypes = {'value': 'float32'}
+    float32_values_key = _create_key(outpost_file, scout_file)
+    outpost_file.coordinate_dtype = 'float32'
+    assert len({combination_key, float32_values_key, _create_key(outpost_file, scout_file)}) == 3
+
+
+def test_changed_file_misses_and_invalidates_by_file(tmp_path):
+    outpost_file, scout_file = _write_unit_files(tmp_path, [1.0, 2.0, 3.0])
+    cache = ResultCache(cache_directory=os.path.join(tmp_path, 'cache'))
+    combination_key = _create_key(outpost_file, scout_file)
+    cache.write_manifest(combination_key, [outpost_file, scout_file])
+    cache.put_call_results(combination_key, 'num_scouts_in_range', {'scan_range': 5}, CALL_RESULTS)
+
+    changed_outpost_file, changed_scout_file = _write_unit_files(tmp_path, [1.0, 2.0, 4.0])
+    changed_key = _create_key(changed_outpost_file, changed_scout_file)
+    assert changed_key != combination_key
+    assert cache.get_call_results(changed_key, 'num_scouts_in_range', {'scan_range': 5}) is None
+
+    cache.invalidate(file_path=os.path.join(tmp_path, 'outposts.csv'))
+    assert cache.get_call_results(combination_key, 'num_scouts_in_range', {'scan_range': 5}) is None
+    assert os.listdir(os.path.join(tmp_path, 'cache')) == []
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    cache_directory = os.path.join(tmp_path, 'cache')
+    call_results = {'query': pd.array(np.arange(1000), dtype='Int64')}
+    ResultCache(cache_directory=cache_directory).put_call_results('size', 'function', {}, call_results)
+    entry_size = os.path.getsize(os.path.join(cache_directory, os.listdir(cache_directory)[0]))
+    cache = ResultCache(cache_directory=os.path.join(tmp_path, 'bounded_cache'), max_size_bytes=int(entry_size * 2.5))
+
+    for call_number in range(2):
+        cache.put_call_results('key', 'function', {'call': call_number}, call_results)
+        time.sleep(0.01)
+    # Reading the first entry makes the second the least recently used
+    assert cache.get_call_results('key', 'function', {'call': 0}) is not None
+    time.sleep(0.01)
+    # Once the cache knows its size, writes below the size limit don't scan the cache directory
+    scans = []
+    list_entries = ResultCache._list_entries
+    monkeypatch.setattr(ResultCache, '_list_entries', lambda self: scans.append(self) or list_entries(self))
+    cache.put_call_results('key', 'function', {'call': 0}, call_results)
+    assert not scans
+    cache.put_call_results('key', 'function', {'call': 2}, call_results)
+    assert scans
+
+    assert cache.get_call_results('key', 'function', {'call': 1}) is None
+    assert cache.get_call_results('key', 'function', {'call': 0}) is not None
+    assert cache.get_call_results('key', 'function', {'call': 2}) is not None
+    assert cache.total_size == sum(entry.stat().st_size for entry in os.scandir(cache.cache_directory))
+
+
+def test_environment_results_are_reused_until_a_file_changes(tmp_path, monkeypatch):
+    cache_directory = os.path.join(tmp_path, 'cache')
+    evaluated_calls = []
+    evaluate_function_calls = OutpostsQueryResults.evaluate_function_calls
+    monkeypatch.setattr(OutpostsQueryResults, 'evaluate_function_calls',
+                        lambda self, function_calls: evaluated_calls.extend(function_calls)
+                        or evaluate_function_calls(self, function_calls))
+
+    def process(scout_values) -> list:
+        outpost_file, scout_file = _write_unit_files(tmp_path, scout_values)
+        env_manager = EnvironmentManager(outpost_unit_files={outpost_file}, scout_unit_files={scout_file},
+                                         result_cache_directory=cache_directory)
+        env_manager.sum_scouts_by_variable(scan_range=5, variable='value')
+        env_manager.process_analysis_functions()
+        output_path = os.path.join(tmp_path, 'results.csv')
+        env_manager.output_data_to_file(output_path=output_path)
+        return pd.read_csv(output_path)["Sum of 'value' of scouts within 5 miles"].tolist()
+
+    assert process([1.0, 2.0, 3.0]) == [3.0, 3.0]
+    assert len(evaluated_calls) == 1
+    assert process([1.0, 2.0, 3.0]) == [3.0, 3.0]
+    assert len(evaluated_calls) == 1
+    assert process([1.0, 2.0, 5.0]) == [3.0, 5.0]
+    assert len(evaluated_calls) == 2
@@ -0,0 +1,44 @@
+import os
+
+import pandas as pd
+
+from environment_management.environment_manager import EnvironmentManager
+from io_handling import unit_file
+
+
+def _create_environment(directory, result_cache_directory=None) -> EnvironmentManager:
+    outpost_file = unit_file.UnitFile(file_alias='outposts', latitude_column_name='lat', longitude_column_name='lon',
+                                      file_path=os.path.join(directory, 'outposts.csv'))
+    scout_file = unit_file.UnitFile(file_alias='scouts', latitude_column_name='latitude',
+                                    longitude_column_name='longitude', file_path=os.path.join(directory, 'scouts.csv'))
+    env_manager = EnvironmentManager(outpost_unit_files={outpost_file}, scout_unit_files={scout_file},
+                                     result_cache_directory=result_cache_directory)
+    env_manager.num_scouts_in_range_by_variable_values(scan_range=5, variable='name')
+    env_manager.process_analysis_functions()
+    return env_manager
+
+
+def test_grouped_counts_restored_from_result_cache_keep_their_value_columns(tmp_path):
+    pd.DataFrame({'lat': [30.0, 31.0], 'lon': [-97.0, -98.0]}).to_csv(os.path.join(tmp_path, 'outposts.csv'),
+                                                                        index=False)
+    pd.DataFrame({'latitude': [30.0, 30.01, 31.0], 'longitude': [-97.0, -97.0, -98.0],
+                  'name': ['A', 'B', 'A']}).to_csv(os.path.join(tmp_path, 'scouts.csv'), index=False)
+    result_cache_directory = os.path.join(tmp_path, 'result_cache')
+    _create_environment(tmp_path, result_cache_directory=result_cache_directory)
+
+    # Results are restored from the result cache, so no value codes were read before the change
+    env_manager = _create_environment(tmp_path, result_cache_directory=result_cache_directory)
+    env_manager.apply_scout_changes(scout_file_alias='scouts',
+                                    inserted_scouts=pd.DataFrame({'latitude': [30.0], 'longitude': [-97.0],
+                                                                  'name': ['C']}),
+                                    deleted_scouts=pd.DataFrame({'latitude': [31.0], 'longitude': [-98.0]}))
+    output_path = os.path.join(tmp_path, 'results.csv')
+    env_manager.output_data_to_file(output_path=output_path)
+
+    results = pd.read_csv(output_path)
+    query_string = "Number of scouts within 5 miles with variable 'name' equal to target value '{}'"
+    assert query_string.format('C') not in results.columns
+    # The second Outpost's only Scout was deleted, which leaves it without results
+    assert results[query_string.format('A')].tolist()[0] == 1
+    assert results[query_string.format('B')].tolist()[0] == 1
+    assert results.iloc[1].drop(['index', 'lat', 'lon', 'latitude', 'longitude'], errors='ignore').isna().all()
@@ -0,0 +1,56 @@
+import os
+
+import pandas as pd
+import pytest
+
+from environment_management.environment_manager import EnvironmentManager
+from io_handling import unit_file
+
+READERS = {'.csv': pd.read_csv, '.parquet': pd.read_parquet, '.arrow': pd.read_feather}
+
+
+def _create_environment(directory) -> EnvironmentManager:
+    # Outposts of the first chunk of a.csv are far from every Scout, so their results are all missing
+    pd.DataFrame({'lat': [40.0, 40.1, 30.0, 30.01], 'lon': [-90.0, -90.1, -97.0, -97.0],
+                  'GISJOIN': ['G1', 'G2', 'G3', 'G4']}).to_csv(os.path.join(directory, 'a.csv'), index=False)
+    pd.DataFrame({'lat': [30.0], 'lon': [-97.0], 'NAME': ['Town']}).to_csv(os.path.join(directory, 'b.csv'),
+                                                                            index=False)
+    pd.DataFrame({'latitude': [30.0, 30.01], 'longitude': [-97.0, -97.0], 'value': [1.0, 3.0],
+                  'name': ['x', 'y']}).to_csv(os.path.join(directory, 'scouts.csv'), index=False)
+
+    outpost_files = {
+        unit_file.UnitFile(file_alias='A', latitude_column_name='lat', longitude_column_name='lon',
+                           extra_column_names=['GISJOIN'], file_path=os.path.join(directory, 'a.csv')),
+        unit_file.UnitFile(file_alias='B', latitude_column_name='lat', longitude_column_name='lon',
+                           extra_column_names=['NAME'], file_path=os.path.join(directory, 'b.csv'))
+    }
+    scout_file = unit_file.UnitFile(file_alias='scouts', latitude_column_name='latitude',
+                                    longitude_column_name='longitude', file_path=os.path.join(directory, 'scouts.csv'))
+    env_manager = EnvironmentManager(outpost_unit_files=outpost_files, scout_unit_files={scout_file})
+    env_manager.num_scouts_in_range(scan_range=5)
+    env_manager.average_scouts_by_variable(scan_range=5, variable='value')
+    env_manager.num_scouts_in_range_by_variable_values(scan_range=5, variable='name')
+    env_manager.nearest_scouts(k=1, variable='name')
+    return env_manager
+
+
+@pytest.mark.parametrize('extension', ['.csv', '.parquet', '.arrow'])
+def test_streamed_results_match_processed_results(tmp_path, extension):
+    if extension != '.csv':
+        pytest.importorskip('pyarrow')
+    streamed_path = os.path.join(tmp_path, f"streamed{extension}")
+    processed_path = os.path.join(tmp_path, f"processed{extension}")
+
+    _create_environment(tmp_path).stream_analysis_functions(output_path=streamed_path, chunk_size=2)
+    env_manager = _create_environment(tmp_path)
+    env_manager.process_analysis_functions()
+    env_manager.output_data_to_file(output_path=processed_path)
+
+    streamed_results = READERS[extension](streamed_path).sort_values(['index', 'latitude']).reset_index(drop=True)
+    processed_results = READERS[extension](processed_path).sort_values(['index', 'latitude']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(streamed_results[processed_results.columns], processed_results,
+                                  check_dtype=False)
+    assert streamed_results.loc[streamed_results['index'] == 'B', 'NAME'].tolist() == ['Town']
+    # Sorted by latitude, the Outposts near the Scouts come first
+    averages = streamed_results.loc[streamed_results['index'] == 'A', "Average 'value' of scouts within 5 miles"]
+    assert averages.tolist()[:2] == [2.0, 2.0]
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from units import ScoutsManager, ScoutsManagersView
+from units.outpost import outposts_analysis_functions
+from units.outpost.fused_analysis import FusedAnalysisPlan
+from units.outpost.neighbor_table import NeighborTable
+
+
+def _create_scout_columns(values: list) -> ScoutsManagersView:
+    scouts_manager = ScoutsManager(name='scouts')
+    scouts_manager.create_scouts(dataframe=pd.DataFrame({'lat': np.zeros(len(values)), 'lon': np.zeros(len(values)),
+                                                         'value': values}),
+                                 lat_column_name='lat', lon_column_name='lon', extra_column_names=['value'])
+    return ScoutsManagersView([scouts_manager])
+
+
+def _create_neighbor_table(num_scouts: int) -> NeighborTable:
+    # Outpost 0 has the first half of the scouts as neighbors, outpost 1 the rest
+    outpost_positions = (np.arange(num_scouts) >= num_scouts // 2).astype(np.int64)
+    return NeighborTable.from_pairs(num_outposts=2, outpost_positions=outpost_positions,
+                                    scout_ids=np.arange(num_scouts), distances=np.ones(num_scouts))
+
+
+@pytest.mark.parametrize('values, target_values', [
+    ([1.0, 2.0, 1.0, 3.0, np.nan, 1.0], [1, 1.0, np.float64(1), 3]),
+    ([1, 2, 1, 3, 1, 2], [1, 1.0, np.int64(1), 2]),
+    ([True, False, True, True, False, np.nan], [True, 1, False])
+])
+def test_fused_counts_of_equal_targets_of_different_types_match_unfused_counts(values, target_values):
+    scout_columns = _create_scout_columns(values)
+    neighbor_table = _create_neighbor_table(len(values))
+    function_calls = [('num_scouts_in_range_by_variable', {'scan_range': 5, 'variable': 'value',
+                                                           'target_value': target_value})
+                      for target_value in target_values]
+
+    fused_results = FusedAnalysisPlan(function_calls).evaluate(neighbor_table=neighbor_table,
+                                                               scout_columns=scout_columns)
+
+    for target_value, results in zip(target_values, fused_results):
+        assert results == outposts_analysis_functions.count_scouts_by_variable(neighbor_table=neighbor_table,
+                                                                               scout_columns=scout_columns,
+                                                                               scan_range=5,
+                                                                               variable='value',
+                                                                               target_value=target_value)
+
+
+@pytest.mark.parametrize('values, target_values', [
+    ([1.0, 2.0, 1.0, 3.0, np.nan, 1.0], [1, 1.0, np.float64(1), 3]),
+    ([1, 2, 1, 3, 1, 2], [1, 1.0, np.int64(1), 2]),
+    ([True, False, True, True, False, np.nan], [True, 1, False]),
+    ([1, 2.0, np.int64(1), 1.0, 2, np.nan], [1, 1.0, np.int64(1), 2, 2.0]),
+    ([1, 2.0, np.int64(1), 1.0, 2, np.nan], None),
+    ([True, False, True, True, False, np.nan], None)
+])
+def test_counts_by_variable_values_match_counts_by_variable(values, target_values):
+    scout_columns = _create_scout_columns(values)
+    neighbor_table = _create_neighbor_table(len(values))
+
+    value_counts = outposts_analysis_functions.count_scouts_by_variable_values(neighbor_table=neighbor_table,
+                                                                               scout_columns=scout_columns,
+                                                                               scan_range=5,
+                                                                               variable='value',
+                                                                               target_values=target_values)
+
+    if target_values is not None:
+        assert [target_value for target_value, _ in value_counts] == target_values
+    for target_value, results in value_counts:
+        assert results == outposts_analysis_functions.count_scouts_by_variable(neighbor_table=neighbor_table,
+                                                                               scout_columns=scout_columns,
+                                                                               scan_range=5,
+                                                                               variable='value',
+                                                                               target_value=target_value)
@@ -1,2 +1,2 @@
 from units.outpost.outposts_manager import OutpostsManager
-from .scout.scouts_manager import ScoutsManager
\ No newline at end of file
+from .scout.scouts_manager import ScoutsManager, ScoutsManagersView
\ No newline at end of file
@@ -0,0 +1,65 @@
+"""
+Extra column arrays of the unit managers. Columns are NumPy arrays, except columns of dtype 'category', which are kept
+as pd.Categorical: one integer code per unit plus one array of the distinct values, instead of one object per unit.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+def column_from_series(series: pd.Series):
+    """
+
+    :return: pd.Categorical of the series' values if the series is categorical, and otherwise a NumPy array.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.array
+    return series.to_numpy()
+
+
+def concatenate_columns(columns: list):
+    """
+
+    :param columns: Column arrays, of NumPy arrays or pd.Categoricals.
+    :return: One pd.Categorical if any column is categorical and their categories can be combined, and otherwise one
+        NumPy array.
+    """
+    categoricals = [column for column in columns if isinstance(column, pd.Categorical)]
+    if not categoricals:
+        return np.concatenate(columns)
+
+    categories_dtype = pd.CategoricalDtype(categoricals[0].categories[:0])
+    parts = []
+    for column in columns:
+        if not isinstance(column, pd.Categorical):
+            column = pd.Categorical(column)
+        if len(column.categories) == 0:
+            # Columns of only missing values, e.g. the filler of a column missing from a file, have untyped categories
+            column = pd.Categorical.from_codes(np.full(len(column), -1), dtype=categories_dtype)
+        parts.append(column)
+    try:
+        return union_categoricals(parts, sort_categories=True)
+    except TypeError:
+        # Categories of different types, or that can't be sorted
+        return np.concatenate([np.asarray(column) for column in columns])
+
+
+def factorize_column(column) -> tuple[np.ndarray, np.ndarray]:
+    """
+
+    :return: Tuple of (code of every value, with -1 for missing values; array of the distinct values, indexed by code).
+        Distinct values are sorted when they are comparable.
+    """
+    if isinstance(column, pd.Categorical):
+        # The categorical's codes are reused, so its values are never hashed
+        column = column.remove_unused_categories()
+        if not column.categories.is_monotonic_increasing:
+            try:
+                column = column.reorder_categories(column.categories.sort_values())
+            except TypeError:
+                pass
+        return column.codes.astype(np.intp), column.categories.to_numpy()
+    try:
+        return pd.factorize(column, sort=True)
+    except TypeError:
+        return pd.factorize(column)
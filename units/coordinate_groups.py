@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+
+def snap_to_grid(latitudes: np.ndarray, longitudes: np.ndarray,
+                 tolerance: float = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+
+    :param tolerance: Grid spacing in degrees. None leaves the coordinates unchanged.
+    :return: Tuple of (latitudes, longitudes) rounded to the nearest multiple of tolerance, which moves each coordinate
+        by at most half of tolerance in latitude and in longitude. Latitudes are kept within the poles.
+    """
+    if tolerance is None:
+        return latitudes, longitudes
+    if tolerance <= 0:
+        raise ValueError(f"Snap tolerance must be positive, is {tolerance}.")
+    return (np.clip(np.round(latitudes / tolerance) * tolerance, -90.0, 90.0),
+            np.round(longitudes / tolerance) * tolerance)
+
+
+class CoordinateGroups:
+    """
+    Groups row ids by their unique coordinate. Each unique coordinate is a 'hub', addressed by its group id. Hubs are
+    ordered by latitude, then longitude, except for hubs added by from_group_ids after the initial grouping. Rows
+    without a coordinate belong to no group.
+    """
+
+    def __init__(self, latitudes: np.ndarray, longitudes: np.ndarray):
+        coordinate_row_ids = np.flatnonzero(~(np.isnan(latitudes) | np.isnan(longitudes)))
+        # One stable lexsort both orders the unique coordinates and lists each group's rows in their original order
+        self.row_ids = coordinate_row_ids[np.lexsort((longitudes[coordinate_row_ids],
+                                                      latitudes[coordinate_row_ids]))]
+        sorted_latitudes = latitudes[self.row_ids]
+        sorted_longitudes = longitudes[self.row_ids]
+
+        is_group_start = np.ones(len(self.row_ids), dtype=bool)
+        is_group_start[1:] = (np.diff(sorted_latitudes) != 0) | (np.diff(sorted_longitudes) != 0)
+        group_starts = np.flatnonzero(is_group_start)
+
+        self.hub_latitudes = sorted_latitudes[group_starts]
+        self.hub_longitudes = sorted_longitudes[group_starts]
+        # Row ids of the rows in group g are row_ids[offsets[g]:offsets[g + 1]]
+        self.offsets = np.append(group_starts, len(self.row_ids)).astype(np.int64)
+
+        # Group id of each row, in original row order, or -1 for rows without a coordinate
+        self.group_ids = np.full(len(latitudes), -1, dtype=np.int64)
+        self.group_ids[self.row_ids] = np.cumsum(is_group_start) - 1
+
+    @classmethod
+    def from_group_ids(cls, hub_latitudes: np.ndarray, hub_longitudes: np.ndarray, group_ids: np.ndarray):
+        """
+        Groups rows whose hubs are already known, keeping the given hub ids. Hubs without rows are kept as empty groups.
+
+        :param hub_latitudes: Array of hub latitudes, by group id.
+        :param hub_longitudes: Array of hub longitudes, by group id.
+        :param group_ids: Group id of each row.
+        :return: CoordinateGroups with the given hubs.
+        """
+        coordinate_groups = cls.__new__(cls)
+        coordinate_groups.hub_latitudes = hub_latitudes
+        coordinate_groups.hub_longitudes = hub_longitudes
+        coordinate_groups.group_ids = np.asarray(group_ids, dtype=np.int64)
+        coordinate_groups.row_ids = np.argsort(coordinate_groups.group_ids, kind='stable')
+        coordinate_groups.offsets = np.zeros(len(hub_latitudes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(coordinate_groups.group_ids, minlength=len(hub_latitudes)),
+                  out=coordinate_groups.offsets[1:])
+        return coordinate_groups
+
+    def find_groups(self, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        """
+
+        :return: Group id of the hub at each coordinate, or -1 for coordinates without a hub.
+        """
+        hubs = pd.MultiIndex.from_arrays([self.hub_latitudes, self.hub_longitudes])
+        return hubs.get_indexer(pd.MultiIndex.from_arrays([latitudes, longitudes])).astype(np.int64)
+
+    def get_num_groups(self) -> int:
+        return len(self.hub_latitudes)
+
+    def get_row_ids(self, group_id: int) -> np.ndarray:
+        if not 0 <= group_id < self.get_num_groups():
+            raise KeyError(f"Requested nonexistent coordinate hub {group_id} from CoordinateGroups.")
+
+        return self.row_ids[self.offsets[group_id]:self.offsets[group_id + 1]]
+
+    def get_group_sizes(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def expand_groups(self, group_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+
+        :param group_ids: Array of hub ids.
+        :return: Tuple of (repeat counts, row ids). Repeat counts holds the number of rows in each requested group,
+            and row ids the ids of those rows, group after group.
+        """
+        group_sizes = self.get_group_sizes()[group_ids]
+        group_starts = np.repeat(self.offsets[group_ids] - np.cumsum(group_sizes) + group_sizes, group_sizes)
+        return group_sizes, self.row_ids[group_starts + np.arange(group_sizes.sum())]
@@ -0,0 +1,177 @@
+"""
+Fused evaluation of a whole stack of analysis function calls over one NeighborTable.
+
+The distinct scan ranges of the stack split the distance axis into bands; every neighbor is assigned its band with one
+binary search. Each requested aggregate is then a single bincount over (outpost, band[, target value]) cells, and a
+cumulative sum over the bands gives its value at every scan range at once. The neighbors are walked once per kind of
+aggregate, not once per stacked call.
+"""
+import numpy as np
+
+from . import outposts_analysis_functions as analysis_functions
+from .neighbor_table import NeighborTable
+
+
+class FusedAnalysisPlan:
+    """
+    Compiled form of a list of (function name, kwargs) analysis calls. Calls to functions without a fused
+    implementation are left out of the plan; see supports_function.
+    """
+
+    fused_function_names = (
+        'scout_in_range_tf',
+        'num_scouts_in_range',
+        'num_scouts_in_range_by_variable',
+        'average_scouts_by_variable',
+        'sum_scouts_by_variable',
+        'nearest_scout'
+    )
+
+    def __init__(self, function_calls: list[tuple[str, dict]]):
+        self.function_calls = [(function_name, kwargs) for function_name, kwargs in function_calls
+                               if self.supports_function(function_name)]
+        self.scan_ranges = np.unique(np.array([kwargs['scan_range'] for _, kwargs in self.function_calls],
+                                              dtype=np.float64))
+
+        # variable: list of distinct target values counted for it
+        self.variable_targets = {}
+        for function_name, kwargs in self.function_calls:
+            if function_name != 'num_scouts_in_range_by_variable':
+                continue
+            targets = self.variable_targets.setdefault(kwargs['variable'], [])
+            if not any(_same_target(target, kwargs['target_value']) for target in targets):
+                targets.append(kwargs['target_value'])
+
+    @classmethod
+    def supports_function(cls, function_name: str) -> bool:
+        return function_name in cls.fused_function_names
+
+    def _band_position(self, scan_range) -> int:
+        return int(np.searchsorted(self.scan_ranges, scan_range))
+
+    def evaluate(self, neighbor_table: NeighborTable, scout_columns) -> list[list]:
+        """
+
+        :param neighbor_table: Join results at a scan range covering every call in the plan.
+        :param scout_columns: View over the ScoutsManagers whose combined scout ids are used in neighbor_table.
+        :return: One list of results per outpost for each call in the plan, in call order.
+        """
+        for scan_range in self.scan_ranges:
+            neighbor_table.check_distances(scan_range)
+        evaluator = _BandEvaluator(neighbor_table=neighbor_table,
+                                   scout_columns=scout_columns,
+                                   scan_ranges=self.scan_ranges,
+                                   variable_targets=self.variable_targets)
+        results = []
+        for function_name, kwargs in self.function_calls:
+            if function_name == 'nearest_scout':
+                results.append(evaluator.nearest_distances(kwargs['scan_range']))
+                continue
+
+            band = self._band_position(kwargs['scan_range'])
+            if function_name == 'scout_in_range_tf':
+                band_results = evaluator.range_counts()[:, band] > 0
+            elif function_name == 'num_scouts_in_range':
+                band_results = evaluator.range_counts()[:, band]
+            elif function_name == 'num_scouts_in_range_by_variable':
+                band_results = evaluator.target_counts(kwargs['variable'], kwargs['target_value'])[:, band]
+            elif function_name == 'sum_scouts_by_variable':
+                band_results = evaluator.variable_sums(kwargs['variable'], function_name)[1][:, band]
+            else:
+                counts, sums = evaluator.variable_sums(kwargs['variable'], function_name)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    band_results = np.where(counts[:, band] > 0, sums[:, band] / np.maximum(counts[:, band], 1),
+                                            np.nan)
+            results.append(analysis_functions.fill_outposts_without_neighbors(neighbor_table, band_results))
+        return results
+
+
+def _same_target(first_target, second_target) -> bool:
+    return type(first_target) is type(second_target) and first_target == second_target
+
+
+class _BandEvaluator:
+    """
+    Computes the aggregates of one FusedAnalysisPlan evaluation, each at most once. Aggregates are (outposts, bands)
+    arrays holding, in column b, the aggregate over the neighbors within scan_ranges[b].
+    """
+
+    def __init__(self, neighbor_table: NeighborTable, scout_columns, scan_ranges: np.ndarray,
+                 variable_targets: dict):
+        self.neighbor_table = neighbor_table
+        self.scout_columns = scout_columns
+        self.variable_targets = variable_targets
+        self.num_outposts = neighbor_table.get_num_outposts()
+        self.num_bands = len(scan_ranges)
+
+        # Band of each neighbor: the smallest scan range that includes it. Neighbors beyond every range get no band.
+        band_ids = np.searchsorted(scan_ranges, neighbor_table.distances, side='left')
+        self.in_band = band_ids < self.num_bands
+        self.cell_ids = neighbor_table.get_outpost_positions() * self.num_bands + band_ids
+
+        self._range_counts = None
+        # variable: tuple of (counts by code column, list of the code columns of each target)
+        self._target_counts = {}
+        self._variable_sums = {}
+
+    def _cumulative_band_sums(self, entry_mask: np.ndarray, weights: np.ndarray = None,
+                              cell_ids: np.ndarray = None, cells_per_band: int = 1) -> np.ndarray:
+        cell_ids = self.cell_ids if cell_ids is None else cell_ids
+        entry_mask = self.in_band if entry_mask is None else self.in_band & entry_mask
+        sums = np.bincount(cell_ids[entry_mask],
+                           weights=None if weights is None else weights[entry_mask],
+                           minlength=self.num_outposts * self.num_bands * cells_per_band)
+        sums = sums.reshape(self.num_outposts, self.num_bands, cells_per_band)
+        return np.cumsum(sums, axis=1)
+
+    def nearest_distances(self, scan_range) -> list:
+        return analysis_functions.nearest_scout(neighbor_table=self.neighbor_table,
+                                                scan_range=scan_range)
+
+    def range_counts(self) -> np.ndarray:
+        if self._range_counts is None:
+            self._range_counts = self._cumulative_band_sums(entry_mask=None)[:, :, 0]
+        return self._range_counts
+
+    def target_counts(self, variable: str, target_value) -> np.ndarray:
+        if variable not in self._target_counts:
+            self._target_counts[variable] = self._count_variable_targets(variable)
+
+        code_counts, target_columns = self._target_counts[variable]
+        target_position = next(position for position, target in enumerate(self.variable_targets[variable])
+                               if _same_target(target, target_value))
+        return code_counts[:, :, target_columns[target_position]].sum(axis=2)
+
+    def _count_variable_targets(self, variable: str) -> tuple[np.ndarray, list]:
+        codes, uniques = self.scout_columns.get_column_codes(variable)
+        neighbor_codes = codes[self.neighbor_table.scout_ids]
+        present_values = uniques[np.unique(neighbor_codes[neighbor_codes >= 0])]
+
+        num_columns, code_columns, target_columns = analysis_functions.map_target_codes(
+            uniques=uniques,
+            present_values=present_values,
+            variable=variable,
+            target_values=self.variable_targets[variable]
+        )
+        # Code -1 (missing value) indexes the trailing -1 column
+        neighbor_columns = code_columns[neighbor_codes]
+        code_counts = self._cumulative_band_sums(entry_mask=neighbor_columns >= 0,
+                                                 cell_ids=self.cell_ids * num_columns + neighbor_columns,
+                                                 cells_per_band=num_columns)
+        return code_counts, target_columns
+
+    def variable_sums(self, variable: str, function_name: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+
+        :param function_name: Name of the first analysis function summing the variable, for the error message of
+            non-numeric values.
+        :return: Tuple of (counts, sums) of the variable's valid values.
+        """
+        if variable not in self._variable_sums:
+            values = self.scout_columns.get_column(variable)[self.neighbor_table.scout_ids]
+            valid_mask = analysis_functions.valid_values_mask(values)
+            numbers = analysis_functions.numeric_values(values, valid_mask, function_name, variable)
+            self._variable_sums[variable] = (self._cumulative_band_sums(entry_mask=valid_mask)[:, :, 0],
+                                             self._cumulative_band_sums(entry_mask=valid_mask,
+                                                                        weights=numbers)[:, :, 0])
+        return self._variable_sums[variable]
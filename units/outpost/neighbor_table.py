@@ -0,0 +1,207 @@
+import numpy as np
+
+
+class NeighborTable:
+    """
+    Outpost to scout join results in compressed sparse row form. The neighbors of the outpost at position i are the
+    entries offsets[i]:offsets[i + 1] of scout_ids and distances, sorted by distance.
+
+    A table with a bounded_range holds the scouts within bounded_range of each outpost, but only upper bounds of most
+    of their distances, of at most bounded_range. It can only answer queries at exactly bounded_range.
+    """
+
+    def __init__(self, offsets: np.ndarray, scout_ids: np.ndarray, distances: np.ndarray, bounded_range=None):
+        self.offsets = offsets
+        self.scout_ids = scout_ids
+        self.distances = distances
+        self.bounded_range = bounded_range
+
+    @classmethod
+    def from_pairs(cls, num_outposts: int, outpost_positions: np.ndarray, scout_ids: np.ndarray,
+                   distances: np.ndarray, bounded_range=None):
+        """
+
+        :param num_outposts: Number of outposts, including those without neighbors.
+        :param outpost_positions: Outpost position of each (outpost, scout) pair, in any order.
+        :param scout_ids: Scout id of each pair.
+        :param distances: Distance of each pair, in miles.
+        :param bounded_range: If provided, the range within which the pairs were found, with distances only bounded.
+        :return: NeighborTable with each outpost's neighbors sorted by distance, then by scout id.
+        """
+        order = np.lexsort((scout_ids, distances, outpost_positions))
+        offsets = np.zeros(num_outposts + 1, dtype=np.int64)
+        np.cumsum(np.bincount(outpost_positions, minlength=num_outposts), out=offsets[1:])
+        return cls(offsets=offsets,
+                   scout_ids=np.asarray(scout_ids, dtype=np.int64)[order],
+                   distances=np.asarray(distances, dtype=np.float64)[order],
+                   bounded_range=bounded_range)
+
+    def first_neighbors(self, num_neighbors: int):
+        """
+
+        :return: NeighborTable holding only the first num_neighbors neighbors of each outpost.
+        """
+        neighbor_ranks = np.arange(len(self.scout_ids)) - np.repeat(self.offsets[:-1], self.get_num_neighbors())
+        is_kept = neighbor_ranks < num_neighbors
+        offsets = np.zeros_like(self.offsets)
+        np.cumsum(np.minimum(self.get_num_neighbors(), num_neighbors), out=offsets[1:])
+        return NeighborTable(offsets=offsets,
+                             scout_ids=self.scout_ids[is_kept],
+                             distances=self.distances[is_kept],
+                             bounded_range=self.bounded_range)
+
+    def within_range(self, scan_range):
+        """
+
+        :return: NeighborTable holding only the neighbors within scan_range. Equal to the table a join at scan_range
+            would produce, if this table's own range covers scan_range.
+        """
+        self.check_distances(scan_range)
+        is_kept = self.distances <= scan_range
+        offsets = np.zeros_like(self.offsets)
+        np.cumsum(self.count_per_outpost(is_kept), out=offsets[1:])
+        return NeighborTable(offsets=offsets,
+                             scout_ids=self.scout_ids[is_kept],
+                             distances=self.distances[is_kept])
+
+    def remap_scout_ids(self, scout_id_map: np.ndarray):
+        """
+
+        :param scout_id_map: New scout id of every previous scout id. Must keep the order of the ids it maps.
+        :return: NeighborTable with each scout id replaced by its new id.
+        """
+        return NeighborTable(offsets=self.offsets,
+                             scout_ids=scout_id_map[self.scout_ids],
+                             distances=self.distances,
+                             bounded_range=self.bounded_range)
+
+    def replace_outposts(self, outpost_positions: np.ndarray, neighbor_table):
+        """
+
+        :param outpost_positions: Positions of the outposts to replace the neighbors of.
+        :param neighbor_table: NeighborTable holding the new neighbors of those outposts, in outpost_positions order.
+        :return: NeighborTable with the neighbors of the outposts at outpost_positions replaced.
+        """
+        num_neighbors = self.get_num_neighbors()
+        num_neighbors[outpost_positions] = neighbor_table.get_num_neighbors()
+        offsets = np.zeros_like(self.offsets)
+        np.cumsum(num_neighbors, out=offsets[1:])
+
+        # Every entry is placed at its outpost's new offset plus its rank among the outpost's neighbors
+        is_replaced = np.zeros(self.get_num_outposts(), dtype=bool)
+        is_replaced[outpost_positions] = True
+        entry_positions = self.get_outpost_positions()
+        is_kept = ~is_replaced[entry_positions]
+        kept_entries = np.flatnonzero(is_kept)
+        kept_targets = offsets[entry_positions[is_kept]] + kept_entries - self.offsets[entry_positions[is_kept]]
+
+        new_positions = np.asarray(outpost_positions, dtype=np.int64)[neighbor_table.get_outpost_positions()]
+        new_targets = (offsets[new_positions] + np.arange(len(neighbor_table.scout_ids))
+                       - np.repeat(neighbor_table.offsets[:-1], neighbor_table.get_num_neighbors()))
+
+        scout_ids = np.empty(offsets[-1], dtype=np.int64)
+        distances = np.empty(offsets[-1], dtype=np.float64)
+        scout_ids[kept_targets] = self.scout_ids[kept_entries]
+        distances[kept_targets] = self.distances[kept_entries]
+        scout_ids[new_targets] = neighbor_table.scout_ids
+        distances[new_targets] = neighbor_table.distances
+        return NeighborTable(offsets=offsets, scout_ids=scout_ids, distances=distances,
+                             bounded_range=self.bounded_range)
+
+    def check_distances(self, scan_range=None):
+        """
+        Raises a ValueError if the table's distances are only bounded and can't answer a query at scan_range, or a
+        query reading distance values if scan_range is None.
+        """
+        if self.bounded_range is not None and (scan_range is None or scan_range != self.bounded_range):
+            query = 'reading distances' if scan_range is None else f'at {scan_range} miles'
+            raise ValueError(f"NeighborTable only holds distance bounds within {self.bounded_range} miles, and can't "
+                             f"answer a query {query}.")
+
+    def get_num_outposts(self) -> int:
+        return len(self.offsets) - 1
+
+    def get_num_neighbors(self) -> np.ndarray:
+        """
+
+        :return: Number of neighbors of each outpost.
+        """
+        return np.diff(self.offsets)
+
+    def get_outpost_positions(self) -> np.ndarray:
+        """
+
+        :return: Outpost position of each entry.
+        """
+        return np.repeat(np.arange(self.get_num_outposts(), dtype=np.int64), self.get_num_neighbors())
+
+    def get_neighbors(self, outpost_position: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+
+        :return: Tuple of (scout ids, distances) of one outpost's neighbors, sorted by distance.
+        """
+        segment = slice(self.offsets[outpost_position], self.offsets[outpost_position + 1])
+        return self.scout_ids[segment], self.distances[segment]
+
+    def count_per_outpost(self, entry_mask: np.ndarray) -> np.ndarray:
+        """
+
+        :param entry_mask: Boolean array with one value per entry.
+        :return: Number of masked entries of each outpost.
+        """
+        return np.bincount(self.get_outpost_positions()[entry_mask], minlength=self.get_num_outposts())
+
+    def sum_per_outpost(self, entry_mask: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """
+
+        :param entry_mask: Boolean array with one value per entry.
+        :param values: Numeric array with one value per entry.
+        :return: Sum of the masked entries' values for each outpost.
+        """
+        return np.bincount(self.get_outpost_positions()[entry_mask], weights=values[entry_mask],
+                           minlength=self.get_num_outposts())
+
+    def reduce_per_outpost(self, entry_mask: np.ndarray, values: np.ndarray, reduce_function: np.ufunc) -> np.ndarray:
+        """
+
+        :param entry_mask: Boolean array with one value per entry.
+        :param values: Numeric array with one value per entry.
+        :param reduce_function: Binary ufunc reducing the values, e.g. np.minimum.
+        :return: Reduction of the masked entries' values for each outpost, or NaN for outposts without masked entries.
+        """
+        counts = self.count_per_outpost(entry_mask)
+        has_entries = counts > 0
+        results = np.full(self.get_num_outposts(), np.nan)
+        if has_entries.any():
+            # Masked entries stay grouped by outpost, so each outpost's values are one segment
+            segment_starts = np.cumsum(counts) - counts
+            results[has_entries] = reduce_function.reduceat(values[entry_mask], segment_starts[has_entries])
+        return results
+
+    def percentile_per_outpost(self, entry_mask: np.ndarray, values: np.ndarray, percentile) -> np.ndarray:
+        """
+
+        :param entry_mask: Boolean array with one value per entry.
+        :param values: Numeric array with one value per entry.
+        :param percentile: Percentile between 0 and 100, interpolated linearly between the closest ranks as
+            numpy.percentile does by default.
+        :return: Percentile of the masked entries' values for each outpost, or NaN for outposts without masked entries.
+        """
+        outpost_positions = self.get_outpost_positions()[entry_mask]
+        masked_values = values[entry_mask]
+        sorted_values = masked_values[np.lexsort((masked_values, outpost_positions))]
+
+        counts = np.bincount(outpost_positions, minlength=self.get_num_outposts())
+        has_entries = counts > 0
+        segment_starts = (np.cumsum(counts) - counts)[has_entries]
+        ranks = (counts[has_entries] - 1) * (percentile / 100)
+        lower_ranks = np.floor(ranks).astype(np.int64)
+        upper_ranks = np.ceil(ranks).astype(np.int64)
+        lower_values = sorted_values[segment_starts + lower_ranks]
+        upper_values = sorted_values[segment_starts + upper_ranks]
+
+        results = np.full(self.get_num_outposts(), np.nan)
+        with np.errstate(invalid='ignore'):
+            interpolated_values = lower_values + (upper_values - lower_values) * (ranks - lower_ranks)
+        results[has_entries] = np.where(upper_ranks > lower_ranks, interpolated_values, lower_values)
+        return results
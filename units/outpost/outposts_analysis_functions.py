@@ -1,15 +1,12 @@
+"""
+Analysis functions over an outpost NeighborTable. Each function computes its result for every outpost at once, as
+segment operations over the table's distance-sorted neighbors, and returns one value per outpost. Outposts without any
+neighbors within the table's scan range get None.
+"""
 import numpy as np
 import pandas as pd
 
-from .outpost import Outpost
-
-
-def now_scanning_outside_of_specified_range(distance, scan_range):
-    return distance > scan_range
-
-
-def sort_distances_to_scouts(distances: dict):
-    return sorted(distances.items())
+from .neighbor_table import NeighborTable
 
 
 def is_number(variable_value):
@@ -17,113 +14,301 @@ def is_number(variable_value):
     return data_type == int or data_type == float or data_type == np.int64 or data_type == np.float64
 
 
-def is_valid_value(value):
-    return value and not pd.isna(value)
+def valid_values_mask(values: np.ndarray) -> np.ndarray:
+    return ~pd.isna(values)
+
+
+def numeric_values(values: np.ndarray, valid_mask: np.ndarray, function_name: str, variable) -> np.ndarray:
+    """
+
+    :param function_name: Name of the analysis function aggregating the values, for the error message.
+    :param variable: Name of the variable the values are of, for the error message.
+    :return: Array of the values as floats, with NaN for missing values.
+    """
+    if isinstance(values, pd.Categorical):
+        # Only the distinct values are converted; missing values have code -1, which takes the trailing NaN
+        categories = values.categories.to_numpy()
+        category_numbers = numeric_values(categories, np.ones(len(categories), dtype=bool), function_name, variable)
+        return np.append(category_numbers, np.nan)[values.codes]
+    if values.dtype.kind in 'iuf':
+        return values.astype(np.float64)
+    valid_values = values[valid_mask]
+    distinct_values = pd.unique(valid_values)
+    if all(is_number(value) for value in distinct_values):
+        numbers = np.full(len(values), np.nan)
+        numbers[valid_mask] = valid_values.astype(np.float64)
+        return numbers
+    non_numeric_values = [value for value in distinct_values if not is_number(value)]
+    value_types = sorted({type(value).__name__ for value in non_numeric_values})
+    raise TypeError(f"{function_name} requires int or float values, but variable '{variable}' has values "
+                    f"{non_numeric_values[:5]} of types {value_types}.")
+
+
+def values_and_target_value_are_compatible_data_types(values: np.ndarray, target_value) -> bool:
+    if values.dtype.kind in 'iuf':
+        return is_number(target_value)
+    return all(isinstance(value, type(target_value)) or (is_number(value) and is_number(target_value))
+               for value in pd.unique(values))
+
+
+def map_target_codes(uniques: np.ndarray, present_values: np.ndarray, variable, target_values) -> tuple[int,
+                                                                                                      np.ndarray, list]:
+    """
+    Keys counting on the factorized codes of the variable's values, not on the target values: each code any target
+    equals gets its own column. Targets that are equal but of different types, e.g. 1 and 1.0, then count the same
+    codes without sharing, and overwriting, one column.
+
+    :param uniques: The variable's distinct values, indexed by code.
+    :param present_values: The variable's values among the neighbors, which each target is type checked against.
+    :return: Tuple of (number of columns, column of each code with -1 for codes no target equals and a trailing -1 for
+        missing values, list with the array of the columns of each target).
+    """
+    code_columns = np.full(len(uniques) + 1, -1, dtype=np.int64)
+    num_columns = 0
+    target_columns = []
+    for target_value in target_values:
+        if not values_and_target_value_are_compatible_data_types(values=present_values, target_value=target_value):
+            raise TypeError(f"Variable '{variable}' values and target value '{target_value}' are incompatible.")
+        target_codes = np.flatnonzero(np.asarray(uniques == target_value, dtype=bool))
+        new_codes = target_codes[code_columns[target_codes] < 0]
+        code_columns[new_codes] = np.arange(num_columns, num_columns + len(new_codes))
+        num_columns += len(new_codes)
+        target_columns.append(code_columns[target_codes])
+    return num_columns, code_columns, target_columns
+
+
+def fill_outposts_without_neighbors(neighbor_table: NeighborTable, results) -> list:
+    """
+
+    :param results: Array with one result per outpost.
+    :return: List of results, with None for outposts that have no neighbors.
+    """
+    has_neighbors = neighbor_table.get_num_neighbors() > 0
+    return [result if has_neighbor else None for result, has_neighbor in zip(results.tolist(), has_neighbors)]
+
+
+def within_range_mask(neighbor_table: NeighborTable, scan_range) -> np.ndarray:
+    neighbor_table.check_distances(scan_range)
+    return neighbor_table.distances <= scan_range
+
+
+def in_range_numbers(neighbor_table: NeighborTable, scout_columns, scan_range, variable,
+                     function_name: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+
+    :param function_name: Name of the analysis function aggregating the values, for the error message of non-numeric
+        values.
+    :return: Tuple of (mask of the entries within scan_range with a value, the variable's value of each entry as a
+        float). Missing values are NaN and left out of the mask.
+    """
+    values = scout_columns.get_column(variable)[neighbor_table.scout_ids]
+    valid_mask = valid_values_mask(values)
+    numbers = numeric_values(values, valid_mask, function_name, variable)
+    return valid_mask & within_range_mask(neighbor_table, scan_range), numbers
 
 
 # Analysis functions:
 
-def nearest_scout(outpost: Outpost):
-    sorted_distances = outpost.get_sorted_distances_to_scouts()
-
-    if not sorted_distances:
-        return None
-
-    closest_scout_hub = sorted_distances[0]
-    closest_scout_hub_distance = closest_scout_hub[0]
-    return closest_scout_hub_distance
-
-
-def average_scouts_by_variable(outpost: Outpost, scan_range, variable):
-    def determine_measure_avg(count, total_sum):
-        if count == 0:
-            return np.nan
-        return float(total_sum) / count
-
-    sorted_distances = outpost.get_sorted_distances_to_scouts()
-
-    if not sorted_distances:
-        return None
-
-    count = 0
-    total_sum = 0
-
-    for distance, scouts_at_same_distance in sorted_distances:
-        if now_scanning_outside_of_specified_range(distance=distance,
-                                                   scan_range=scan_range):
-            return determine_measure_avg(count=count,
-                                         total_sum=total_sum)
-        for scout in scouts_at_same_distance:
-            variable_value = scout.get_data(variable_name=variable)
-            if not is_valid_value(variable_value):
-                continue
-            if not is_number(variable_value):
-                raise Exception(f"Variable value '{variable_value}' is not expected type int or float for average "
-                                f"function.")
-
-            total_sum += variable_value
-            count += 1
-
-    # Reached end of function without exceeding specified scan_range, so fill units value with final result
-    return determine_measure_avg(count=count,
-                                 total_sum=total_sum)
-
-
-def num_scouts_in_range(outpost: Outpost, scan_range):
-    sorted_distances = outpost.get_sorted_distances_to_scouts()
-
-    if not sorted_distances:
-        return None
-
-    count = 0
-    for distance, scout_list in sorted_distances:
-        if now_scanning_outside_of_specified_range(distance, scan_range):
-            return count
-        else:
-            count += len(scout_list)
-    return count
-
-
-def scout_in_range_tf(outpost: Outpost, scan_range):
-    sorted_distances = outpost.get_sorted_distances_to_scouts()
-
-    if not sorted_distances:
-        return None
-
-    closest_scout_hub = sorted_distances[0]
-    closest_scout_hub_distance = closest_scout_hub[0]
-    return closest_scout_hub_distance <= scan_range
-
-
-def count_scouts_by_variable(outpost: Outpost, scan_range, variable, target_value):
-    def scout_data_and_target_value_are_compatible_data_types(scout_value, target_value):
-        if is_number(scout_value) and is_number(target_value):
-            return True
-        return isinstance(scout_value, type(target_value))
-
-    sorted_distances = outpost.get_sorted_distances_to_scouts()
-
-    if not sorted_distances:
-        return None
-
-    count = 0
-
-    for distance, scout_list in sorted_distances:
-        if now_scanning_outside_of_specified_range(distance=distance,
-                                                   scan_range=scan_range):
-            return count
-        for scout in scout_list:
-
-            variable_value = scout.get_data(variable_name=variable)
-            if not is_valid_value(variable_value):
-                continue
-            if not scout_data_and_target_value_are_compatible_data_types(scout_value=variable_value,
-                                                                         target_value=target_value):
-                raise TypeError(f"Variable value '{variable_value}' and target value '{target_value}' are"
-                                f"incompatible.")
-
-            if variable_value == target_value:
-                count += 1
-
-    # Reached end of function without exceeding specified scan_range, so return the final count
-    return count
+def nearest_scout(neighbor_table: NeighborTable, scan_range):
+    neighbor_table.check_distances()
+    num_neighbors = neighbor_table.get_num_neighbors()
+    nearest_distances = np.full(neighbor_table.get_num_outposts(), np.nan)
+    has_neighbors = num_neighbors > 0
+    nearest_distances[has_neighbors] = neighbor_table.distances[neighbor_table.offsets[:-1][has_neighbors]]
+
+    return [distance if distance <= scan_range else None for distance in nearest_distances.tolist()]
+
+
+def average_scouts_by_variable(neighbor_table: NeighborTable, scout_columns, scan_range, variable):
+    counted_mask, numbers = in_range_numbers(neighbor_table, scout_columns, scan_range, variable,
+                                             'average_scouts_by_variable')
+    counts = neighbor_table.count_per_outpost(counted_mask)
+    sums = neighbor_table.sum_per_outpost(counted_mask, numbers)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        averages = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    return fill_outposts_without_neighbors(neighbor_table, averages)
+
+
+def sum_scouts_by_variable(neighbor_table: NeighborTable, scout_columns, scan_range, variable):
+    counted_mask, numbers = in_range_numbers(neighbor_table, scout_columns, scan_range, variable,
+                                             'sum_scouts_by_variable')
+    return fill_outposts_without_neighbors(neighbor_table, neighbor_table.sum_per_outpost(counted_mask, numbers))
+
+
+def min_scouts_by_variable(neighbor_table: NeighborTable, scout_columns, scan_range, variable):
+    counted_mask, numbers = in_range_numbers(neighbor_table, scout_columns, scan_range, variable,
+                                             'min_scouts_by_variable')
+    return fill_outposts_without_neighbors(neighbor_table,
+                                           neighbor_table.reduce_per_outpost(counted_mask, numbers, np.minimum))
+
+
+def max_scouts_by_variable(neighbor_table: NeighborTable, scout_columns, scan_range, variable):
+    counted_mask, numbers = in_range_numbers(neighbor_table, scout_columns, scan_range, variable,
+                                             'max_scouts_by_variable')
+    return fill_outposts_without_neighbors(neighbor_table,
+                                           neighbor_table.reduce_per_outpost(counted_mask, numbers, np.maximum))
+
+
+def percentile_scouts_by_variable(neighbor_table: NeighborTable, scout_columns, scan_range, variable, percentile):
+    if not 0 <= percentile <= 100:
+        raise ValueError(f"Percentile {percentile} is not between 0 and 100.")
+    counted_mask, numbers = in_range_numbers(neighbor_table, scout_columns, scan_range, variable,
+                                             'percentile_scouts_by_variable')
+    return fill_outposts_without_neighbors(neighbor_table,
+                                           neighbor_table.percentile_per_outpost(counted_mask, numbers, percentile))
+
+
+def distance_weighted_average_scouts_by_variable(neighbor_table: NeighborTable, scout_columns, scan_range, variable,
+                                                 power=1):
+    """
+    Inverse distance weighted average: each scout's value is weighted by 1 / distance ** power. Scouts at distance 0
+    take all the weight, so an outpost with any of them gets their plain average.
+    """
+    neighbor_table.check_distances()
+    counted_mask, numbers = in_range_numbers(neighbor_table, scout_columns, scan_range, variable,
+                                             'distance_weighted_average_scouts_by_variable')
+    zero_distance_mask = counted_mask & (neighbor_table.distances == 0)
+    weighted_mask = counted_mask & ~zero_distance_mask
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = np.where(weighted_mask, neighbor_table.distances, 1.0) ** -float(power)
+        weight_sums = neighbor_table.sum_per_outpost(weighted_mask, weights)
+        weighted_averages = neighbor_table.sum_per_outpost(weighted_mask, weights * numbers) / weight_sums
+        zero_distance_counts = neighbor_table.count_per_outpost(zero_distance_mask)
+        zero_distance_averages = (neighbor_table.sum_per_outpost(zero_distance_mask, numbers)
+                                  / np.maximum(zero_distance_counts, 1))
+    averages = np.where(zero_distance_counts > 0, zero_distance_averages, weighted_averages)
+    return fill_outposts_without_neighbors(neighbor_table, averages)
+
+
+def _ring_cells(neighbor_table: NeighborTable, breaks: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+
+    :return: Tuple of (mask of the entries within the outermost break, (outpost, ring) cell id of each entry). Ring i
+        holds the distances above breaks[i - 1] up to and including breaks[i].
+    """
+    for scan_range in breaks:
+        neighbor_table.check_distances(scan_range)
+    # One binary search over the breaks per neighbor; distances beyond every break get ring len(breaks)
+    ring_ids = np.searchsorted(breaks, neighbor_table.distances, side='left')
+    return ring_ids < len(breaks), neighbor_table.get_outpost_positions() * len(breaks) + ring_ids
+
+
+# Ring aggregate name: function of (counts, sums) per cell giving the aggregate
+RING_AGGREGATES = {
+    'average': lambda counts, sums: np.where(counts > 0, sums / np.maximum(counts, 1), np.nan),
+    'sum': lambda counts, sums: sums
+}
+
+
+def count_scouts_in_rings(neighbor_table: NeighborTable, scout_columns, breaks, variable=None,
+                          aggregate='average') -> tuple[list, list]:
+    """
+
+    :param breaks: Increasing, positive outer distances of the rings.
+    :param variable: Optional variable whose numeric values are aggregated per ring.
+    :param aggregate: One of the keys of RING_AGGREGATES.
+    :return: Tuple of (list of the results of each ring's counts, list of the results of each ring's aggregates of the
+        variable, or None without a variable).
+    """
+    breaks = np.asarray(breaks, dtype=np.float64)
+    if len(breaks) == 0 or breaks[0] <= 0 or np.any(np.diff(breaks) <= 0):
+        raise ValueError(f"Ring breaks {breaks.tolist()} are not increasing, positive distances.")
+    if aggregate not in RING_AGGREGATES:
+        raise KeyError(f"Requested invalid ring aggregate {aggregate}.\n"
+                       f"Valid ring aggregates: {list(RING_AGGREGATES.keys())}")
+
+    num_cells = neighbor_table.get_num_outposts() * len(breaks)
+    in_rings_mask, cell_ids = _ring_cells(neighbor_table, breaks)
+    counts = np.bincount(cell_ids[in_rings_mask], minlength=num_cells).reshape(-1, len(breaks))
+    ring_counts = [fill_outposts_without_neighbors(neighbor_table, counts[:, ring]) for ring in range(len(breaks))]
+    if variable is None:
+        return ring_counts, None
+
+    values = scout_columns.get_column(variable)[neighbor_table.scout_ids]
+    valid_mask = valid_values_mask(values)
+    numbers = numeric_values(values, valid_mask, f"num_scouts_in_rings with aggregate '{aggregate}'", variable)
+    counted_mask = in_rings_mask & valid_mask
+    value_counts = np.bincount(cell_ids[counted_mask], minlength=num_cells).reshape(-1, len(breaks))
+    value_sums = np.bincount(cell_ids[counted_mask], weights=numbers[counted_mask],
+                             minlength=num_cells).reshape(-1, len(breaks))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        aggregates = RING_AGGREGATES[aggregate](value_counts, value_sums)
+    return ring_counts, [fill_outposts_without_neighbors(neighbor_table, aggregates[:, ring])
+                         for ring in range(len(breaks))]
+
+
+def num_scouts_in_range(neighbor_table: NeighborTable, scan_range):
+    counts = neighbor_table.count_per_outpost(within_range_mask(neighbor_table, scan_range))
+    return fill_outposts_without_neighbors(neighbor_table, counts)
+
+
+def scout_in_range_tf(neighbor_table: NeighborTable, scan_range):
+    counts = neighbor_table.count_per_outpost(within_range_mask(neighbor_table, scan_range))
+    return fill_outposts_without_neighbors(neighbor_table, counts > 0)
+
+
+def count_scouts_by_variable(neighbor_table: NeighborTable, scout_columns, scan_range, variable, target_value):
+    values = scout_columns.get_column(variable)[neighbor_table.scout_ids]
+    valid_mask = valid_values_mask(values)
+    if not values_and_target_value_are_compatible_data_types(values=values[valid_mask],
+                                                             target_value=target_value):
+        raise TypeError(f"Variable '{variable}' values and target value '{target_value}' are incompatible.")
+
+    matches_mask = valid_mask & within_range_mask(neighbor_table, scan_range)
+    matches_mask[matches_mask] = values[matches_mask] == target_value
+    counts = neighbor_table.count_per_outpost(matches_mask)
+    return fill_outposts_without_neighbors(neighbor_table, counts)
+
+
+def count_scouts_by_variable_values(neighbor_table: NeighborTable, scout_columns, scan_range, variable,
+                                    target_values=None) -> list[tuple]:
+    """
+    Counts the scouts of every value of the variable in one pass over the neighbors.
+
+    :param target_values: Optional list of the values to count. Defaults to every value any scout has.
+    :return: List of (target value, results) tuples, in target_values order, with the results count_scouts_by_variable
+        gives for that target value.
+    """
+    codes, uniques = scout_columns.get_column_codes(variable)
+    if target_values is None:
+        target_values = uniques.tolist()
+    neighbor_codes = codes[neighbor_table.scout_ids]
+    present_values = uniques[np.unique(neighbor_codes[neighbor_codes >= 0])]
+
+    num_columns, code_columns, target_columns = map_target_codes(uniques=uniques, present_values=present_values,
+                                                                 variable=variable, target_values=target_values)
+    # Code -1 (missing value) indexes the trailing -1 column
+    neighbor_columns = code_columns[neighbor_codes]
+
+    counted_mask = (neighbor_columns >= 0) & within_range_mask(neighbor_table, scan_range)
+    cell_ids = neighbor_table.get_outpost_positions()[counted_mask] * num_columns + neighbor_columns[counted_mask]
+    counts = np.bincount(cell_ids, minlength=neighbor_table.get_num_outposts() * num_columns)
+    counts = counts.reshape(neighbor_table.get_num_outposts(), num_columns)
+    return [(target_value, fill_outposts_without_neighbors(neighbor_table, counts[:, columns].sum(axis=1)))
+            for target_value, columns in zip(target_values, target_columns)]
+
+
+def _ranked_entries(nearest_table: NeighborTable, rank: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+
+    :param rank: Zero-based rank of the scout by distance; 0 is the nearest scout.
+    :return: Tuple of (has rank, entry positions). has rank marks the outposts with at least rank + 1 scouts in the
+        table, and entry positions holds the table entry of the ranked scout of each of those outposts.
+    """
+    has_rank = nearest_table.get_num_neighbors() > rank
+    return has_rank, nearest_table.offsets[:-1][has_rank] + rank
+
+
+def ranked_scout_distance(nearest_table: NeighborTable, rank: int):
+    has_rank, entries = _ranked_entries(nearest_table, rank)
+    distances = np.full(nearest_table.get_num_outposts(), np.nan)
+    distances[has_rank] = nearest_table.distances[entries]
+    return [distance if ranked else None for distance, ranked in zip(distances.tolist(), has_rank)]
+
+
+def ranked_scout_variable(nearest_table: NeighborTable, scout_columns, rank: int, variable):
+    has_rank, entries = _ranked_entries(nearest_table, rank)
+    values = np.full(nearest_table.get_num_outposts(), None, dtype=object)
+    values[has_rank] = scout_columns.get_column(variable)[nearest_table.scout_ids[entries]]
+    return values.tolist()
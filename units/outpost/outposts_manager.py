@@ -1,139 +1,82 @@
+import logging
 from typing import Union
 
+import numpy as np
 import pandas as pd
 
-from units.outpost.outpost import Outpost
-from . import outposts_analysis_functions
+from units.column_arrays import column_from_series
+from units.coordinate_groups import CoordinateGroups, snap_to_grid
 
 
-class CoordinateToOutpostsMap:
+class OutpostsManager:
+    """
+    Columnar base data of one Outpost file. Outposts are addressed by integer position, in file order: their
+    coordinates are stored in the latitudes and longitudes arrays, and each extra column is stored as one array in
+    columns; columns of dtype 'category' stay categorical, see column_arrays. Shared, unmodified, by every combination
+    the file is analyzed in; per-combination results are kept in OutpostsQueryResults.
 
-    def __init__(self):
-        self.outposts = {}
+    Outposts at the same coordinate share one 'outpost hub' in coordinate_groups. Scouts are joined and analyzed once
+    per hub, and the results are fanned out to the hub's Outposts. Outposts without a coordinate are kept, so output
+    rows line up with the file's rows, but belong to no hub and have missing results.
+    """
 
-    def add_outpost(self, outpost):
-        coordinate = outpost._coordinate
-        if coordinate in self.outposts:
-            self.outposts[coordinate].append(outpost)
-        else:
-            self.outposts[coordinate] = [outpost]
+    def __init__(self, name: str):
+        self.name = name
 
-    def get_outposts(self, coordinate) -> Union[list[Outpost], None]:
-        if coordinate not in self.outposts:
-            return None
+        self.latitudes = np.empty(0)
+        self.longitudes = np.empty(0)
+        self.columns = {}
+        self.coordinate_groups = CoordinateGroups(self.latitudes, self.longitudes)
 
-        return self.outposts[coordinate]
+    def create_outposts(self, dataframe: pd.DataFrame, lat_column_name: str, lon_column_name: str,
+                        extra_column_names: Union[list, None] = None, snap_tolerance: float = None):
+        """
 
-    def get_map(self):
-        return self.outposts
+        :param snap_tolerance: Optional grid spacing in degrees. Outposts in the same grid cell then share one hub at
+            the cell's grid point, which is queried in their place. Their output coordinates are unchanged.
+        """
+        latitudes = dataframe[lat_column_name].to_numpy(dtype=np.float64)
+        longitudes = dataframe[lon_column_name].to_numpy(dtype=np.float64)
 
+        num_without_coordinate = np.count_nonzero(np.isnan(latitudes) | np.isnan(longitudes))
+        if num_without_coordinate:
+            logging.info(f"{num_without_coordinate} outposts without coordinates in OutpostsManager {self.name} are "
+                         f"kept without results.")
 
-class OutpostsManager:
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.columns = {}
+        for col_name in extra_column_names or []:
+            self.columns[col_name] = column_from_series(dataframe[col_name])
+        self.coordinate_groups = CoordinateGroups(*snap_to_grid(self.latitudes, self.longitudes, snap_tolerance))
 
-    def __init__(self, name: str):
-        self.name = name
-        # coordinate: Outpost
-        self.coordinate_to_outposts_map = CoordinateToOutpostsMap()
+    def get_num_outposts(self) -> int:
+        return len(self.latitudes)
 
-    def create_outposts(self, dataframe: pd.DataFrame, lat_column_name: str, lon_column_name: str,
-                        extra_column_names: Union[list, None] = None):
-        for row_index in dataframe.index:
-            latitude = dataframe.loc[row_index, lat_column_name]
-            longitude = dataframe.loc[row_index, lon_column_name]
-            coordinate = (latitude, longitude)
-
-            new_outpost = Outpost(coordinate=coordinate)
-
-            if extra_column_names:
-                for extra_column_name in extra_column_names:
-                    new_outpost.add_outpost_data(variable_name=extra_column_name,
-                                                 value=dataframe.loc[row_index, extra_column_name])
-
-            self.coordinate_to_outposts_map.add_outpost(outpost=new_outpost)
-
-    def outpost_generator(self) -> tuple[tuple, Outpost]:
-        outpost_map = self.coordinate_to_outposts_map.get_map()
-
-        for coordinate, outpost_list in outpost_map.items():
-            for outpost in outpost_list:
-                yield coordinate, outpost
-
-    def scout_in_range_tf(self, scan_range):
-        for coordinate, outpost in self.outpost_generator():
-            file_substring_result = outposts_analysis_functions.scout_in_range_tf(outpost=outpost,
-                                                                                  scan_range=scan_range
-                                                                                  )
-            query_str = f"Scout found within {scan_range} miles"
-            outpost.add_query_data(query_string=query_str,
-                                   value=file_substring_result
-                                   )
-
-    def num_scouts_in_range(self, scan_range):
-        for coordinate, outpost in self.outpost_generator():
-            file_substring_result = outposts_analysis_functions.num_scouts_in_range(outpost=outpost,
-                                                                                    scan_range=scan_range
-                                                                                    )
-            query_str = f"Number of scouts within {scan_range} miles"
-            outpost.add_query_data(query_string=query_str,
-                                   value=file_substring_result
-                                   )
-
-    def num_scouts_in_range_by_variable(self, scan_range, variable, target_value):
-        for coordinate, outpost in self.outpost_generator():
-            file_substring_result = outposts_analysis_functions.count_scouts_by_variable(outpost=outpost,
-                                                                                         scan_range=scan_range,
-                                                                                         variable=variable,
-                                                                                         target_value=target_value
-                                                                                         )
-            query_str = (
-                f"Number of scouts within {scan_range} miles with variable '{variable}' equal to target value "
-                f"'{target_value}'")
-            outpost.add_query_data(query_string=query_str,
-                                   value=file_substring_result)
-
-    def average_scouts_by_variable(self, scan_range, variable):
-        for coordinate, outpost in self.outpost_generator():
-            file_substring_result = outposts_analysis_functions.average_scouts_by_variable(outpost=outpost,
-                                                                                           scan_range=scan_range,
-                                                                                           variable=variable
-                                                                                           )
-            query_str = f"Average '{variable}' of scouts within {scan_range} miles"
-            outpost.add_query_data(query_string=query_str,
-                                   value=file_substring_result
-                                   )
-
-    def nearest_scout(self, scan_range):
-        for coordinate, outpost in self.outpost_generator():
-            result = outposts_analysis_functions.nearest_scout(outpost=outpost)
-            query_str = f"Nearest scout within {scan_range} miles."
-            outpost.add_query_data(query_string=query_str,
-                                   value=result
-                                   )
-
-    def compile_query_data_into_df(self):
-
-        # Initialize blank key values in dict
-        output_data = {
-            'latitude': [],
-            'longitude': []
-        }
-        gen = self.outpost_generator()
-        first_outpost = next(gen)[1]
-        outpost_variable_names = first_outpost.get_data_names()
-        for variable_name in outpost_variable_names:
-            output_data[variable_name] = []
-        outpost_query_names = first_outpost.get_query_names()
-        for query_name in outpost_query_names:
-            output_data[query_name] = []
-
-        gen = self.outpost_generator()
-        for coordinate, outpost in gen:
-            output_data['latitude'].append(outpost.get_latitude())
-            output_data['longitude'].append(outpost.get_longitude())
-            for key, value in outpost.outpost_data_generator():
-                output_data[key].append(value)
-            for key, value in outpost.outpost_query_generator():
-                output_data[key].append(value)
-
-        df = pd.DataFrame(output_data)
-        return df
+    def get_column(self, variable: str) -> np.ndarray:
+        if variable not in self.columns:
+            raise KeyError(f"Requested nonexistent variable {variable} from OutpostsManager {self.name}.\n"
+                           f"Valid variables: {list(self.columns.keys())}")
+
+        return self.columns[variable]
+
+    def get_data_names(self) -> list[str]:
+        return list(self.columns.keys())
+
+    def get_coordinate_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+
+        :return: Tuple of (latitudes, longitudes) arrays of every Outpost, by outpost position.
+        """
+        return self.latitudes, self.longitudes
+
+    def get_outpost_hub_coordinates(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+
+        :return: Tuple of (latitudes, longitudes) arrays of every outpost hub, by hub id. Hub ids are the outpost
+            positions used by the NeighborTable and OutpostsQueryResults.
+        """
+        return self.coordinate_groups.hub_latitudes, self.coordinate_groups.hub_longitudes
+
+    def get_num_outpost_hubs(self) -> int:
+        return self.coordinate_groups.get_num_groups()
@@ -0,0 +1,355 @@
+import logging
+
+import pandas as pd
+
+from units.scout.scouts_manager import ScoutsManagersView
+from . import outposts_analysis_functions
+from .fused_analysis import FusedAnalysisPlan
+from .neighbor_table import NeighborTable
+from .outposts_manager import OutpostsManager
+from .streaming_aggregation import StreamingAggregator
+
+# Analysis function name: format of the function's query string, which names its results column
+ANALYSIS_QUERY_STRINGS = {
+    'scout_in_range_tf': "Scout found within {scan_range} miles",
+    'num_scouts_in_range': "Number of scouts within {scan_range} miles",
+    'num_scouts_in_range_by_variable': ("Number of scouts within {scan_range} miles with variable '{variable}' equal "
+                                        "to target value '{target_value}'"),
+    'average_scouts_by_variable': "Average '{variable}' of scouts within {scan_range} miles",
+    'sum_scouts_by_variable': "Sum of '{variable}' of scouts within {scan_range} miles",
+    'min_scouts_by_variable': "Minimum '{variable}' of scouts within {scan_range} miles",
+    'max_scouts_by_variable': "Maximum '{variable}' of scouts within {scan_range} miles",
+    'median_scouts_by_variable': "Median '{variable}' of scouts within {scan_range} miles",
+    'percentile_scouts_by_variable': "Percentile {percentile} of '{variable}' of scouts within {scan_range} miles",
+    'distance_weighted_average_scouts_by_variable': ("Inverse distance weighted average '{variable}' of scouts within "
+                                                     "{scan_range} miles, power {power}"),
+    'num_scouts_in_ring': "Number of scouts from {inner_range} to {outer_range} miles",
+    'average_scouts_in_ring': "Average '{variable}' of scouts from {inner_range} to {outer_range} miles",
+    'sum_scouts_in_ring': "Sum of '{variable}' of scouts from {inner_range} to {outer_range} miles",
+    'nearest_scout': "Nearest scout within {scan_range} miles.",
+    'nearest_scouts': "Distance to nearest scout number {rank}",
+    'nearest_scouts_variable': "'{variable}' of nearest scout number {rank}"
+}
+
+# Analysis function name: nullable dtype of the function's results column. Outposts without results are missing values.
+ANALYSIS_RESULT_DTYPES = {
+    'scout_in_range_tf': 'boolean',
+    'num_scouts_in_range': 'Int64',
+    'num_scouts_in_range_by_variable': 'Int64',
+    'average_scouts_by_variable': 'Float64',
+    'sum_scouts_by_variable': 'Float64',
+    'min_scouts_by_variable': 'Float64',
+    'max_scouts_by_variable': 'Float64',
+    'median_scouts_by_variable': 'Float64',
+    'percentile_scouts_by_variable': 'Float64',
+    'distance_weighted_average_scouts_by_variable': 'Float64',
+    'num_scouts_in_ring': 'Int64',
+    'average_scouts_in_ring': 'Float64',
+    'sum_scouts_in_ring': 'Float64',
+    'nearest_scout': 'Float64',
+    'nearest_scouts': 'Float64',
+    'nearest_scouts_variable': object
+}
+
+
+class QueryDataMap:
+
+    def __init__(self):
+        # query_string: array with one result per outpost
+        self.query_map = {}
+
+    def add_query_data(self, query_string, data):
+        if query_string in self.query_map:
+            logging.info(f"Overwriting!\n\tquery_string '{query_string}'")
+
+        self.query_map[query_string] = data
+
+    def get_query_data(self, query_string):
+        if query_string not in self.query_map:
+            return None
+
+        return self.query_map[query_string]
+
+    def get_query_names(self) -> list[str]:
+        return list(self.query_map.keys())
+
+
+class OutpostsQueryResults:
+    """
+    Per-combination results layer over a shared OutpostsManager: the combination's NeighborTable, and one column of
+    analysis results per query. Tables and results are indexed by the OutpostsManager's outpost hub ids, and results
+    are only fanned out to every Outpost by compile_query_data_into_df.
+    """
+
+    def __init__(self, outposts_manager: OutpostsManager):
+        self.outposts_manager = outposts_manager
+        self.name = outposts_manager.name
+
+        self.neighbor_table = None
+        self.nearest_table = None
+        self.scout_columns = None
+        self.query_data_map = QueryDataMap()
+
+    def set_neighbor_table(self, neighbor_table: NeighborTable, scout_columns: ScoutsManagersView):
+        """
+
+        :param neighbor_table: Join results between the outposts and the scouts in scout_columns, or None if the join
+            was aggregated on the fly.
+        :param scout_columns: View over the ScoutsManagers whose combined scout ids are used in neighbor_table.
+        """
+        self.neighbor_table = neighbor_table
+        self.scout_columns = scout_columns
+
+    def _add_function_results(self, function_name: str, results: list, **kwargs):
+        query_str = ANALYSIS_QUERY_STRINGS[function_name].format(**kwargs)
+        self.query_data_map.add_query_data(query_string=query_str,
+                                           data=pd.array(results, dtype=ANALYSIS_RESULT_DTYPES[function_name]))
+
+    def set_nearest_table(self, nearest_table: NeighborTable):
+        """
+
+        :param nearest_table: Each outpost's nearest scouts, without a range limit, using the combined scout ids of the
+            neighbor table's scout_columns.
+        """
+        self.nearest_table = nearest_table
+
+    def scout_in_range_tf(self, scan_range):
+        results = outposts_analysis_functions.scout_in_range_tf(neighbor_table=self.neighbor_table,
+                                                                scan_range=scan_range)
+        self._add_function_results('scout_in_range_tf', results, scan_range=scan_range)
+
+    def num_scouts_in_range(self, scan_range):
+        results = outposts_analysis_functions.num_scouts_in_range(neighbor_table=self.neighbor_table,
+                                                                  scan_range=scan_range)
+        self._add_function_results('num_scouts_in_range', results, scan_range=scan_range)
+
+    def num_scouts_in_range_by_variable(self, scan_range, variable, target_value):
+        results = outposts_analysis_functions.count_scouts_by_variable(neighbor_table=self.neighbor_table,
+                                                                       scout_columns=self.scout_columns,
+                                                                       scan_range=scan_range,
+                                                                       variable=variable,
+                                                                       target_value=target_value)
+        self._add_function_results('num_scouts_in_range_by_variable', results, scan_range=scan_range,
+                                   variable=variable, target_value=target_value)
+
+    def num_scouts_in_range_by_variable_values(self, scan_range, variable, target_values=None):
+        value_counts = outposts_analysis_functions.count_scouts_by_variable_values(neighbor_table=self.neighbor_table,
+                                                                                   scout_columns=self.scout_columns,
+                                                                                   scan_range=scan_range,
+                                                                                   variable=variable,
+                                                                                   target_values=target_values)
+        # One column per value, named as the value's num_scouts_in_range_by_variable column
+        for target_value, results in value_counts:
+            self._add_function_results('num_scouts_in_range_by_variable', results, scan_range=scan_range,
+                                       variable=variable, target_value=target_value)
+
+    def average_scouts_by_variable(self, scan_range, variable):
+        results = outposts_analysis_functions.average_scouts_by_variable(neighbor_table=self.neighbor_table,
+                                                                         scout_columns=self.scout_columns,
+                                                                         scan_range=scan_range,
+                                                                         variable=variable)
+        self._add_function_results('average_scouts_by_variable', results, scan_range=scan_range,
+                                   variable=variable)
+
+    def sum_scouts_by_variable(self, scan_range, variable):
+        results = outposts_analysis_functions.sum_scouts_by_variable(neighbor_table=self.neighbor_table,
+                                                                     scout_columns=self.scout_columns,
+                                                                     scan_range=scan_range,
+                                                                     variable=variable)
+        self._add_function_results('sum_scouts_by_variable', results, scan_range=scan_range, variable=variable)
+
+    def min_scouts_by_variable(self, scan_range, variable):
+        results = outposts_analysis_functions.min_scouts_by_variable(neighbor_table=self.neighbor_table,
+                                                                     scout_columns=self.scout_columns,
+                                                                     scan_range=scan_range,
+                                                                     variable=variable)
+        self._add_function_results('min_scouts_by_variable', results, scan_range=scan_range, variable=variable)
+
+    def max_scouts_by_variable(self, scan_range, variable):
+        results = outposts_analysis_functions.max_scouts_by_variable(neighbor_table=self.neighbor_table,
+                                                                     scout_columns=self.scout_columns,
+                                                                     scan_range=scan_range,
+                                                                     variable=variable)
+        self._add_function_results('max_scouts_by_variable', results, scan_range=scan_range, variable=variable)
+
+    def median_scouts_by_variable(self, scan_range, variable):
+        results = outposts_analysis_functions.percentile_scouts_by_variable(neighbor_table=self.neighbor_table,
+                                                                            scout_columns=self.scout_columns,
+                                                                            scan_range=scan_range,
+                                                                            variable=variable,
+                                                                            percentile=50)
+        self._add_function_results('median_scouts_by_variable', results, scan_range=scan_range, variable=variable)
+
+    def percentile_scouts_by_variable(self, scan_range, variable, percentile):
+        results = outposts_analysis_functions.percentile_scouts_by_variable(neighbor_table=self.neighbor_table,
+                                                                            scout_columns=self.scout_columns,
+                                                                            scan_range=scan_range,
+                                                                            variable=variable,
+                                                                            percentile=percentile)
+        self._add_function_results('percentile_scouts_by_variable', results, scan_range=scan_range,
+                                   variable=variable, percentile=percentile)
+
+    def distance_weighted_average_scouts_by_variable(self, scan_range, variable, power=1):
+        results = outposts_analysis_functions.distance_weighted_average_scouts_by_variable(
+            neighbor_table=self.neighbor_table,
+            scout_columns=self.scout_columns,
+            scan_range=scan_range,
+            variable=variable,
+            power=power
+        )
+        self._add_function_results('distance_weighted_average_scouts_by_variable', results, scan_range=scan_range,
+                                   variable=variable, power=power)
+
+    def num_scouts_in_rings(self, breaks, variable=None, aggregate='average'):
+        ring_counts, ring_aggregates = outposts_analysis_functions.count_scouts_in_rings(
+            neighbor_table=self.neighbor_table,
+            scout_columns=self.scout_columns,
+            breaks=breaks,
+            variable=variable,
+            aggregate=aggregate
+        )
+        inner_ranges = [0] + list(breaks[:-1])
+        for ring, (inner_range, outer_range) in enumerate(zip(inner_ranges, breaks)):
+            self._add_function_results('num_scouts_in_ring', ring_counts[ring], inner_range=inner_range,
+                                       outer_range=outer_range)
+            if ring_aggregates is not None:
+                self._add_function_results(f"{aggregate}_scouts_in_ring", ring_aggregates[ring],
+                                           inner_range=inner_range, outer_range=outer_range, variable=variable)
+
+    def nearest_scout(self, scan_range):
+        results = outposts_analysis_functions.nearest_scout(neighbor_table=self.neighbor_table,
+                                                            scan_range=scan_range)
+        self._add_function_results('nearest_scout', results, scan_range=scan_range)
+
+    def nearest_scouts(self, k, variable=None):
+        if self.nearest_table is None:
+            raise ValueError(f"OutpostsQueryResults {self.name} has no nearest table. nearest_scouts must be stacked "
+                             f"before process_analysis_functions is called.")
+
+        for rank in range(k):
+            results = outposts_analysis_functions.ranked_scout_distance(nearest_table=self.nearest_table,
+                                                                        rank=rank)
+            self._add_function_results('nearest_scouts', results, rank=rank + 1)
+            if variable is not None:
+                results = outposts_analysis_functions.ranked_scout_variable(nearest_table=self.nearest_table,
+                                                                            scout_columns=self.scout_columns,
+                                                                            rank=rank,
+                                                                            variable=variable)
+                self._add_function_results('nearest_scouts_variable', results, rank=rank + 1, variable=variable)
+
+    def evaluate_function_calls(self, function_calls: list[tuple[str, dict]]) -> list[dict]:
+        """
+        Evaluates a stack of analysis function calls. Calls with a fused implementation are evaluated together in one
+        FusedAnalysisPlan; any others are run one at a time. Results are added in call order.
+
+        :param function_calls: List of (analysis function name, kwargs) tuples.
+        :return: List with one dict of query string: results per call, holding the results columns the call added.
+        """
+        fused_plan = FusedAnalysisPlan(function_calls)
+        fused_results = iter(fused_plan.evaluate(neighbor_table=self.neighbor_table,
+                                                 scout_columns=self.scout_columns))
+        function_results = []
+        for function_name, kwargs in function_calls:
+            previous_query_names = set(self.query_data_map.get_query_names())
+            if fused_plan.supports_function(function_name):
+                self._add_function_results(function_name, next(fused_results), **kwargs)
+            else:
+                getattr(self, function_name)(**kwargs)
+            function_results.append({query_name: self.query_data_map.get_query_data(query_name)
+                                     for query_name in self.query_data_map.get_query_names()
+                                     if query_name not in previous_query_names})
+        return function_results
+
+    def evaluate_aggregated_function_calls(self, function_calls: list[tuple[str, dict]],
+                                           aggregator: StreamingAggregator):
+        """
+        Adds the results of a stack of analysis function calls aggregated on the fly during the join, without a
+        neighbor table. Calls the StreamingAggregator doesn't support, e.g. nearest_scouts, are run one at a time.
+        Results are added in call order.
+
+        :param function_calls: List of (analysis function name, kwargs) tuples.
+        :param aggregator: StreamingAggregator of function_calls, fed every block of the join.
+        """
+        aggregated_results = iter(aggregator.get_results())
+        for function_name, kwargs in function_calls:
+            if aggregator.supports_function(function_name):
+                self._add_function_results(function_name, next(aggregated_results), **kwargs)
+            else:
+                getattr(self, function_name)(**kwargs)
+
+    def update_outposts(self, outpost_hub_ids, neighbor_table: NeighborTable, nearest_table: NeighborTable,
+                        scout_columns: ScoutsManagersView, scout_id_map, function_calls: list[tuple[str, dict]]):
+        """
+        Applies a change of the scouts to some of the outposts: their neighbors are replaced, and the analysis function
+        calls are evaluated again for only those outposts. Every other outpost's results are kept.
+
+        :param outpost_hub_ids: Hub ids of the changed outposts.
+        :param neighbor_table: New join results of the changed outposts, in outpost_hub_ids order.
+        :param nearest_table: New nearest table of the changed outposts, or None if there is no nearest table.
+        :param scout_columns: View over the changed ScoutsManagers, used by both new tables.
+        :param scout_id_map: New combined scout id of every previous combined scout id, or -1 for deleted scouts. Only
+            the changed outposts may have deleted scouts as neighbors.
+        :param function_calls: The (analysis function name, kwargs) calls that produced the current results, as returned
+            by pin_function_calls before the scouts changed.
+        """
+        changed_results = OutpostsQueryResults(self.outposts_manager)
+        changed_results.set_neighbor_table(neighbor_table=neighbor_table,
+                                           scout_columns=scout_columns)
+        changed_results.set_nearest_table(nearest_table)
+        function_results = changed_results.evaluate_function_calls(function_calls)
+
+        self.neighbor_table = self.neighbor_table.remap_scout_ids(scout_id_map).replace_outposts(outpost_hub_ids,
+                                                                                                  neighbor_table)
+        if self.nearest_table is not None:
+            self.nearest_table = self.nearest_table.remap_scout_ids(scout_id_map).replace_outposts(outpost_hub_ids,
+                                                                                                    nearest_table)
+        self.scout_columns = scout_columns
+        for call_results in function_results:
+            for query_string, results in call_results.items():
+                self.query_data_map.get_query_data(query_string)[outpost_hub_ids] = results
+
+    def pin_function_calls(self, function_calls: list[tuple[str, dict]]) -> list[tuple[str, dict]]:
+        """
+        Grouped counts keep the value columns they were first evaluated with, even if scout changes add or remove
+        values. Must be called before the ScoutsManagers change, as scout_columns reads their current columns.
+
+        :param function_calls: List of (analysis function name, kwargs) calls.
+        :return: Copy of function_calls, with the default target values of num_scouts_in_range_by_variable_values calls
+            replaced by the values of the current scouts.
+        """
+        pinned_function_calls = []
+        for function_name, kwargs in function_calls:
+            if function_name == 'num_scouts_in_range_by_variable_values' and kwargs.get('target_values') is None:
+                uniques = self.scout_columns.get_column_codes(kwargs['variable'])[1]
+                kwargs = {**kwargs, 'target_values': uniques.tolist()}
+            pinned_function_calls.append((function_name, kwargs))
+        return pinned_function_calls
+
+    def set_function_results(self, function_results: list[dict]):
+        """
+        Replaces every query's results with previously evaluated ones.
+
+        :param function_results: List of dicts of query string: results, in output column order.
+        """
+        self.query_data_map = QueryDataMap()
+        for call_results in function_results:
+            for query_string, results in call_results.items():
+                self.query_data_map.add_query_data(query_string=query_string,
+                                                   data=results)
+
+    def compile_query_data_into_df(self) -> pd.DataFrame:
+        latitudes, longitudes = self.outposts_manager.get_coordinate_arrays()
+        output_data = {
+            'latitude': latitudes,
+            'longitude': longitudes
+        }
+        for variable_name in self.outposts_manager.get_data_names():
+            output_data[variable_name] = self.outposts_manager.get_column(variable_name)
+
+        # Outposts without a coordinate have hub id -1, which takes a missing value
+        outpost_hub_ids = self.outposts_manager.coordinate_groups.group_ids
+        for query_name, results in self.query_data_map.query_map.items():
+            output_data[query_name] = results.take(outpost_hub_ids, allow_fill=True)
+
+        df = pd.DataFrame(output_data)
+        return df
@@ -0,0 +1,146 @@
+"""
+Aggregate-on-the-fly evaluation of a stack of analysis function calls during the range join. Each block of join results
+is reduced into running per-outpost aggregates (counts, sums, minima and maxima) and then dropped, so memory is
+O(outposts x aggregates) instead of O(outpost to scout pairs). Only functions whose results are such reductions are
+supported; see supports_function.
+"""
+import numpy as np
+
+from . import outposts_analysis_functions as analysis_functions
+
+
+class StreamingAggregator:
+    """
+    Running aggregates of a list of (function name, kwargs) analysis calls, updated one block of join results at a
+    time with add_block. Results match evaluating the calls over a NeighborTable holding every block.
+    """
+
+    streaming_function_names = (
+        'scout_in_range_tf',
+        'num_scouts_in_range',
+        'num_scouts_in_range_by_variable',
+        'average_scouts_by_variable',
+        'sum_scouts_by_variable',
+        'min_scouts_by_variable',
+        'max_scouts_by_variable',
+        'nearest_scout'
+    )
+
+    def __init__(self, function_calls: list[tuple[str, dict]], num_outposts: int, scout_columns):
+        """
+
+        :param function_calls: List of (analysis function name, kwargs) tuples. Calls to functions without a streaming
+            implementation are left out; see supports_function.
+        :param num_outposts: Number of outposts the join results are for.
+        :param scout_columns: View over the ScoutsManagers whose combined scout ids are used in the join results.
+        """
+        self.function_calls = [(function_name, kwargs) for function_name, kwargs in function_calls
+                               if self.supports_function(function_name)]
+        self.num_outposts = num_outposts
+        self.scout_columns = scout_columns
+
+        # Number of scouts joined with each outpost, which tells outposts without neighbors from the others
+        self.neighbor_counts = np.zeros(num_outposts, dtype=np.int64)
+        self.nearest_distances = np.full(num_outposts, np.inf)
+        # Call position: dict of aggregate name: array with one running aggregate per outpost
+        self.call_aggregates = [self._create_aggregates(function_name) for function_name, _ in self.function_calls]
+
+    @classmethod
+    def supports_function(cls, function_name: str) -> bool:
+        return function_name in cls.streaming_function_names
+
+    def _create_aggregates(self, function_name: str) -> dict:
+        if function_name in ('min_scouts_by_variable', 'max_scouts_by_variable'):
+            # NaN until an outpost has a valid value, as np.fmin and np.fmax skip NaNs
+            return {'extremes': np.full(self.num_outposts, np.nan)}
+        if function_name in ('average_scouts_by_variable', 'sum_scouts_by_variable'):
+            return {'counts': np.zeros(self.num_outposts, dtype=np.int64), 'sums': np.zeros(self.num_outposts)}
+        if function_name == 'nearest_scout':
+            return {}
+        return {'counts': np.zeros(self.num_outposts, dtype=np.int64)}
+
+    def add_block(self, block_start: int, num_block_outposts: int, outpost_positions: np.ndarray,
+                  scout_ids: np.ndarray, distances: np.ndarray):
+        """
+        Reduces one block of join results into the aggregates. A block may be added in parts, e.g. one per
+        ScoutsManager.
+
+        :param block_start: Position of the block's first outpost.
+        :param num_block_outposts: Number of outposts in the block.
+        :param outpost_positions: Position of each entry's outpost within the block.
+        :param scout_ids: Combined scout id of each entry.
+        :param distances: Distance of each entry, within the join's scan range.
+        """
+        block = slice(block_start, block_start + num_block_outposts)
+        self.neighbor_counts[block] += np.bincount(outpost_positions, minlength=num_block_outposts)
+        np.minimum.at(self.nearest_distances[block], outpost_positions, distances)
+
+        # Values of each variable, read once per block
+        block_numbers = {}
+        for (function_name, kwargs), aggregates in zip(self.function_calls, self.call_aggregates):
+            if function_name == 'nearest_scout':
+                continue
+            in_range_mask = distances <= kwargs['scan_range']
+            if function_name in ('scout_in_range_tf', 'num_scouts_in_range'):
+                aggregates['counts'][block] += np.bincount(outpost_positions[in_range_mask],
+                                                           minlength=num_block_outposts)
+                continue
+
+            values = self.scout_columns.get_column(kwargs['variable'])[scout_ids]
+            valid_mask = analysis_functions.valid_values_mask(values)
+            if function_name == 'num_scouts_in_range_by_variable':
+                if not analysis_functions.values_and_target_value_are_compatible_data_types(
+                        values=values[valid_mask], target_value=kwargs['target_value']):
+                    raise TypeError(f"Variable '{kwargs['variable']}' values and target value "
+                                    f"'{kwargs['target_value']}' are incompatible.")
+                matches_mask = valid_mask & in_range_mask
+                matches_mask[matches_mask] = values[matches_mask] == kwargs['target_value']
+                aggregates['counts'][block] += np.bincount(outpost_positions[matches_mask],
+                                                           minlength=num_block_outposts)
+                continue
+
+            if kwargs['variable'] not in block_numbers:
+                block_numbers[kwargs['variable']] = analysis_functions.numeric_values(values, valid_mask, function_name,
+                                                                                    kwargs['variable'])
+            numbers = block_numbers[kwargs['variable']]
+            counted_mask = valid_mask & in_range_mask
+            if function_name == 'min_scouts_by_variable':
+                np.fmin.at(aggregates['extremes'][block], outpost_positions[counted_mask], numbers[counted_mask])
+            elif function_name == 'max_scouts_by_variable':
+                np.fmax.at(aggregates['extremes'][block], outpost_positions[counted_mask], numbers[counted_mask])
+            else:
+                aggregates['counts'][block] += np.bincount(outpost_positions[counted_mask],
+                                                           minlength=num_block_outposts)
+                aggregates['sums'][block] += np.bincount(outpost_positions[counted_mask],
+                                                         weights=numbers[counted_mask], minlength=num_block_outposts)
+
+    def _fill_outposts_without_neighbors(self, results: np.ndarray) -> list:
+        has_neighbors = self.neighbor_counts > 0
+        return [result if has_neighbor else None for result, has_neighbor in zip(results.tolist(), has_neighbors)]
+
+    def get_results(self) -> list[list]:
+        """
+
+        :return: One list of results per outpost for each streamed call, in call order.
+        """
+        results = []
+        for (function_name, kwargs), aggregates in zip(self.function_calls, self.call_aggregates):
+            if function_name == 'nearest_scout':
+                results.append([distance if distance <= kwargs['scan_range'] else None
+                                for distance in self.nearest_distances.tolist()])
+                continue
+
+            if function_name == 'scout_in_range_tf':
+                call_results = aggregates['counts'] > 0
+            elif function_name in ('min_scouts_by_variable', 'max_scouts_by_variable'):
+                call_results = aggregates['extremes']
+            elif function_name == 'average_scouts_by_variable':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    call_results = np.where(aggregates['counts'] > 0,
+                                            aggregates['sums'] / np.maximum(aggregates['counts'], 1), np.nan)
+            elif function_name == 'sum_scouts_by_variable':
+                call_results = aggregates['sums']
+            else:
+                call_results = aggregates['counts']
+            results.append(self._fill_outposts_without_neighbors(call_results))
+        return results
@@ -1,74 +1,230 @@
+import logging
+
+import numpy as np
 import pandas as pd
 
-from units.scout import scout
+from units.column_arrays import column_from_series, concatenate_columns, factorize_column
+from units.coordinate_groups import CoordinateGroups
 
+# Column added to merged ScoutsManagers holding each scout's source file alias
+SCOUT_FILE_TAG_COLUMN = 'scout_file'
 
-class CoordinateScoutsMap:
 
-    def __init__(self):
-        self.scouts = {}
+class ScoutsManager:
+    """
+    Columnar storage of one Scout file. Scouts are addressed by integer row id: their coordinates are stored in the
+    latitudes and longitudes arrays, and each extra column is stored as one array in columns; columns of dtype
+    'category' stay categorical, see column_arrays.
+    """
 
-    def add_scout(self, scout):
-        coordinate = scout.coordinate
-        if coordinate in self.scouts:
-            self.scouts[coordinate].append(scout)
-        else:
-            self.scouts[coordinate] = [scout]
+    def __init__(self, name: str):
+        self.name = name
 
-    def get_scouts(self, coordinate):
-        if coordinate not in self.scouts:
-            raise KeyError(f"Requested nonextistent coordinate {coordinate} from CoordinateScoutsMap.")
+        self.latitudes = np.empty(0)
+        self.longitudes = np.empty(0)
+        self.columns = {}
+        self.coordinate_groups = CoordinateGroups(self.latitudes, self.longitudes)
 
-        return self.scouts[coordinate]
+    def create_scouts(self, dataframe: pd.DataFrame, lat_column_name: str, lon_column_name: str,
+                      extra_column_names: list):
+        latitudes = dataframe[lat_column_name].to_numpy(dtype=np.float64)
+        longitudes = dataframe[lon_column_name].to_numpy(dtype=np.float64)
+
+        has_coordinate = ~(np.isnan(latitudes) | np.isnan(longitudes))
+        if not has_coordinate.all():
+            logging.info(f"Skipping {np.count_nonzero(~has_coordinate)} scouts without coordinates in ScoutsManager "
+                         f"{self.name}.")
+
+        self.latitudes = latitudes[has_coordinate]
+        self.longitudes = longitudes[has_coordinate]
+        self.columns = {}
+        for col_name in extra_column_names or []:
+            self.columns[col_name] = column_from_series(dataframe[col_name])[has_coordinate]
+        self.coordinate_groups = CoordinateGroups(self.latitudes, self.longitudes)
+
+    @classmethod
+    def merge(cls, name: str, scouts_managers: list, tag_column_name: str = SCOUT_FILE_TAG_COLUMN):
+        """
 
-    def get_map(self):
-        return self.scouts
+        :param name: Name of the merged ScoutsManager.
+        :param scouts_managers: ScoutsManagers to merge, in the order their scouts are stored.
+        :param tag_column_name: Name of the added column holding each scout's source ScoutsManager name.
+        :return: One ScoutsManager holding the scouts of every ScoutsManager. Columns missing from some of the
+            ScoutsManagers are None for their scouts.
+        """
+        merged_manager = cls(name=name)
+        merged_manager.latitudes = np.concatenate([manager.latitudes for manager in scouts_managers] + [[]])
+        merged_manager.longitudes = np.concatenate([manager.longitudes for manager in scouts_managers] + [[]])
+
+        column_names = []
+        for manager in scouts_managers:
+            column_names.extend(col_name for col_name in manager.columns if col_name not in column_names)
+        for col_name in column_names:
+            merged_manager.columns[col_name] = concatenate_columns(
+                [manager.columns[col_name] if col_name in manager.columns
+                 else np.full(manager.get_num_scouts(), None, dtype=object) for manager in scouts_managers]
+            )
+        merged_manager.columns[tag_column_name] = np.repeat(
+            np.array([manager.name for manager in scouts_managers], dtype=object),
+            [manager.get_num_scouts() for manager in scouts_managers]
+        )
+        merged_manager.coordinate_groups = CoordinateGroups(merged_manager.latitudes, merged_manager.longitudes)
+        return merged_manager
+
+    def find_scout_ids(self, latitudes: np.ndarray, longitudes: np.ndarray, columns: dict = None) -> np.ndarray:
+        """
+        Finds one distinct scout for each given scout, so duplicate given scouts find duplicate stored scouts.
 
+        :param latitudes: Array of the given scouts' latitudes.
+        :param longitudes: Array of the given scouts' longitudes.
+        :param columns: Optional dict of column name: array of the given scouts' values. Found scouts also match these.
+        :return: Row id of the scout found for each given scout.
+        """
+        columns = {col_name: values for col_name, values in (columns or {}).items() if col_name in self.columns}
+        group_ids = self.coordinate_groups.find_groups(latitudes, longitudes)
+
+        found_scout_ids = []
+        found_id_set = set()
+        for position, group_id in enumerate(group_ids):
+            candidate_ids = self.get_scout_ids(group_id) if group_id >= 0 else []
+            scout_id = next((candidate_id for candidate_id in candidate_ids
+                             if candidate_id not in found_id_set
+                             and all(_values_equal(self.columns[col_name][candidate_id], values[position])
+                                     for col_name, values in columns.items())),
+                            None)
+            if scout_id is None:
+                raise KeyError(f"No scout at ({latitudes[position]}, {longitudes[position]}) matching the requested "
+                               f"columns {list(columns.keys())} in ScoutsManager {self.name}.")
+            found_scout_ids.append(scout_id)
+            found_id_set.add(scout_id)
+        return np.array(found_scout_ids, dtype=np.int64)
+
+    def apply_changes(self, inserted_latitudes: np.ndarray, inserted_longitudes: np.ndarray, inserted_columns: dict,
+                      deleted_scout_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Deletes and inserts scouts. The remaining scouts keep their order, followed by the inserted scouts. Scout hub
+        ids are kept, so that a spatial index over the hubs can be updated in place: new coordinates are added as new
+        hubs, and hubs left without scouts are kept as empty hubs.
+
+        :param inserted_latitudes: Array of the inserted scouts' latitudes.
+        :param inserted_longitudes: Array of the inserted scouts' longitudes.
+        :param inserted_columns: Dict of column name: array of the inserted scouts' values. Columns left out are None
+            for the inserted scouts.
+        :param deleted_scout_ids: Row ids of the deleted scouts.
+        :return: Tuple of (scout id map, filled hub ids, emptied hub ids). The scout id map holds the new row id of
+            every previous scout, or -1 if it was deleted. Filled hubs gained their first scouts and emptied hubs lost
+            their last.
+        """
+        num_inserted = len(inserted_latitudes)
+        is_kept = np.ones(self.get_num_scouts(), dtype=bool)
+        is_kept[deleted_scout_ids] = False
+        scout_id_map = np.full(self.get_num_scouts(), -1, dtype=np.int64)
+        scout_id_map[is_kept] = np.arange(np.count_nonzero(is_kept))
+
+        # Inserted scouts join the hub at their coordinate, or a new hub shared with inserted scouts at the same
+        # coordinate
+        coordinate_groups = self.coordinate_groups
+        inserted_group_ids = coordinate_groups.find_groups(inserted_latitudes, inserted_longitudes)
+        is_new_hub = inserted_group_ids < 0
+        new_hubs = CoordinateGroups(inserted_latitudes[is_new_hub], inserted_longitudes[is_new_hub])
+        inserted_group_ids[is_new_hub] = coordinate_groups.get_num_groups() + new_hubs.group_ids
+
+        previous_group_sizes = np.append(coordinate_groups.get_group_sizes(), np.zeros(new_hubs.get_num_groups(),
+                                                                                       dtype=np.int64))
+        self.latitudes = np.concatenate((self.latitudes[is_kept], inserted_latitudes))
+        self.longitudes = np.concatenate((self.longitudes[is_kept], inserted_longitudes))
+        for col_name, values in self.columns.items():
+            inserted_values = inserted_columns.get(col_name, np.full(num_inserted, None, dtype=object))
+            self.columns[col_name] = concatenate_columns([values[is_kept], inserted_values])
+        self.coordinate_groups = CoordinateGroups.from_group_ids(
+            hub_latitudes=np.concatenate((coordinate_groups.hub_latitudes, new_hubs.hub_latitudes)),
+            hub_longitudes=np.concatenate((coordinate_groups.hub_longitudes, new_hubs.hub_longitudes)),
+            group_ids=np.concatenate((coordinate_groups.group_ids[is_kept], inserted_group_ids))
+        )
+
+        group_sizes = self.coordinate_groups.get_group_sizes()
+        filled_hub_ids = np.flatnonzero((previous_group_sizes == 0) & (group_sizes > 0))
+        emptied_hub_ids = np.flatnonzero((previous_group_sizes > 0) & (group_sizes == 0))
+        logging.info(f"Inserted {num_inserted} and deleted {len(deleted_scout_ids)} scouts in ScoutsManager "
+                     f"{self.name}.")
+        return scout_id_map, filled_hub_ids, emptied_hub_ids
+
+    def get_scout_ids(self, group_id: int) -> np.ndarray:
+        """
 
-class ScoutsManager:
+        :param group_id: Scout hub id, as indexed by the spatial index built from get_scout_hub_coordinates.
+        :return: Row ids of the scouts at the scout hub.
+        """
+        return self.coordinate_groups.get_row_ids(group_id)
 
-    def __init__(self, name: str):
-        self.name = name
-        self._coordinate_scouts_map = CoordinateScoutsMap()
+    def get_column(self, variable: str) -> np.ndarray:
+        if variable not in self.columns:
+            raise KeyError(f"Requested nonexistent variable {variable} from ScoutsManager {self.name}.\n"
+                           f"Valid variables: {list(self.columns.keys())}")
 
-    @staticmethod
-    def _get_coordinate(df, row_index, latitude_column_name, longitude_column_name):
-        latitude = df.loc[row_index, latitude_column_name]
-        longitude = df.loc[row_index, longitude_column_name]
-        coordinate = (latitude, longitude)
-        return coordinate
+        return self.columns[variable]
 
-    def create_scouts(self, dataframe: pd.DataFrame, lat_column_name: str, lon_column_name: str,
-                      extra_column_names: list):
-        coordinates = []
-        for row_index in dataframe.index:
-            coordinate = self._get_coordinate(dataframe, row_index, lat_column_name, lon_column_name)
-            coordinates.append(coordinate)
-            new_scout = scout.Scout(coordinate=coordinate)
+    def get_variable_values(self, variable: str, scout_ids: np.ndarray) -> np.ndarray:
+        return self.get_column(variable)[scout_ids]
+
+    def get_num_scouts(self) -> int:
+        return len(self.latitudes)
+
+    def get_scout_hub_coordinates(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+
+        :return: Tuple of (latitudes, longitudes) arrays of every unique scout coordinate, ordered by scout hub id.
+        """
+        return self.coordinate_groups.hub_latitudes, self.coordinate_groups.hub_longitudes
 
-            if not extra_column_names:
-                continue
 
-            for i, col_name in enumerate(extra_column_names):
-                value = dataframe.loc[row_index, col_name]
-                new_scout.add_data(variable_name=col_name, value=value)
+def _values_equal(first_value, second_value) -> bool:
+    if pd.isna(first_value) and pd.isna(second_value):
+        return True
+    return first_value == second_value
 
-            self._coordinate_scouts_map.add_scout(new_scout)
 
-    def get_scouts(self, coordinate: tuple):
-        return self._coordinate_scouts_map.get_scouts(coordinate=coordinate)
+class ScoutsManagersView:
+    """
+    Read-only view addressing the scouts of several ScoutsManagers by one combined id. The scouts of the manager at
+    position m have combined ids id_offsets[m] through id_offsets[m + 1] - 1.
+    """
 
-    def scout_generator(self):
-        scouts_map = self._coordinate_scouts_map.get_map()
+    def __init__(self, scouts_managers: list[ScoutsManager]):
+        self.scouts_managers = scouts_managers
+        self.id_offsets = np.concatenate(([0], np.cumsum([manager.get_num_scouts() for manager in scouts_managers])))
+        self._combined_columns = {}
+        # variable: (codes, uniques) dictionary encoding of the combined column
+        self._column_codes = {}
 
-        for coordinate, scouts_list in scouts_map.items():
-            for scout in scouts_list:
-                yield coordinate, scout
+    def get_combined_ids(self, manager_position: int, scout_ids: np.ndarray) -> np.ndarray:
+        return scout_ids + self.id_offsets[manager_position]
+
+    def get_coordinate_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+
+        :return: Tuple of (latitudes, longitudes) arrays of every scout, indexed by combined id.
+        """
+        return (np.concatenate([manager.latitudes for manager in self.scouts_managers] + [np.empty(0)]),
+                np.concatenate([manager.longitudes for manager in self.scouts_managers] + [np.empty(0)]))
+
+    def get_column(self, variable: str) -> np.ndarray:
+        """
+
+        :return: The variable's values for every scout, indexed by combined id.
+        """
+        if variable not in self._combined_columns:
+            columns = [manager.get_column(variable) for manager in self.scouts_managers]
+            self._combined_columns[variable] = concatenate_columns(columns) if columns else np.empty(0)
+        return self._combined_columns[variable]
 
-    def get_all_scout_coordinates(self) -> list[tuple]:
+    def get_column_codes(self, variable: str) -> tuple[np.ndarray, np.ndarray]:
         """
+        Dictionary encoding of the variable, computed once per view.
 
-        :return: All scout coordinates in a list of tuples.
+        :return: Tuple of (code of every scout's value, indexed by combined id, with -1 for missing values; array of
+            the distinct values, indexed by code). Distinct values are sorted when they are comparable.
         """
-        scout_coordinates = list(self._coordinate_scouts_map.scouts.keys())
-        return scout_coordinates
+        if variable not in self._column_codes:
+            self._column_codes[variable] = factorize_column(self.get_column(variable))
+        return self._column_codes[variable]